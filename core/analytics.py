@@ -0,0 +1,336 @@
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .grading import get_grade_scale
+from .models import Institution, AcademicRecord, ExamResult, ExamScoreRollup, GradeRollup, DirtyRollupBucket
+from .upserts import upsert
+
+# ==============================================================================
+# Analytics rollups: exam score statistics and grade distributions.
+#
+# Record writes don't touch the rollups. They append a DirtyRollupBucket row in
+# the writer's own transaction (core/signals.py), so a mark commits or rolls
+# back with its change and a write storm at results release costs one small
+# INSERT per write. refresh_dirty() later folds the marks into the rollups in
+# a separate transaction per batch, never the writer's: a dirty exam is recomputed at every scope (institution, university,
+# all) from one query over its scores; a dirty (course, semester, institution)
+# bucket from the rows of that bucket. It runs off the request path, from
+# `manage.py rebuild_analytics --dirty` (cron, or --every for a worker loop).
+# The endpoints serve the rollups as they stand, with each row's refreshed_at
+# and whether changes are waiting to be folded in.
+#
+# Percentiles, histograms and grade distributions for a whole batch of buckets
+# come from a handful of NumPy sorts and bincounts. NumPy is imported on first
+# use so web processes that never refresh don't pay for it; without it a
+# plain-Python path gives the same numbers.
+#
+# Grade points and passes follow the active grade scale; rebuild after
+# changing GRADE_SCALE.
+# ==============================================================================
+
+EXAM_PASS_SCORE = getattr(settings, 'EXAM_PASS_SCORE', 40)
+# Histogram: SCORE_BINS equal bands over SCORE_RANGE; scores outside go to the end bands.
+SCORE_RANGE = getattr(settings, 'ANALYTICS_SCORE_RANGE', (0, 100))
+SCORE_BINS = getattr(settings, 'ANALYTICS_SCORE_BINS', 10)
+QUANTILES = {'p10': 0.1, 'p25': 0.25, 'median': 0.5, 'p75': 0.75, 'p90': 0.9}
+# Dirty marks folded per round.
+REFRESH_BATCH_SIZE = 5000
+
+_numpy = None
+
+
+def numpy():
+    """The numpy module, imported on first use; None if it isn't installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy as module
+        except ImportError:
+            module = False
+        _numpy = module
+    return _numpy or None
+
+
+def score_bands():
+    low, high = SCORE_RANGE
+    width = (high - low) / SCORE_BINS
+    return [[low + i * width, low + (i + 1) * width] for i in range(SCORE_BINS)]
+
+
+# --- Statistics ---
+
+def _band(score):
+    low, high = SCORE_RANGE
+    return min(max(math.floor((score - low) / (high - low) * SCORE_BINS), 0), SCORE_BINS - 1)
+
+
+def _quantile(ordered, q):
+    # linear interpolation between closest ranks (NumPy's default)
+    position = (len(ordered) - 1) * q
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def score_statistics(codes, scores, buckets):
+    """
+    Statistics per bucket for `scores` labelled with bucket `codes` (0 to
+    buckets - 1, each used at least once). Returns a list of dicts in code order.
+    """
+    np = numpy()
+    if np is None:
+        grouped = defaultdict(list)
+        for code, score in zip(codes, scores):
+            grouped[code].append(score)
+        results = []
+        for code in range(buckets):
+            ordered = sorted(grouped[code])
+            histogram = [0] * SCORE_BINS
+            for score in ordered:
+                histogram[_band(score)] += 1
+            stats = {'count': len(ordered), 'pass_count': sum(score >= EXAM_PASS_SCORE for score in ordered),
+                     'mean': sum(ordered) / len(ordered), 'minimum': ordered[0], 'maximum': ordered[-1],
+                     'histogram': histogram}
+            stats.update({name: _quantile(ordered, q) for name, q in QUANTILES.items()})
+            results.append(stats)
+        return results
+
+    codes = np.asarray(codes, dtype=np.intp)
+    scores = np.asarray(scores, dtype=float)
+    order = np.lexsort((scores, codes))
+    codes, scores = codes[order], scores[order]
+    counts = np.bincount(codes, minlength=buckets)
+    starts = np.cumsum(counts) - counts
+    ends = starts + counts - 1
+    columns = {
+        'count': counts,
+        'pass_count': np.bincount(codes, weights=scores >= EXAM_PASS_SCORE, minlength=buckets).astype(int),
+        'mean': np.bincount(codes, weights=scores, minlength=buckets) / counts,
+        'minimum': scores[starts],
+        'maximum': scores[ends],
+    }
+    for name, q in QUANTILES.items():
+        position = starts + (counts - 1) * q
+        low = np.floor(position).astype(np.intp)
+        high = np.minimum(low + 1, ends)
+        columns[name] = scores[low] + (scores[high] - scores[low]) * (position - low)
+    low, high = SCORE_RANGE
+    bands = np.clip(np.floor((scores - low) / (high - low) * SCORE_BINS).astype(np.intp), 0, SCORE_BINS - 1)
+    columns['histogram'] = np.bincount(codes * SCORE_BINS + bands, minlength=buckets * SCORE_BINS).reshape(
+        buckets, SCORE_BINS)
+    columns = {name: values.tolist() for name, values in columns.items()}
+    return [{name: values[code] for name, values in columns.items()} for code in range(buckets)]
+
+
+def grade_distributions(codes, grades, buckets):
+    """{grade: count} per bucket for `grades` labelled with bucket `codes`."""
+    np = numpy()
+    if np is None:
+        results = [Counter() for _ in range(buckets)]
+        for code, grade in zip(codes, grades):
+            results[code][grade] += 1
+        return [dict(counter) for counter in results]
+    names, grade_codes = np.unique(np.asarray(grades, dtype=str), return_inverse=True)
+    counts = np.bincount(np.asarray(codes, dtype=np.intp) * len(names) + grade_codes.ravel(),
+                         minlength=buckets * len(names)).reshape(buckets, len(names))
+    names = names.tolist()
+    return [{names[i]: count for i, count in enumerate(row) if count} for row in counts.tolist()]
+
+
+# --- Dirty marks ---
+
+def mark_exams_dirty(buckets):
+    """Marks (exam_name, institution id) buckets for refresh."""
+    DirtyRollupBucket.objects.bulk_create([
+        DirtyRollupBucket(kind='exam', name=name, institution_id=institution_id)
+        for name, institution_id in set(buckets) if institution_id is not None
+    ])
+
+
+def mark_grades_dirty(buckets):
+    """Marks (course_name, semester, institution id) buckets for refresh."""
+    DirtyRollupBucket.objects.bulk_create([
+        DirtyRollupBucket(kind='grade', name=name, semester=semester, institution_id=institution_id)
+        for name, semester, institution_id in set(buckets) if institution_id is not None
+    ])
+
+
+# --- Refresh ---
+
+# Rollup rows are upserted (core.upserts), so refreshers racing on a bucket
+# never trip the unique constraints.
+EXAM_ROLLUP_FIELDS = ['university', 'count', 'pass_count', 'mean', 'minimum', 'p10', 'p25', 'median', 'p75', 'p90',
+                      'maximum', 'histogram', 'refreshed_at']
+GRADE_ROLLUP_FIELDS = ['university', 'record_count', 'graded_count', 'pass_count', 'points_total', 'distribution',
+                       'refreshed_at']
+
+
+def _universities(institution_ids):
+    return dict(Institution.objects.filter(pk__in=institution_ids).values_list('pk', 'university_id'))
+
+
+def refresh_exams(exam_names):
+    """Recomputes every rollup row of the given exams."""
+    exam_names = set(exam_names)
+    rows = list(ExamResult.objects.filter(exam_name__in=exam_names)
+                .values_list('exam_name', 'verified_by_id', 'verified_by__university_id', 'score'))
+    keys, codes, scores = {}, [], []
+    for name, institution_id, university_id, score in rows:
+        for key in ((name, 'institution', institution_id, university_id), (name, 'university', university_id,
+                    university_id), (name, 'all', 0, None)):
+            codes.append(keys.setdefault(key, len(keys)))
+            scores.append(score)
+    rollups = []
+    if keys:
+        for (name, scope, scope_id, university_id), stats in zip(keys, score_statistics(codes, scores, len(keys))):
+            rollups.append(ExamScoreRollup(exam_name=name, scope=scope, scope_id=scope_id,
+                                           university_id=university_id, **stats))
+    with transaction.atomic():
+        upsert(ExamScoreRollup, rollups, ['exam_name', 'scope', 'scope_id'], EXAM_ROLLUP_FIELDS)
+        # Scopes the exam no longer has results in.
+        current = {(name, scope, scope_id) for name, scope, scope_id, _ in keys}
+        stale = ExamScoreRollup.objects.filter(exam_name__in=exam_names).values_list(
+            'pk', 'exam_name', 'scope', 'scope_id')
+        stale_ids = [pk for pk, *key in stale if tuple(key) not in current]
+        if stale_ids:
+            ExamScoreRollup.objects.filter(pk__in=stale_ids).delete()
+
+
+def refresh_grades(buckets):
+    """Recomputes the (course_name, semester, institution id) buckets; empty ones lose their row."""
+    buckets = set(buckets)
+    scale = get_grade_scale()
+    rows = AcademicRecord.objects.filter(
+        course_name__in={name for name, _, _ in buckets},
+        semester__in={semester for _, semester, _ in buckets},
+        verified_by_id__in={institution_id for _, _, institution_id in buckets},
+    ).values_list('course_name', 'semester', 'verified_by_id', 'grade')
+    keys, codes, grades = {}, [], []
+    for name, semester, institution_id, grade in rows:
+        if (name, semester, institution_id) in buckets:
+            codes.append(keys.setdefault((name, semester, institution_id), len(keys)))
+            grades.append((grade or '').strip().upper())
+
+    universities = _universities({institution_id for _, _, institution_id in keys})
+    rollups = []
+    for (name, semester, institution_id), distribution in zip(keys, grade_distributions(codes, grades, len(keys))):
+        rollup = GradeRollup(course_name=name, semester=semester, institution_id=institution_id,
+                             university_id=universities[institution_id], distribution=distribution,
+                             record_count=sum(distribution.values()), graded_count=0, pass_count=0,
+                             points_total=0.0)
+        for grade, count in distribution.items():
+            points = scale.points_for(grade)
+            if points is not None:
+                rollup.graded_count += count
+                rollup.points_total += points * count
+                rollup.pass_count += count if points >= scale.pass_points else 0
+        rollups.append(rollup)
+
+    with transaction.atomic():
+        upsert(GradeRollup, rollups, ['course_name', 'semester', 'institution'], GRADE_ROLLUP_FIELDS)
+        emptied = buckets - set(keys)
+        if emptied:
+            stale = GradeRollup.objects.filter(
+                course_name__in={name for name, _, _ in emptied},
+                semester__in={semester for _, semester, _ in emptied},
+                institution_id__in={institution_id for _, _, institution_id in emptied},
+            ).values_list('pk', 'course_name', 'semester', 'institution_id')
+            stale_ids = [pk for pk, *key in stale if tuple(key) in emptied]
+            GradeRollup.objects.filter(pk__in=stale_ids).delete()
+
+
+def refresh_pending():
+    """Whether writes are waiting to be folded into the rollups."""
+    return DirtyRollupBucket.objects.exists()
+
+
+def refresh_dirty(batch_size=REFRESH_BATCH_SIZE):
+    """Folds pending dirty marks into the rollups; returns the number of marks consumed."""
+    consumed = 0
+    while True:
+        marks = list(DirtyRollupBucket.objects.order_by('id')
+                     .values_list('id', 'kind', 'name', 'semester', 'institution_id')[:batch_size])
+        if not marks:
+            return consumed
+        # Marks are written with the change they describe, so every change
+        # behind a mark read here is visible to the queries below; only these
+        # marks are deleted, never ones that arrive meanwhile.
+        with transaction.atomic():
+            exams = {name for _, kind, name, _, _ in marks if kind == 'exam'}
+            if exams:
+                refresh_exams(exams)
+            grades = {(name, semester, institution_id) for _, kind, name, semester, institution_id in marks
+                      if kind == 'grade'}
+            if grades:
+                refresh_grades(grades)
+            DirtyRollupBucket.objects.filter(id__in=[mark[0] for mark in marks]).delete()
+        consumed += len(marks)
+        if len(marks) < batch_size:
+            return consumed
+
+
+def rebuild_all(batch_size=500):
+    """Recomputes every rollup from scratch, a batch of exams or courses at a time."""
+    with transaction.atomic():
+        DirtyRollupBucket.objects.all().delete()
+        ExamScoreRollup.objects.all().delete()
+        GradeRollup.objects.all().delete()
+    exams = list(ExamResult.objects.values_list('exam_name', flat=True).distinct().order_by('exam_name'))
+    for start in range(0, len(exams), batch_size):
+        refresh_exams(exams[start:start + batch_size])
+    courses = list(AcademicRecord.objects.values_list('course_name', flat=True).distinct().order_by('course_name'))
+    for start in range(0, len(courses), batch_size):
+        buckets = (AcademicRecord.objects.filter(course_name__in=courses[start:start + batch_size])
+                   .values_list('course_name', 'semester', 'verified_by_id').distinct())
+        refresh_grades(buckets)
+    return len(exams), len(courses)
+
+
+# --- Queries ---
+
+def _merge(total, row):
+    total['record_count'] += row.record_count
+    total['graded_count'] += row.graded_count
+    total['pass_count'] += row.pass_count
+    total['points_total'] += row.points_total
+    total['refreshed_at'] = min(total['refreshed_at'] or row.refreshed_at, row.refreshed_at)
+    for grade, count in row.distribution.items():
+        total['distribution'][grade] = total['distribution'].get(grade, 0) + count
+
+
+GRADE_GROUPS = {
+    'course': ('course_name', 'semester'),
+    'semester': ('semester',),
+    'institution': ('institution_id',),
+    'university': ('university_id',),
+}
+
+
+def grade_summary(rollups, group='course'):
+    """Sums GradeRollup rows per `group` (a GRADE_GROUPS key) into distributions and rates."""
+    fields = GRADE_GROUPS[group]
+    totals = {}
+    for row in rollups:
+        key = tuple(getattr(row, name) for name in fields)
+        total = totals.setdefault(key, {'record_count': 0, 'graded_count': 0, 'pass_count': 0,
+                                        'points_total': 0.0, 'distribution': {}, 'refreshed_at': None})
+        _merge(total, row)
+    results = []
+    for key in sorted(totals):
+        total = totals[key]
+        graded = total['graded_count']
+        results.append({
+            **dict(zip((name.removesuffix('_id') for name in fields), key)),
+            'record_count': total['record_count'],
+            'graded_count': graded,
+            'pass_count': total['pass_count'],
+            'pass_rate': round(total['pass_count'] / graded, 4) if graded else None,
+            'mean_points': round(total['points_total'] / graded, 2) if graded else None,
+            'distribution': dict(sorted(total['distribution'].items())),
+            # the oldest of the rows summed
+            'refreshed_at': total['refreshed_at'],
+        })
+    return results
@@ -0,0 +1,178 @@
+import base64
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import Student, AcademicRecord, CoCurricularRecord, ExamResult
+from .pagination import keyset_filter
+from .ranking import load_indexes
+from .reference import ainstitution_labels
+from .roles import STUDENTS, STUDYING_INSTITUTIONS, aget_request_roles
+from .routers import replica_reads
+from .serializers import (
+    StudentSerializer, AcademicRecordSerializer, CoCurricularRecordSerializer, ExamResultSerializer
+)
+
+# ==============================================================================
+# Native async versions of the read-heavy API endpoints, mounted under
+# /api/async/. Served through markR.asgi they never park a worker thread on
+# authentication: the JWT is verified in the event loop, the user row and the
+# records come from the async ORM, and roles and institution labels come from
+# the token claim and the cache. Responses have the same shape as the matching
+# DRF endpoints.
+# ==============================================================================
+
+_jwt = JWTAuthentication()
+
+
+def _error(detail, status):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+async def authenticate(request):
+    """
+    Returns (user, token) for a Bearer JWT, (user, None) for a session, or
+    (None, None) for an anonymous request. Raises InvalidToken for a bad JWT.
+    """
+    header = _jwt.get_header(request)
+    if header is not None:
+        raw_token = _jwt.get_raw_token(header)
+        if raw_token is not None:
+            token = _jwt.get_validated_token(raw_token)
+            user = await User.objects.filter(
+                **{jwt_settings.USER_ID_FIELD: token[jwt_settings.USER_ID_CLAIM]}, is_active=True
+            ).afirst()
+            if user is None:
+                raise InvalidToken('User not found')
+            return user, token
+    user = await request.auser()
+    return (user, None) if user.is_authenticated else (None, None)
+
+
+def async_api_view(required_role=None):
+    """
+    Wraps an async view with JWT/session authentication and an optional role
+    check. The view is called as view(request, user, roles, **kwargs). These
+    views only read, so they may be served from a replica (core.routers).
+    """
+    def decorator(view):
+        @wraps(view)
+        @require_GET
+        async def wrapper(request, *args, **kwargs):
+            try:
+                user, token = await authenticate(request)
+            except (InvalidToken, TokenError):
+                return _error('Given token not valid for any token type', 401)
+            if user is None:
+                return _error('Authentication credentials were not provided.', 401)
+            roles = await aget_request_roles(user, token)
+            if required_role is not None and required_role not in roles:
+                return _error('You do not have permission to perform this action.', 403)
+            request.user = user  # lets core.routers find the user's primary pin
+            return await view(request, user, roles, *args, **kwargs)
+        return replica_reads(wrapper)
+    return decorator
+
+
+# --- Keyset pagination ---
+
+def _encode_cursor(values):
+    # isoformat() keeps the microseconds that DjangoJSONEncoder would round away
+    payload = json.dumps(values, default=lambda value: value.isoformat()).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def _decode_cursor(cursor, model, fields):
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(values, list) or len(values) != len(fields) or None in values:
+        raise ValueError('cursor does not match the ordering')
+    return [model._meta.get_field(field).to_python(value) for field, value in zip(fields, values)]
+
+
+def _page_size(request):
+    size = settings.REST_FRAMEWORK.get('PAGE_SIZE') or 50
+    try:
+        size = int(request.GET['page_size'])
+    except (KeyError, ValueError):
+        pass
+    return max(1, min(size, getattr(settings, 'API_MAX_PAGE_SIZE', 500)))
+
+
+async def keyset_page(request, queryset, fields, serializer_class):
+    """
+    One page of `queryset`, newest first on the composite key `fields` (the same
+    ordering as core.pagination). Forward-only: {'next': url|null, 'results': [...]}.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor:
+        # Cursors come from the client: anything that isn't one of ours is a 404, like DRF's.
+        try:
+            position = _decode_cursor(cursor, queryset.model, fields)
+            queryset = queryset.filter(keyset_filter([f'-{field}' for field in fields], position))
+        except (ValueError, TypeError, DjangoValidationError):
+            return _error('Invalid cursor', 404)
+
+    size = _page_size(request)
+    rows = [row async for row in queryset.order_by(*(f'-{field}' for field in fields))[:size + 1]]
+    next_url = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = [getattr(rows[-1], field) for field in fields]
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', _encode_cursor(last))
+    context = {'request': request, 'institution_labels': await ainstitution_labels()}
+    data = serializer_class(rows, many=True, context=context).data
+    return JsonResponse({'next': next_url, 'results': data})
+
+
+# --- Endpoints ---
+
+@async_api_view()
+async def student_detail(request, user, roles, pk):
+    """GET /api/async/students/<pk>/ - the StudentSerializer profile; honours ?fields= and ?expand=."""
+    try:
+        fields, expand = StudentSerializer.resolve_shape(request.GET, tuple(StudentSerializer.EXPANDABLE))
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+    students = Student.objects.with_profile().prefetch_related(
+        *(StudentSerializer.EXPANDABLE[name] for name in expand)
+    )
+    if STUDENTS in roles:
+        # Students can only see their own profile.
+        students = students.filter(user=user)
+    student = await students.filter(pk=pk).afirst()
+    if student is None:
+        return _error('No Student matches the given query.', 404)
+    context = {'request': request, 'institution_labels': await ainstitution_labels()}
+    if 'exam_ranks' in expand:
+        context['rank_indexes'] = await sync_to_async(load_indexes)(
+            {result.exam_name for result in student.examresult_set.all()})
+    return JsonResponse(StudentSerializer(student, context=context, fields=fields, expand=expand).data)
+
+
+@async_api_view(STUDYING_INSTITUTIONS)
+async def academic_record_list(request, user, roles):
+    return await keyset_page(request, AcademicRecord.objects.all(),
+                             ('recorded_at', 'id'), AcademicRecordSerializer)
+
+
+@async_api_view(STUDYING_INSTITUTIONS)
+async def exam_result_list(request, user, roles):
+    return await keyset_page(request, ExamResult.objects.all(),
+                             ('recorded_at', 'id'), ExamResultSerializer)
+
+
+@async_api_view(STUDYING_INSTITUTIONS)
+async def cocurricular_record_list(request, user, roles):
+    return await keyset_page(request, CoCurricularRecord.objects.all(),
+                             ('id',), CoCurricularRecordSerializer)
@@ -0,0 +1,140 @@
+import asyncio
+import math
+import time
+import tracemalloc
+from urllib.parse import urlsplit
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+# ==============================================================================
+# Helpers shared by the benchmark management commands: latency percentiles, an
+# in-process request profiler (latency, queries, peak memory) and a small
+# asyncio HTTP/1.1 load generator. The generator opens one connection per
+# request from `concurrency` coroutines, so a single process can hold far more
+# simultaneous connections than a thread-per-client load tool.
+# ==============================================================================
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarise(latencies, elapsed, errors=0):
+    """Throughput and latency percentiles (milliseconds) for one run."""
+    latencies = sorted(latencies)
+    ms = lambda value: None if value is None else round(value * 1000, 2)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+
+def profile_call(func, iterations=50, warmup=3, using='default'):
+    """
+    Time `func` (which issues one request and returns the response) and report
+    latency percentiles, the queries of one call and its peak Python memory.
+    Memory is traced in a separate call so tracemalloc doesn't skew latency.
+    """
+    for _ in range(warmup):
+        func()
+
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        response = func()
+        latencies.append(time.perf_counter() - call_started)
+        if response.status_code >= 400:
+            errors += 1
+    result = summarise(latencies, time.perf_counter() - started, errors)
+    result['mean_ms'] = round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None
+
+    with CaptureQueriesContext(connections[using]) as queries:
+        response = func()
+    result['queries'] = len(queries)
+    result['status'] = response.status_code
+    result['bytes'] = len(getattr(response, 'content', b'') or b'')
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    func()
+    result['peak_kib'] = round((tracemalloc.get_traced_memory()[1] - baseline) / 1024, 1)
+    if not tracing:
+        tracemalloc.stop()
+    return result
+
+
+def compare_reports(baseline, current, threshold=0.2):
+    """
+    Regressions of `current` against `baseline` (both benchmark_endpoints
+    reports): a p95 more than `threshold` slower, or more queries.
+    """
+    regressions = []
+    for name, now in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        if before.get('p95_ms') and now.get('p95_ms') and now['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if before.get('queries') is not None and now.get('queries', 0) > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {now['queries']}")
+    return regressions
+
+
+async def _fetch(url, headers, timeout):
+    parts = urlsplit(url)
+    if parts.scheme != 'http':
+        raise ValueError('Only plain http:// targets are supported.')
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    lines = [f'GET {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: close']
+    lines += [f'{name}: {value}' for name, value in headers.items()]
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+    try:
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    status_line = response.split(b'\r\n', 1)[0].split()
+    return int(status_line[1]) if len(status_line) > 1 else 0
+
+
+async def run_load(url, requests=1000, concurrency=50, headers=None, timeout=30):
+    """GET `url` `requests` times from `concurrency` concurrent clients."""
+    headers = headers or {}
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                status = await _fetch(url, headers, timeout)
+            except (OSError, asyncio.TimeoutError, ValueError):
+                status = 0
+            if 200 <= status < 300:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarise(latencies, time.perf_counter() - started, errors)
@@ -0,0 +1,171 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, Max, Min, OuterRef
+from django.utils import timezone
+
+from . import metrics
+from .models import (
+    Student, AcademicRecord, CoCurricularRecord, ExamResult, ChangeLogEntry, ChangeLogHorizon, ChangeLogSequence,
+)
+
+# ==============================================================================
+# The change log behind GET /api/changes/?since=<cursor>.
+#
+# Every create, update and delete of a student or one of their records appends
+# a ChangeLogEntry: kind, object id, student id and action, nothing else.
+# Consumers re-fetch the objects they are told about. Entries are written by
+# signal handlers (core/signals.py) inside the transaction of the change, so a
+# rolled-back write leaves no entry and a committed one always has one. Bulk
+# paths log through records_bulk_changed.
+#
+# The cursor is not the entry id: ids are handed out before commit, so a slow
+# transaction can commit a lower id after a reader has moved past it. Instead
+# sequence() gives committed entries a `position`, under a lock on the single
+# ChangeLogSequence row, always above every position handed out before. An
+# entry that commits late just gets a later position, so a consumer resuming
+# after its last position never misses it. Readers sequence before they read.
+#
+# compact() drops entries that a newer entry for the same object supersedes;
+# that loses nothing a consumer needs, provided it treats create and update
+# alike as "upsert". prune() drops entries older than the retention period and
+# records how far it got; a cursor behind that must resync from /api/students/.
+# ==============================================================================
+
+FEED_LIMIT = 500
+FEED_MAX_LIMIT = 5000
+SEQUENCE_BATCH_SIZE = 10_000
+RETENTION_DAYS = getattr(settings, 'CHANGE_LOG_RETENTION_DAYS', 90)
+COMPACT_AFTER_HOURS = getattr(settings, 'CHANGE_LOG_COMPACT_AFTER_HOURS', 24)
+DELETE_BATCH_SIZE = 10_000
+
+KIND_OF_MODEL = {Student: 'student', AcademicRecord: 'academic', CoCurricularRecord: 'cocurricular',
+                 ExamResult: 'exam'}
+
+
+class CursorExpired(Exception):
+    """The entries after this cursor have been pruned."""
+    def __init__(self, horizon):
+        super().__init__(f'Entries up to {horizon} have been pruned.')
+        self.horizon = horizon
+
+
+# --- Writing ---
+
+def log_changes(kind, action, rows):
+    """Appends one entry per (object id, student id) in `rows`."""
+    entries = [ChangeLogEntry(kind=kind, object_id=pk, student_id=student_id, action=action)
+               for pk, student_id in rows]
+    if entries:
+        ChangeLogEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+def log_instance(instance, action):
+    student_id = instance.pk if isinstance(instance, Student) else instance.student_id
+    log_changes(KIND_OF_MODEL[type(instance)], action, [(instance.pk, student_id)])
+
+
+def log_bulk(model, created_ids=(), updated_ids=()):
+    """Entries for rows a bulk path wrote; one query to find their students."""
+    ids = [*created_ids, *updated_ids]
+    if not ids:
+        return
+    students = dict(model.objects.filter(pk__in=ids).values_list('pk', 'student_id'))
+    kind = KIND_OF_MODEL[model]
+    for action, pks in (('create', created_ids), ('update', updated_ids)):
+        log_changes(kind, action, [(pk, students[pk]) for pk in pks if pk in students])
+
+
+# --- Sequencing ---
+
+def sequence(batch_size=SEQUENCE_BATCH_SIZE):
+    """Positions the committed entries that have none yet; returns the highest position handed out."""
+    while True:
+        with transaction.atomic():
+            counter, _ = ChangeLogSequence.objects.select_for_update().get_or_create(pk=1)
+            # Only committed entries are visible here, and the lock orders
+            # this round after every earlier one.
+            ids = list(ChangeLogEntry.objects.filter(position=None).order_by('id')
+                       .values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return counter.last_position
+            # position = id + offset keeps id order within the round and puts
+            # all of it above the positions handed out so far.
+            offset = max(0, counter.last_position + 1 - ids[0])
+            ChangeLogEntry.objects.filter(id__in=ids).update(position=F('id') + offset)
+            counter.last_position = ids[-1] + offset
+            counter.save(update_fields=['last_position'])
+        if len(ids) < batch_size:
+            return counter.last_position
+
+
+# --- Reading ---
+
+def horizon():
+    """The highest position retention has dropped (0 if none)."""
+    return ChangeLogHorizon.objects.filter(pk=1).values_list('pruned_through', flat=True).first() or 0
+
+
+def latest_cursor():
+    return sequence()
+
+
+def changes_since(cursor, limit=FEED_LIMIT):
+    """
+    (entries after `cursor` in commit order, next cursor, whether more are ready).
+    Raises CursorExpired if entries after `cursor` were pruned.
+    """
+    sequence()
+    pruned_through = horizon()
+    if cursor < pruned_through:
+        raise CursorExpired(pruned_through)
+    # one extra row tells whether another page is ready
+    rows = list(ChangeLogEntry.objects.filter(position__gt=cursor).order_by('position')[:limit + 1])
+    more = len(rows) > limit
+    entries = rows[:limit]
+    return entries, entries[-1].position if entries else cursor, more
+
+
+# --- Retention ---
+
+def _delete_in_batches(queryset):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:DELETE_BATCH_SIZE])
+        if not ids:
+            return deleted
+        deleted += ChangeLogEntry.objects.filter(id__in=ids).delete()[0]
+
+
+def compact(older_than_hours=COMPACT_AFTER_HOURS):
+    """Deletes entries older than the threshold that a newer entry for the same object supersedes."""
+    sequence()
+    cutoff = timezone.now() - timedelta(hours=older_than_hours)
+    newer = ChangeLogEntry.objects.filter(kind=OuterRef('kind'), object_id=OuterRef('object_id'),
+                                          position__gt=OuterRef('position'))
+    deleted = _delete_in_batches(ChangeLogEntry.objects.filter(changed_at__lt=cutoff, position__isnull=False)
+                                 .filter(Exists(newer)))
+    metrics.increment('changelog.compacted', deleted)
+    return deleted
+
+
+def prune(older_than_days=RETENTION_DAYS):
+    """Deletes entries older than the retention period and moves the horizon past them."""
+    sequence()
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    through = ChangeLogEntry.objects.filter(changed_at__lt=cutoff).aggregate(through=Max('position'))['through']
+    if through is None:
+        return 0
+    # Only ever a prefix of the feed: an entry that committed late sits above
+    # younger ones, and those must stay.
+    kept = ChangeLogEntry.objects.filter(changed_at__gte=cutoff).aggregate(first=Min('position'))['first']
+    if kept is not None:
+        through = min(through, kept - 1)
+    # Horizon first: a consumer must never resume into a gap.
+    if through > horizon():
+        ChangeLogHorizon.objects.update_or_create(pk=1, defaults={'pruned_through': through,
+                                                                  'pruned_at': timezone.now()})
+    deleted = _delete_in_batches(ChangeLogEntry.objects.filter(position__lte=through))
+    metrics.increment('changelog.pruned', deleted)
+    return deleted
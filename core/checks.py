@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core import checks
+
+# ==============================================================================
+# System checks, run by manage.py at startup. Registered from CoreConfig.ready().
+# ==============================================================================
+
+# Backends whose entries live in one process only.
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_throttle_cache(app_configs, **kwargs):
+    """Token buckets (core.throttling) only limit across workers in a shared cache."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if not getattr(settings, 'THROTTLE_BUCKETS', None) or backend not in PER_PROCESS_CACHES:
+        return []
+    return [checks.Warning(
+        f'THROTTLE_BUCKETS are kept in the default cache, which is {backend.rsplit(".", 1)[-1]}: every '
+        'worker process gets its own buckets, so the limits multiply by the number of workers.',
+        hint="Point CACHES['default'] at a shared backend such as Redis or memcached.",
+        id='core.W001',
+    )]
@@ -0,0 +1,69 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Student, AcademicRecord, ExamResult
+
+# ==============================================================================
+# Headline counts for the institution dashboard.
+#
+# The counts are computed once and kept in the cache until a write that could
+# change them (see core/signals.py) deletes the entry. The timeout is only a
+# safety net for writes that bypass the ORM.
+# ==============================================================================
+
+INSTITUTION_STATS_TIMEOUT = getattr(settings, 'INSTITUTION_STATS_TIMEOUT', 3600)
+# Months in which a new term starts; "this term" runs from the latest of these.
+TERM_START_MONTHS = getattr(settings, 'TERM_START_MONTHS', (1, 7))
+
+
+def _cache_key(institution_id):
+    return f'markr:institution-stats:{institution_id}'
+
+
+def current_term_start(now=None):
+    now = timezone.localtime(now)
+    month = max((m for m in TERM_START_MONTHS if m <= now.month), default=None)
+    year = now.year
+    if month is None:
+        month, year = max(TERM_START_MONTHS), year - 1
+    return timezone.make_aware(datetime(year, month, 1))
+
+
+def _compute_stats(institution_id):
+    term_start = current_term_start()
+    students = Student.objects.filter(current_institution_id=institution_id)
+    return {
+        'students': students.count(),
+        'records_this_term': (
+            AcademicRecord.objects.filter(student__current_institution_id=institution_id,
+                                          recorded_at__gte=term_start).count()
+            + ExamResult.objects.filter(student__current_institution_id=institution_id,
+                                        recorded_at__gte=term_start).count()
+        ),
+        # Records are verified when they are written, so the closest thing to a
+        # pending verification is a student who has no academic record yet.
+        'students_without_records': students.filter(academicrecord__isnull=True).count(),
+        'term_start': term_start,
+    }
+
+
+def institution_stats(institution):
+    key = _cache_key(institution.pk)
+    stats = cache.get(key)
+    if stats is None:
+        stats = _compute_stats(institution.pk)
+        cache.set(key, stats, INSTITUTION_STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_institution_stats(*institution_ids):
+    keys = [_cache_key(pk) for pk in institution_ids if pk is not None]
+    if keys:
+        cache.delete_many(keys)
+        # A reader between now and the commit would cache the old counts;
+        # drop them again once the new rows are visible.
+        transaction.on_commit(lambda: cache.delete_many(keys))
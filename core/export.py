@@ -0,0 +1,134 @@
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import AcademicRecord, CoCurricularRecord, ExamResult
+
+# ==============================================================================
+# Streaming transcript export for an institution.
+#
+# Rows are read in keyset batches (WHERE id > last ORDER BY id LIMIT n) rather
+# than with one big query: MySQL's default client cursor buffers the whole
+# result set even under QuerySet.iterator(), while keyset batches keep memory
+# flat on every backend and let the first batch go out before the rest of the
+# table has been read.
+# ==============================================================================
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = [
+    'record_kind', 'record_id', 'student_id', 'username', 'title', 'semester',
+    'grade', 'score', 'date', 'record_type', 'verified_by', 'recorded_at',
+]
+
+# (record_kind, model, column -> ORM lookup). Missing columns are left empty.
+_EXPORT_SOURCES = [
+    ('academic', AcademicRecord, {
+        'title': 'course_name', 'semester': 'semester', 'grade': 'grade', 'recorded_at': 'recorded_at',
+    }),
+    ('cocurricular', CoCurricularRecord, {
+        'title': 'activity_name', 'date': 'date',
+    }),
+    ('exam', ExamResult, {
+        'title': 'exam_name', 'score': 'score', 'recorded_at': 'recorded_at',
+    }),
+]
+
+_COMMON_LOOKUPS = {
+    'student_id': 'student_id',
+    'username': 'student__user__username',
+    'record_type': 'record_type',
+}
+
+
+def iter_keyset(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of rows from a .values() queryset, one keyset batch at a time."""
+    last_id = None
+    while True:
+        batch = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        rows = list(batch.order_by('id')[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def iter_institution_records(institution, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield batches of export rows (dicts keyed by EXPORT_COLUMNS) for every
+    record of every student currently at `institution`.
+    """
+    for kind, model, lookups in _EXPORT_SOURCES:
+        columns = dict(_COMMON_LOOKUPS, **lookups)
+        queryset = model.objects.filter(student__current_institution=institution).values(
+            'id', 'verified_by__name', 'verified_by__university__name', *columns.values()
+        )
+        for rows in iter_keyset(queryset, chunk_size):
+            batch = []
+            for row in rows:
+                out = dict.fromkeys(EXPORT_COLUMNS)
+                out['record_kind'] = kind
+                out['record_id'] = row['id']
+                # same label as Institution.__str__
+                out['verified_by'] = f"{row['verified_by__name']} ({row['verified_by__university__name']})"
+                for column, lookup in columns.items():
+                    out[column] = row[lookup]
+                batch.append(out)
+            yield batch
+
+
+# --- Encoders ---
+
+class _Echo:
+    """File-like object whose write() just returns the value, for csv.writer."""
+    def write(self, value):
+        return value
+
+
+def encode_csv(batches):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        yield ''.join(writer.writerow([_csv_value(row[column]) for column in EXPORT_COLUMNS]) for row in rows)
+
+
+def encode_jsonl(batches):
+    for rows in batches:
+        yield ''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'jsonl': encode_jsonl,
+}
+
+
+def gzip_stream(chunks, level=6):
+    """
+    Compress an iterable of str chunks into a gzip byte stream on the fly.
+    Each chunk is sync-flushed so clients can decompress as the bytes arrive.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(institution, fmt='csv', compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Return an iterator of bytes for the whole export."""
+    chunks = ENCODERS[fmt](iter_institution_records(institution, chunk_size))
+    if compress:
+        return gzip_stream(chunks)
+    return (chunk.encode('utf-8') for chunk in chunks)
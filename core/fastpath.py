@@ -0,0 +1,195 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import fields, relations
+from rest_framework.fields import ISO_8601
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is the fallback
+    orjson = None
+
+from .instrumentation import timed
+from .reference import institution_label, institution_labels
+
+# ==============================================================================
+# Read-only fast path for large record lists.
+#
+# A FastReader is compiled once per serializer class: for every field it works
+# out which column to SELECT and a converter reproducing that field's
+# to_representation(). Rows then come straight from values_list() and become
+# plain dicts with no serializer or field objects per row. FastJSONRenderer
+# encodes them with orjson when installed. The bytes are identical to what the
+# serializer and DRF's JSONRenderer produce; anything the fast path can't
+# reproduce exactly falls back to the regular code.
+# ==============================================================================
+
+
+class _ReprFloat(float):
+    """
+    A float orjson would print differently from json.dumps (which writes
+    1e+16 and 1e-05 where orjson writes 1e16 and 0.00001). orjson rejects
+    float subclasses, so these send the response down the json.dumps path.
+    """
+
+
+def _float(value):
+    value = float(value)
+    if value == 0 or 1e-4 <= abs(value) < 1e16:
+        return value
+    return _ReprFloat(value)
+
+
+def _date(value):
+    return value if isinstance(value, str) else value.isoformat()
+
+
+def _datetime_converter(tz):
+    def convert(value):
+        if isinstance(value, str):
+            return value
+        if timezone.is_aware(value):
+            value = value.astimezone(tz)
+        else:
+            value = timezone.make_aware(value, tz)
+        text = value.isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return convert
+
+
+class FastReader:
+    """
+    Converts values_list() rows of `serializer_class.Meta.model` into the dicts
+    `serializer_class` would produce. Use compile_reader() to build one; it
+    returns None when a field can't be reproduced exactly.
+    """
+
+    def __init__(self, model, plan):
+        self.model = model
+        # [(field name, column, kind, field)], in serializer field order
+        self.plan = plan
+        self.columns = [column for _, column, _, _ in plan]
+        self.names = [name for name, _, _, _ in plan]
+
+    def values(self, queryset):
+        """`queryset` narrowed to the needed columns, as named tuples (cursor pagination reads attributes)."""
+        return queryset.values_list(*self.columns, named=True)
+
+    def _converters(self, labels=None):
+        converters = []
+        tz = timezone.get_current_timezone()
+        for _, _, kind, field in self.plan:
+            if kind == 'raw':
+                converters.append(None)
+            elif kind == 'label':
+                labels = institution_labels() if labels is None else labels
+                converters.append(lambda pk, labels=labels: labels.get(pk) or institution_label(pk, labels))
+            elif kind == 'float':
+                converters.append(_float)
+            elif kind == 'date':
+                converters.append(_date)
+            elif kind == 'datetime':
+                converters.append(_datetime_converter(tz))
+            else:
+                converters.append(field.to_representation)
+        return converters
+
+    @timed('serializer')
+    def convert(self, rows, labels=None):
+        """List of output dicts for an iterable of rows (tuples in self.columns order)."""
+        names = self.names
+        converters = self._converters(labels)
+        if not any(converters):
+            return [dict(zip(names, row)) for row in rows]
+        plan = list(zip(names, converters))
+        return [
+            {name: value if convert is None or value is None else convert(value)
+             for (name, convert), value in zip(plan, row)}
+            for row in rows
+        ]
+
+
+def _field_kind(field):
+    """How to render one serializer field, or None if the fast path can't."""
+    from .serializers import InstitutionLabelField
+
+    if isinstance(field, InstitutionLabelField):
+        return 'label'
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        return 'raw' if field.pk_field is None else None
+    if isinstance(field, (relations.RelatedField, relations.ManyRelatedField, fields.SerializerMethodField)):
+        return None
+    if isinstance(field, fields.ChoiceField):
+        # With string keys the stored value is exactly what gets rendered.
+        return 'raw' if all(isinstance(key, str) for key in field.choices) else 'field'
+    if type(field).to_representation in (fields.CharField.to_representation, fields.IntegerField.to_representation):
+        # str(value) / int(value) of what the database returns: no-ops.
+        return 'raw'
+    if isinstance(field, fields.FloatField):
+        return 'float'
+    if isinstance(field, fields.DateTimeField):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if (output_format and output_format.lower() == ISO_8601
+                and getattr(field, 'timezone', None) is None and field.default_timezone() is not None):
+            return 'datetime'
+        return 'field'
+    if isinstance(field, fields.DateField):
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        return 'date' if output_format and output_format.lower() == ISO_8601 else 'field'
+    if isinstance(field, fields.ModelField):
+        return None
+    # Anything else keeps its own to_representation(): slower, still exact.
+    return 'field'
+
+
+_readers = {}
+
+
+def compile_reader(serializer_class):
+    """The (cached) FastReader for a ModelSerializer class, or None."""
+    if serializer_class in _readers:
+        return _readers[serializer_class]
+    model = serializer_class.Meta.model
+    plan = []
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if len(field.source_attrs) != 1:
+            plan = None
+            break
+        try:
+            model_field = model._meta.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            plan = None
+            break
+        kind = _field_kind(field)
+        if kind is None:
+            plan = None
+            break
+        plan.append((name, model_field.attname, kind, field))
+    reader = FastReader(model, plan) if plan else None
+    _readers[serializer_class] = reader
+    return reader
+
+
+# --- Rendering ---
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed and the output
+    would be byte-identical; otherwise it defers to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or not self.compact or self.ensure_ascii
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            # orjson only writes compact, UTF-8 output
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            rendered = orjson.dumps(data)
+        except TypeError:
+            # Decimals, lazy strings, floats orjson formats differently, ...
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same strict-JavaScript escaping as JSONRenderer.
+        return rendered.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
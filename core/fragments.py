@@ -0,0 +1,125 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.safestring import mark_safe
+
+from . import metrics
+from .reference import VERSION_KEY, reference_version
+
+# ==============================================================================
+# Per-student record versions and the HTML fragments cached against them.
+#
+# Every student has a version stamp in the cache. Any write to one of their
+# academic, co-curricular or exam records changes it (see core/signals.py),
+# including the bulk paths via records_bulk_changed; so do edits to the student
+# or their user. Anything derived from a student's records can be cached
+# against the stamp without being deleted explicitly.
+#
+# A fragment is stored as (stamp, html) under a key that doesn't include the
+# stamp. A page view then fetches the stamp and the fragment in one get_many and
+# renders only when they disagree. Fragments that show institution names
+# also depend on the reference data version (core.reference).
+# ==============================================================================
+
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 24 * 3600)
+
+# Change when a cached fragment's template changes, so deploys don't serve old markup.
+FRAGMENT_SCHEMA = 1
+
+
+def _version_key(student_id):
+    return f'markr:records-version:{student_id}'
+
+
+def _fragment_key(name, student_id):
+    return f'markr:fragment:{FRAGMENT_SCHEMA}:{name}:{student_id}'
+
+
+def records_versions(student_ids):
+    """{student id: records version}; students without a stamp get a fresh one."""
+    keys = {_version_key(pk): pk for pk in student_ids}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # Clock-based, like core.reference: a stamp evicted and recreated never
+        # matches a fragment stored under the old one.
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, None)
+        found.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def records_version(student_id):
+    return records_versions([student_id])[student_id]
+
+
+def _bump(student_ids):
+    now = time.time_ns()
+    cache.set_many({_version_key(pk): now for pk in student_ids}, None)
+
+
+def bump_records_versions(*student_ids):
+    student_ids = {pk for pk in student_ids if pk is not None}
+    if not student_ids:
+        return
+    _bump(student_ids)
+    # A reader between this bump and the commit would cache the old rows under
+    # the new stamp; bumping again once the rows are visible orphans that entry.
+    transaction.on_commit(lambda: _bump(student_ids))
+
+
+def render_cached(name, student_id, render, with_reference=False):
+    """
+    The HTML of fragment `name` for a student, from the cache when its stamp is
+    current. On a miss, render() builds it; if render() returns None, nothing is
+    cached and None is returned.
+    """
+    keys = _lookup_keys(name, student_id, with_reference)
+    html = _hit(keys, cache.get_many(keys))
+    if html is not None:
+        return html
+    # Read the stamp before rendering: a write that lands mid-render leaves the
+    # entry stale by stamp rather than by content.
+    stamp = _current_stamp(student_id, with_reference)
+    html = render()
+    if html is not None:
+        cache.set(keys[1], (stamp, str(html)), FRAGMENT_CACHE_TIMEOUT)
+        html = mark_safe(html)
+    return html
+
+
+async def arender_cached(name, student_id, arender, with_reference=False):
+    """Async counterpart of render_cached(); `arender` is a coroutine function."""
+    keys = _lookup_keys(name, student_id, with_reference)
+    html = _hit(keys, await cache.aget_many(keys))
+    if html is not None:
+        return html
+    stamp = await sync_to_async(_current_stamp)(student_id, with_reference)
+    html = await arender()
+    if html is not None:
+        await cache.aset(keys[1], (stamp, str(html)), FRAGMENT_CACHE_TIMEOUT)
+        html = mark_safe(html)
+    return html
+
+
+def _lookup_keys(name, student_id, with_reference):
+    keys = [_version_key(student_id), _fragment_key(name, student_id)]
+    return keys + [VERSION_KEY] if with_reference else keys
+
+
+def _hit(keys, found):
+    entry = found.get(keys[1])
+    stamp = (found.get(keys[0]), found.get(keys[2]) if len(keys) > 2 else None)
+    if entry is not None and stamp[0] is not None and entry[0] == stamp:
+        metrics.increment('fragment_cache.hits')
+        return mark_safe(entry[1])
+    metrics.increment('fragment_cache.misses')
+    return None
+
+
+def _current_stamp(student_id, with_reference):
+    return records_version(student_id), reference_version() if with_reference else None
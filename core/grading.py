@@ -0,0 +1,59 @@
+from django.conf import settings
+
+# ==============================================================================
+# Grade scales.
+#
+# AcademicRecord.grade is free text, so every numeric summary goes through a
+# named scale that maps grade strings to points. Scales can be registered in
+# code with register_grade_scale() or declared in settings.GRADE_SCALES; the
+# active one is settings.GRADE_SCALE.
+# ==============================================================================
+
+class GradeScale:
+    def __init__(self, name, points, pass_points):
+        self.name = name
+        # normalise keys once so lookups are a plain dict hit
+        self.points = {grade.strip().upper(): float(value) for grade, value in points.items()}
+        self.pass_points = float(pass_points)
+
+    def points_for(self, grade):
+        """Numeric points for `grade`, or None if the grade is not on this scale."""
+        if grade is None:
+            return None
+        return self.points.get(grade.strip().upper())
+
+    def is_pass(self, grade):
+        points = self.points_for(grade)
+        return points is not None and points >= self.pass_points
+
+
+_registry = {}
+
+
+def register_grade_scale(scale):
+    _registry[scale.name] = scale
+    return scale
+
+
+# UGC ten-point scale used by most Indian universities.
+register_grade_scale(GradeScale('ten_point', {
+    'O': 10, 'A+': 9, 'A': 8, 'B+': 7, 'B': 6, 'C': 5, 'P': 4, 'F': 0, 'AB': 0,
+}, pass_points=4))
+
+# US-style four-point scale.
+register_grade_scale(GradeScale('four_point', {
+    'A+': 4.0, 'A': 4.0, 'A-': 3.7, 'B+': 3.3, 'B': 3.0, 'B-': 2.7,
+    'C+': 2.3, 'C': 2.0, 'C-': 1.7, 'D+': 1.3, 'D': 1.0, 'F': 0.0,
+}, pass_points=1.0))
+
+# settings.GRADE_SCALES = {'name': {'points': {...}, 'pass_points': n}}
+for _name, _config in getattr(settings, 'GRADE_SCALES', {}).items():
+    register_grade_scale(GradeScale(_name, _config['points'], _config.get('pass_points', 0)))
+
+
+def get_grade_scale(name=None):
+    name = name or getattr(settings, 'GRADE_SCALE', 'ten_point')
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"Unknown grade scale '{name}'. Registered: {', '.join(sorted(_registry))}")
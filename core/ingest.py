@@ -0,0 +1,300 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Institution, Student, AcademicRecord, ExamResult
+from .signals import records_bulk_changed
+
+# ==============================================================================
+# Bulk ingestion of result files (CSV or JSONL).
+#
+# Rows are read lazily from the upload, validated in chunks against the model
+# fields, and written with bulk_create/bulk_update inside one transaction per
+# chunk. Students and institutions are resolved through in-memory lookup maps
+# that are filled once per distinct key, so a chunk costs a handful of queries
+# no matter how many rows it holds.
+#
+# Re-uploading the same file is safe: rows are upserted on a natural key,
+# e.g. (student, course_name, semester) for academic records.
+# ==============================================================================
+
+CHUNK_SIZE = 1000
+# Keep the response bounded even when every row of a huge file is broken.
+MAX_REPORTED_ERRORS = 1000
+
+
+class IngestSpec:
+    """Describes how rows map onto one record model."""
+    def __init__(self, model, key_fields, value_fields):
+        self.model = model
+        # natural key, always prefixed by the student
+        self.key_fields = key_fields
+        # fields read from the row (including the key fields)
+        self.value_fields = value_fields
+        self.model_fields = {name: model._meta.get_field(name) for name in value_fields}
+
+
+ACADEMIC_RECORDS = IngestSpec(
+    AcademicRecord,
+    key_fields=('course_name', 'semester'),
+    value_fields=('course_name', 'semester', 'grade', 'record_type'),
+)
+EXAM_RESULTS = IngestSpec(
+    ExamResult,
+    key_fields=('exam_name',),
+    value_fields=('exam_name', 'score', 'record_type'),
+)
+
+
+def detect_format(upload, requested=None):
+    """Return 'csv' or 'jsonl' from an explicit choice or the file name."""
+    fmt = (requested or '').lower()
+    if not fmt:
+        name = (getattr(upload, 'name', '') or '').lower()
+        fmt = 'jsonl' if name.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+    if fmt in ('json', 'ndjson'):
+        fmt = 'jsonl'
+    if fmt not in ('csv', 'jsonl'):
+        raise ValueError(f"Unsupported file format '{fmt}'. Use 'csv' or 'jsonl'.")
+    return fmt
+
+
+def iter_rows(upload, fmt):
+    """
+    Yields (row_number, row_dict, error) for every data row of the upload.
+    The file is decoded line by line, so it is never held in memory at once.
+    A file that turns out not to be UTF-8, or not to be valid CSV, ends with
+    one error row where reading stopped; the rows before it stand.
+    """
+    row_number = 0
+    try:
+        for row_number, row, error in _parse_lines(codecs.iterdecode(upload, 'utf-8-sig'), fmt):
+            yield row_number, row, error
+    except UnicodeDecodeError:
+        yield row_number + 1, None, {'non_field_errors': [
+            'The file is not UTF-8 encoded; reading stopped here. Save it as UTF-8 and upload the remaining rows.'
+        ]}
+    except csv.Error as exc:
+        yield row_number + 1, None, {'non_field_errors': [f'Malformed CSV ({exc}); reading stopped here.']}
+
+
+def _parse_lines(lines, fmt):
+    if fmt == 'csv':
+        for row_number, row in enumerate(csv.DictReader(lines), start=1):
+            yield row_number, row, None
+        return
+
+    row_number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield row_number, None, {'non_field_errors': [f'Invalid JSON: {exc}']}
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, {'non_field_errors': ['Each line must be a JSON object.']}
+            continue
+        yield row_number, row, None
+
+
+class RecordIngestor:
+    """Validates and upserts rows for one IngestSpec."""
+
+    def __init__(self, spec, default_institution=None, chunk_size=CHUNK_SIZE):
+        self.spec = spec
+        self.default_institution = default_institution
+        self.chunk_size = chunk_size
+        # lookup maps shared across chunks; None marks a key known not to exist
+        self.students_by_id = {}
+        self.students_by_username = {}
+        self.institutions = {}
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.errors = []
+
+    # --- Public API ---
+
+    def ingest(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self._ingest_chunk(chunk)
+        return self.report()
+
+    def report(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+    # --- Chunk processing ---
+
+    def _ingest_chunk(self, chunk):
+        self._resolve_lookups(row for _, row, error in chunk if error is None)
+
+        # Validate every row first; later rows win when a chunk repeats a key.
+        valid = {}
+        for row_number, row, error in chunk:
+            if error is None:
+                values, error = self._clean_row(row)
+            if error:
+                self._add_error(row_number, error)
+                continue
+            key = (values['student_id'],) + tuple(values[name] for name in self.spec.key_fields)
+            valid[key] = values
+
+        if valid:
+            with transaction.atomic():
+                self._write(valid)
+
+    def _resolve_lookups(self, rows):
+        ids, usernames, institution_ids = set(), set(), set()
+        for row in rows:
+            student = _text(row.get('student'))
+            username = _text(row.get('username'))
+            if student:
+                if student.isdigit() and int(student) not in self.students_by_id:
+                    ids.add(int(student))
+            elif username and username not in self.students_by_username:
+                usernames.add(username)
+            institution = _text(row.get('verified_by'))
+            if institution and institution.isdigit() and int(institution) not in self.institutions:
+                institution_ids.add(int(institution))
+
+        if ids:
+            found = set(Student.objects.filter(user_id__in=ids).values_list('user_id', flat=True))
+            self.students_by_id.update({pk: (pk if pk in found else None) for pk in ids})
+        if usernames:
+            found = dict(Student.objects.filter(user__username__in=usernames).values_list('user__username', 'user_id'))
+            self.students_by_username.update({name: found.get(name) for name in usernames})
+        if institution_ids:
+            found = set(Institution.objects.filter(pk__in=institution_ids).values_list('pk', flat=True))
+            self.institutions.update({pk: (pk if pk in found else None) for pk in institution_ids})
+
+    def _clean_row(self, row):
+        errors = {}
+        values = {}
+
+        student = _text(row.get('student'))
+        username = _text(row.get('username'))
+        if student:
+            student_id = self.students_by_id.get(int(student)) if student.isdigit() else None
+            if student_id is None:
+                errors['student'] = [f"Student '{student}' does not exist."]
+        elif username:
+            student_id = self.students_by_username.get(username)
+            if student_id is None:
+                errors['username'] = [f"Student '{username}' does not exist."]
+        else:
+            student_id = None
+            errors['student'] = ['Provide a student id or username.']
+        values['student_id'] = student_id
+
+        institution = _text(row.get('verified_by'))
+        if institution:
+            institution_id = self.institutions.get(int(institution)) if institution.isdigit() else None
+            if institution_id is None:
+                errors['verified_by'] = [f"Institution '{institution}' does not exist."]
+        else:
+            institution_id = self.default_institution.pk if self.default_institution else None
+            if institution_id is None:
+                errors['verified_by'] = ['No verifying institution available.']
+        values['verified_by_id'] = institution_id
+
+        for name, field in self.spec.model_fields.items():
+            raw = row.get(name)
+            if isinstance(raw, str):
+                raw = raw.strip()
+            try:
+                values[name] = field.clean(raw, None)
+            except ValidationError as exc:
+                errors[name] = exc.messages
+
+        return values, errors
+
+    def _write(self, valid):
+        spec = self.spec
+        model = spec.model
+        update_fields = ['verified_by_id'] + [name for name in spec.value_fields if name not in spec.key_fields]
+
+        # Fetch the rows that already exist for this chunk's natural keys.
+        existing = self._existing(valid, update_fields)
+
+        to_create, created_keys = [], []
+        # Changed rows are grouped by their new values: result files repeat the
+        # same grade/record type/verifier over and over, so a chunk collapses
+        # into a few "UPDATE ... WHERE id IN (...)" statements.
+        to_update = {}
+        changed_keys = set()
+        for key, values in valid.items():
+            current = existing.get(key)
+            if current is None:
+                to_create.append(model(**values))
+                created_keys.append(key)
+                continue
+            new_values = tuple(values[name] for name in update_fields)
+            if new_values != tuple(current[name] for name in update_fields):
+                to_update.setdefault(new_values, []).append(current['id'])
+                changed_keys.add(key)
+            else:
+                self.unchanged += 1
+
+        created_ids = []
+        if to_create:
+            model.objects.bulk_create(to_create, batch_size=self.chunk_size)
+            self.created += len(to_create)
+            created_ids = [row.pk for row in to_create]
+            if None in created_ids:
+                # MySQL doesn't return primary keys from bulk_create, so read them back.
+                created = self._existing(created_keys)
+                created_ids = [created[key]['id'] for key in created_keys if key in created]
+        for new_values, ids in to_update.items():
+            model.objects.filter(pk__in=ids).update(**dict(zip(update_fields, new_values)))
+            self.updated += len(ids)
+
+        # bulk_create/update() skip post_save, so tell the derived tables directly.
+        changed = [key for key in valid if existing.get(key) is None or key in changed_keys]
+        if changed:
+            records_bulk_changed.send(sender=model, values=[valid[key] for key in changed],
+                                      previous=[existing.get(key) for key in changed], created_ids=created_ids,
+                                      updated_ids=[pk for ids in to_update.values() for pk in ids])
+
+    def _existing(self, keys, fields=()):
+        """{natural key: row} for the rows among `keys` that exist, with id, the key and `fields`."""
+        spec = self.spec
+        rows = spec.model.objects.filter(
+            student_id__in={key[0] for key in keys},
+            **{f'{spec.key_fields[0]}__in': {key[1] for key in keys}},
+        ).values('id', 'student_id', *spec.key_fields, *fields)
+        found = {}
+        for row in rows:
+            key = (row['student_id'],) + tuple(row[name] for name in spec.key_fields)
+            found[key] = row
+        return found
+
+    def _add_error(self, row_number, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': error})
+
+
+def _text(value):
+    """Normalise CSV strings and JSON scalars to a stripped string."""
+    if value is None:
+        return ''
+    return str(value).strip()
@@ -0,0 +1,188 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+# ==============================================================================
+# Opt-in per-request instrumentation.
+#
+# For a sampled request the middleware records every query (count, total time,
+# repeated statements), plus view, serializer and template time. The numbers go
+# out as a Server-Timing header and one structured log line; requests slower
+# than INSTRUMENTATION_SLOW_MS also log their full query list.
+#
+# The current request's profile lives in a ContextVar. Code outside a sampled
+# request finds None there and skips all bookkeeping, so hooks cost one lookup.
+# INSTRUMENTATION_SAMPLE_RATE = 0 (the default) drops the middleware altogether.
+# ==============================================================================
+
+logger = logging.getLogger('markr.requests')
+
+_current = ContextVar('markr_request_profile', default=None)
+
+# Repeated statements are grouped by SQL with parameters stripped; IN lists of
+# any length count as the same statement.
+_in_list = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def fingerprint(sql):
+    return _in_list.sub('IN (...)', sql)
+
+
+class RequestProfile:
+    """Everything measured for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.fingerprints = Counter()
+        # (sql, seconds); only logged for slow requests
+        self.query_log = []
+        self.spans = Counter()
+        self._depth = Counter()
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            self.fingerprints[fingerprint(sql)] += 1
+            self.query_log.append((sql, elapsed))
+
+    def duplicates(self, limit=5):
+        return [{'sql': sql, 'count': count} for sql, count in self.fingerprints.most_common(limit) if count > 1]
+
+    def timings(self):
+        """{metric: milliseconds}"""
+        result = {name: round(seconds * 1000, 2) for name, seconds in self.spans.items()}
+        result['db'] = round(self.db_time * 1000, 2)
+        return result
+
+
+@contextmanager
+def span(name):
+    """Adds the enclosed time to `name` on the current profile; re-entrant calls count once."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    profile._depth[name] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile._depth[name] -= 1
+        if not profile._depth[name]:
+            profile.spans[name] += time.perf_counter() - started
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        wrapper._markr_timed = True
+        return wrapper
+    return decorator
+
+
+def _install_hooks():
+    """Time template rendering and DRF serialization. Idempotent."""
+    from django.template.base import Template
+    from rest_framework.serializers import ListSerializer, Serializer
+
+    for owner, attribute, name in ((Template, 'render', 'template'),
+                                   (Serializer, 'to_representation', 'serializer'),
+                                   (ListSerializer, 'to_representation', 'serializer')):
+        original = owner.__dict__[attribute]
+        if not getattr(original, '_markr_timed', False):
+            setattr(owner, attribute, timed(name)(original))
+
+
+def server_timing(profile, total):
+    metrics = [f'db;dur={profile.db_time * 1000:.1f};desc="{profile.queries} queries"']
+    duplicated = sum(count - 1 for count in profile.fingerprints.values() if count > 1)
+    if duplicated:
+        metrics.append(f'dup;desc="{duplicated} repeated queries"')
+    for name, seconds in sorted(profile.spans.items()):
+        metrics.append(f'{name};dur={seconds * 1000:.1f}')
+    metrics.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(metrics)
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Enable by setting INSTRUMENTATION_SAMPLE_RATE (fraction of requests to
+    profile, 0-1). INSTRUMENTATION_SLOW_MS sets the threshold above which the
+    full query list is logged.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 0)
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        self.slow_ms = getattr(settings, 'INSTRUMENTATION_SLOW_MS', 500)
+        self.get_response = get_response
+        _install_hooks()
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        if profile.view_started is not None:
+            # From URL resolution to the rendered response, as seen by this middleware.
+            profile.spans['view'] += time.perf_counter() - profile.view_started
+        total = time.perf_counter() - profile.started
+
+        response['Server-Timing'] = server_timing(profile, total)
+        self._log(request, response, profile, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current.get()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+
+    def _log(self, request, response, profile, total):
+        total_ms = round(total * 1000, 2)
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': total_ms,
+            'queries': profile.queries,
+            **{f'{name}_ms': value for name, value in profile.timings().items()},
+            'duplicates': profile.duplicates(),
+        }
+        if total_ms >= self.slow_ms:
+            entry['query_list'] = [{'sql': sql, 'ms': round(seconds * 1000, 2)} for sql, seconds in profile.query_log]
+            logger.warning(json.dumps(entry))
+        else:
+            logger.info(json.dumps(entry))
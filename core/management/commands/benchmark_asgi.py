@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import run_load
+from core.serializers import RoleTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-tests running servers and compares throughput and tail latency, e.g. '
+        '`gunicorn markR.wsgi` against `uvicorn markR.asgi`:\n'
+        '  manage.py benchmark_asgi --as registrar '
+        '--target wsgi=http://127.0.0.1:8000/api/academic-records/ '
+        '--target asgi=http://127.0.0.1:8001/api/async/academic-records/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='LABEL=URL',
+                            help='A labelled URL to load; repeat to compare servers or endpoints.')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per target.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Simultaneous client connections.')
+        parser.add_argument('--as', dest='username', help='Send a freshly minted JWT for this user.')
+        parser.add_argument('--token', help='Send this JWT access token instead.')
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per target before measuring.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        targets = []
+        for spec in options['target']:
+            label, sep, url = spec.partition('=')
+            if not sep or not url.startswith('http://'):
+                raise CommandError(f"Invalid --target '{spec}'; expected LABEL=http://host:port/path")
+            targets.append((label, url))
+
+        headers = {}
+        token = options['token']
+        if options['username']:
+            try:
+                user = User.objects.get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named '{options['username']}'.")
+            token = str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+
+        results = {}
+        for label, url in targets:
+            if options['warmup']:
+                asyncio.run(run_load(url, options['warmup'], min(options['warmup'], options['concurrency']), headers))
+            results[label] = asyncio.run(run_load(url, options['requests'], options['concurrency'], headers))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        columns = ('requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+        self.stdout.write(f"{'target':<12}" + ''.join(f'{column:>10}' for column in columns))
+        for label, result in results.items():
+            self.stdout.write(f'{label:<12}' + ''.join(f'{str(result[column]):>10}' for column in columns))
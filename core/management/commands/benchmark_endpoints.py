@@ -0,0 +1,137 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone as dt_timezone
+from fnmatch import fnmatch
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+
+from core.benchmark import compare_reports, profile_call
+from core.models import Institution, Student, AcademicRecord, CoCurricularRecord, ExamResult
+from core.serializers import RoleTokenObtainPairSerializer
+
+# name -> (who, url template). {student} is a student of the benchmarked institution.
+ENDPOINTS = {
+    'api.students.list': ('api', '/api/students/'),
+    'api.students.list_expanded': ('api', '/api/students/?expand=academic_records,exam_results'),
+    'api.students.retrieve': ('api', '/api/students/{student}/'),
+    'api.students.summary': ('api', '/api/students/{student}/summary/'),
+    'api.academic_records.list': ('api', '/api/academic-records/?page_size=100'),
+    'api.cocurricular_records.list': ('api', '/api/cocurricular-records/?page_size=100'),
+    'api.exam_results.list': ('api', '/api/exam-results/?page_size=100'),
+    'api.institutions.list': ('api', '/api/institutions/'),
+    'async.students.retrieve': ('api', '/api/async/students/{student}/'),
+    'async.academic_records.list': ('api', '/api/async/academic-records/?page_size=100'),
+    'frontend.institution_dashboard': ('staff', '/institution/dashboard/'),
+    'frontend.student_detail': ('staff', '/institution/student/{student}/'),
+    'frontend.dashboard': ('student', '/dashboard/'),
+}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=settings.BASE_DIR, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives the main API and frontend endpoints in-process against the current database (see seed_data) '
+        'and writes latency percentiles, query counts and peak memory per endpoint as a JSON report. '
+        'With --compare, fails when an endpoint regressed against a previous report.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--endpoint', action='append', metavar='PATTERN',
+                            help='Only endpoints matching this glob (e.g. "api.*"); repeatable.')
+        parser.add_argument('--institution', type=int, help='Institution to benchmark as (default: the largest).')
+        parser.add_argument('--output', '-o', help='Write the JSON report here (default: stdout).')
+        parser.add_argument('--compare', help='A previous report to compare against.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed p95 slowdown before --compare fails (0.2 = 20%%).')
+
+    def _institution(self, pk):
+        institutions = Institution.objects.exclude(admin_user=None).select_related('admin_user')
+        if pk is not None:
+            return institutions.filter(pk=pk).first()
+        # the institution with the most students, for the most realistic pages
+        largest = (Student.objects.filter(current_institution__admin_user__isnull=False)
+                   .values('current_institution').order_by().annotate(n=Count('pk'))
+                   .order_by('-n').values_list('current_institution', flat=True).first())
+        return institutions.filter(pk=largest).first() if largest else institutions.first()
+
+    def handle(self, *args, **options):
+        institution = self._institution(options['institution'])
+        if institution is None:
+            raise CommandError('No institution with an admin user; run `manage.py seed_data` first.')
+        student = Student.objects.filter(current_institution=institution).select_related('user').order_by('pk').first()
+        if student is None:
+            raise CommandError(f'{institution} has no students.')
+
+        selected = {
+            name: spec for name, spec in ENDPOINTS.items()
+            if not options['endpoint'] or any(fnmatch(name, pattern) for pattern in options['endpoint'])
+        }
+        if not selected:
+            raise CommandError('No endpoint matches --endpoint.')
+
+        token = RoleTokenObtainPairSerializer.get_token(institution.admin_user).access_token
+        clients = {'api': Client(HTTP_AUTHORIZATION=f'Bearer {token}'), 'staff': Client(), 'student': Client()}
+        clients['staff'].force_login(institution.admin_user)
+        clients['student'].force_login(student.user)
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, (who, template) in selected.items():
+                url = template.format(student=student.pk)
+                client = clients[who]
+                results[name] = {'url': url, **profile_call(lambda: client.get(url), options['iterations'],
+                                                            options['warmup'])}
+                self.stderr.write(f"{name:<34} p50 {results[name]['p50_ms']:>8} ms  p95 {results[name]['p95_ms']:>8} ms"
+                                  f"  {results[name]['queries']:>3} queries  {results[name]['peak_kib']:>9} KiB")
+
+        report = {
+            'meta': {
+                'created_at': datetime.now(dt_timezone.utc).isoformat(),
+                'git_revision': _git_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'institution': institution.pk,
+                'student': student.pk,
+                'scale': {
+                    'users': User.objects.count(),
+                    'institutions': Institution.objects.count(),
+                    'students': Student.objects.count(),
+                    'academic_records': AcademicRecord.objects.count(),
+                    'cocurricular_records': CoCurricularRecord.objects.count(),
+                    'exam_results': ExamResult.objects.count(),
+                },
+            },
+            'endpoints': results,
+        }
+        rendered = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(rendered + '\n')
+        else:
+            self.stdout.write(rendered)
+
+        if options['compare']:
+            baseline = json.loads(Path(options['compare']).read_text())
+            regressions = compare_reports(baseline, report, options['threshold'])
+            if regressions:
+                raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+            self.stderr.write(self.style.SUCCESS('No regressions against the baseline.'))
@@ -0,0 +1,74 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.fastpath import FastJSONRenderer, compile_reader, orjson
+from core.models import AcademicRecord, ExamResult
+from core.serializers import AcademicRecordSerializer, ExamResultSerializer
+
+
+def _academic_record(i, now):
+    return AcademicRecord(
+        id=i, student_id=i % 5000 + 1, course_name=f'Course {i % 300}', semester=i % 8 + 1,
+        grade='A+', record_type='COLLEGE', verified_by_id=i % 40 + 1, recorded_at=now - timedelta(seconds=i),
+    )
+
+
+def _exam_result(i, now):
+    return ExamResult(
+        id=i, student_id=i % 5000 + 1, exam_name=f'Exam {i % 50}', score=(i * 7919) % 10000 / 100,
+        record_type='UNIVERSITY', verified_by_id=i % 40 + 1, recorded_at=now - timedelta(seconds=i),
+    )
+
+
+MODELS = {
+    'academic': (AcademicRecordSerializer, _academic_record),
+    'exam': (ExamResultSerializer, _exam_result),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Times serializer + JSONRenderer against the core.fastpath reader + FastJSONRenderer on in-memory '
+        'rows (no database), checks the bytes match, and prints the speedup.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+        parser.add_argument('--model', choices=sorted(MODELS), default='academic')
+        parser.add_argument('--repeat', type=int, default=3, help='Best of N runs per measurement.')
+
+    def _best(self, repeat, func):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def handle(self, *args, **options):
+        serializer_class, make = MODELS[options['model']]
+        reader = compile_reader(serializer_class)
+        if reader is None:
+            raise CommandError(f'{serializer_class.__name__} is not supported by the fast path.')
+        labels = {pk: f'College {pk} (University {pk % 4})' for pk in range(1, 41)}
+        now = timezone.now()
+
+        self.stdout.write(f"encoder: {'orjson' if orjson else 'json (install orjson for the fast encoder)'}")
+        self.stdout.write(f"{'rows':>8} {'serializer s':>13} {'fast path s':>12} {'speedup':>8}")
+        for count in options['rows']:
+            instances = [make(i, now) for i in range(1, count + 1)]
+            rows = [tuple(getattr(obj, column) for column in reader.columns) for obj in instances]
+            context = {'institution_labels': labels}
+
+            slow_time, slow = self._best(options['repeat'], lambda: JSONRenderer().render(
+                {'results': serializer_class(instances, many=True, context=context).data}))
+            fast_time, fast = self._best(options['repeat'], lambda: FastJSONRenderer().render(
+                {'results': reader.convert(rows, labels=labels)}))
+            if slow != fast:
+                raise CommandError(f'Output differs at {count} rows.')
+            self.stdout.write(f'{count:>8} {slow_time:>13.3f} {fast_time:>12.3f} {slow_time / fast_time:>7.1f}x')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.changelog import COMPACT_AFTER_HOURS, RETENTION_DAYS, compact, horizon, prune
+
+
+class Command(BaseCommand):
+    help = (
+        'Trims the change log behind /api/changes/ (see core/changelog.py): drops entries superseded by a newer '
+        'entry for the same object, then entries past the retention period. Run daily, e.g. from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compact-after-hours', type=float, default=COMPACT_AFTER_HOURS,
+                            help='Only compact entries at least this old.')
+        parser.add_argument('--retention-days', type=float, default=RETENTION_DAYS,
+                            help='Delete entries older than this; 0 keeps everything.')
+
+    def handle(self, *args, **options):
+        compacted = compact(options['compact_after_hours'])
+        pruned = prune(options['retention_days']) if options['retention_days'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted {compacted} and pruned {pruned} entries; cursors before {horizon()} must resync.'
+        ))
@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.export import ENCODERS, EXPORT_CHUNK_SIZE, stream_export
+from core.models import Institution
+
+
+class Command(BaseCommand):
+    help = "Streams every record of an institution's students to a file or stdout as CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('institution_id', type=int)
+        parser.add_argument('--format', dest='fmt', choices=sorted(ENCODERS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip.')
+        parser.add_argument('--output', '-o', help='Write to this file instead of stdout.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            institution = Institution.objects.get(pk=options['institution_id'])
+        except Institution.DoesNotExist:
+            raise CommandError(f"Institution {options['institution_id']} does not exist.")
+
+        chunks = stream_export(institution, options['fmt'], options['gzip'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            output = sys.stdout.buffer
+            for chunk in chunks:
+                output.write(chunk)
+            output.flush()
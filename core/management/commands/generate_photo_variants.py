@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Student
+from core.photos import generate_variants
+
+
+class Command(BaseCommand):
+    help = 'Generates the resized variants of student photos that do not have them yet (e.g. uploaded before the pipeline).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate missing files for every photo, not only new ones.')
+
+    def handle(self, *args, **options):
+        students = Student.objects.exclude(photo='').exclude(photo__isnull=True)
+        if not options['all']:
+            students = students.filter(photo_variants={})
+        names = sorted(set(students.values_list('photo', flat=True)))
+        for i, name in enumerate(names, start=1):
+            try:
+                generate_variants(name)
+            except Exception as exc:
+                self.stderr.write(f'{name}: {exc}')
+            if i % 100 == 0:
+                self.stdout.write(f'{i}/{len(names)} photos processed')
+        self.stdout.write(self.style.SUCCESS(f'Processed {len(names)} photos.'))
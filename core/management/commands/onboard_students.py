@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ingest import detect_format, iter_rows
+from core.models import Institution
+from core.onboarding import ONBOARDING_BATCH_SIZE, RosterOnboarder
+
+
+class Command(BaseCommand):
+    help = ('Creates student accounts from a roster file (CSV or JSONL), hashing passwords across '
+            'ONBOARDING_WORKERS processes (default: one per core).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('roster', help='Path to the roster file.')
+        parser.add_argument('--institution', type=int, required=True, help='Institution the students join.')
+        parser.add_argument('--format', dest='fmt', choices=['csv', 'jsonl'])
+        parser.add_argument('--batch-size', type=int, default=ONBOARDING_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            institution = Institution.objects.get(pk=options['institution'])
+        except Institution.DoesNotExist:
+            raise CommandError(f"Institution {options['institution']} does not exist.")
+
+        with open(options['roster'], 'rb') as roster:
+            fmt = detect_format(roster, options['fmt'])
+            onboarder = RosterOnboarder(institution, batch_size=options['batch_size'])
+            report = onboarder.onboard(iter_rows(roster, fmt))
+
+        for problem in report['duplicates'] + report['errors']:
+            self.stderr.write(json.dumps(problem))
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} students; {len(report['duplicates'])} duplicates, "
+            f"{len(report['errors'])} invalid rows."
+        ))
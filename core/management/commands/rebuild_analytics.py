@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.analytics import REFRESH_BATCH_SIZE, rebuild_all, refresh_dirty
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the exam score and grade rollups behind /api/analytics/ (see core/analytics.py) from the '
+        'records. With --dirty, only folds in pending changes: run that from cron, or add --every to keep '
+        'doing it as a worker. The endpoints never refresh the rollups themselves.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dirty', action='store_true', help='Only refresh buckets marked dirty.')
+        parser.add_argument('--every', type=float, default=None, metavar='SECONDS',
+                            help='With --dirty, keep refreshing at this interval until interrupted.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Dirty marks per round, or exams/courses per round for a full rebuild.')
+
+    def handle(self, *args, **options):
+        if options['dirty']:
+            batch_size = options['batch_size'] or REFRESH_BATCH_SIZE
+            while True:
+                consumed = refresh_dirty(batch_size)
+                if options['every'] is None:
+                    self.stdout.write(self.style.SUCCESS(f'Folded {consumed} dirty marks into the rollups.'))
+                    return
+                if consumed:
+                    self.stdout.write(f'Folded {consumed} dirty marks into the rollups.')
+                # Long-lived loops must not hoard broken or expired connections.
+                close_old_connections()
+                time.sleep(options['every'])
+        exams, courses = rebuild_all(options['batch_size'] or 500)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups for {exams} exams and {courses} courses.'))
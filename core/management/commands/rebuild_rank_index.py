@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.ranking import rebuild_all
+
+
+class Command(BaseCommand):
+    help = (
+        'Recounts the exam score index behind result ranks and percentiles (see core/ranking.py) from the exam '
+        'results. Writes keep it current; run this after loading results outside the ORM.'
+    )
+
+    def handle(self, *args, **options):
+        exams = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'Recounted the scores of {exams} exams.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.summaries import rebuild_all_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the SemesterSummary table from every AcademicRecord.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Students recomputed per batch.')
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_all_summaries(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt semester summaries for {rebuilt} students.'))
@@ -0,0 +1,28 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from core.reports import run_workers
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs a pool of report workers that build queued mark sheets and result books (see core/reports.py). '
+        'Jobs left running by a worker that died are requeued automatically.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Jobs built in parallel.')
+        parser.add_argument('--processes', action='store_true',
+                            help='Use a process pool (rendering is CPU-bound) instead of threads.')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty.')
+
+    def handle(self, *args, **options):
+        mode = 'processes' if options['processes'] else 'threads'
+        self.stdout.write(f"Starting {options['workers']} report workers ({mode}).")
+        try:
+            processed = run_workers(options['workers'], options['processes'], options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped.')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} report jobs.'))
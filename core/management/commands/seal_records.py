@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.sealing import SEAL_BATCH_SIZE, seal_pending
+
+
+class Command(BaseCommand):
+    help = (
+        'Seals every academic, co-curricular and exam record that has no seal yet into signed per-institution '
+        'Merkle batches (see core/sealing.py). Safe to run repeatedly, e.g. from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--institution', type=int, action='append', help='Only this institution; repeatable.')
+        parser.add_argument('--batch-size', type=int, default=SEAL_BATCH_SIZE, help='Records per signed batch.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        batches = seal_pending(options['institution'], options['batch_size'])
+        elapsed = time.perf_counter() - started
+        for batch in batches:
+            self.stdout.write(f'institution {batch.institution_id} #{batch.sequence}: {batch.size} records, root {batch.root}')
+        sealed = sum(batch.size for batch in batches)
+        rate = f' ({sealed / elapsed:,.0f} records/s)' if sealed and elapsed else ''
+        self.stdout.write(self.style.SUCCESS(f'Sealed {sealed} records in {len(batches)} batches{rate}.'))
@@ -0,0 +1,118 @@
+import hashlib
+import json
+
+# ==============================================================================
+# Merkle trees and offline proof checking for sealed records (core.sealing).
+#
+# Hashing follows RFC 6962 (Certificate Transparency): leaf = SHA-256(0x00 || data),
+# node = SHA-256(0x01 || left || right). A level with an odd number of nodes
+# carries its last node up unhashed, which gives the same root as the RFC's
+# largest-power-of-two split. Hashes are hex strings throughout.
+#
+# This module deliberately imports nothing from Django or the rest of markR: a
+# verifier can copy it alongside a proof bundle and check it with only Python
+# and the `cryptography` package (needed for the Ed25519 signatures).
+# ==============================================================================
+
+BUNDLE_FORMAT = 'markr-proof-bundle/1'
+
+
+def canonical_json(value):
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def leaf_hash(record):
+    """Leaf hash of a record dict (see core.sealing for the fields)."""
+    return hashlib.sha256(b'\x00' + canonical_json(record)).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def build_tree(leaves):
+    """
+    (root, proofs) for a list of leaf hashes; proofs[i] is the inclusion proof
+    (audit path, leaf to root) of leaves[i].
+    """
+    if not leaves:
+        raise ValueError('A Merkle tree needs at least one leaf.')
+    proofs = [[] for _ in leaves]
+    # positions[i]: index of leaf i's ancestor in the current level
+    positions = list(range(len(leaves)))
+    level = list(leaves)
+    while len(level) > 1:
+        for leaf, position in enumerate(positions):
+            sibling = position ^ 1
+            if sibling < len(level):
+                proofs[leaf].append(level[sibling])
+            positions[leaf] = position // 2
+        level = [node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+    return level[0], proofs
+
+
+def root_from_proof(leaf, index, size, proof):
+    """The root that `proof` leads to from `leaf` at `index` in a tree of `size` leaves."""
+    if not 0 <= index < size:
+        raise ValueError('Leaf index out of range.')
+    proof = iter(proof)
+    node = leaf
+    try:
+        while size > 1:
+            if index % 2:
+                node = node_hash(next(proof), node)
+            elif index + 1 < size:
+                node = node_hash(node, next(proof))
+            index, size = index // 2, (size + 1) // 2
+    except StopIteration:
+        raise ValueError('Proof is too short.') from None
+    if next(proof, None) is not None:
+        raise ValueError('Proof is too long.')
+    return node
+
+
+def batch_message(batch):
+    """The bytes an institution's seal batch signature covers."""
+    return canonical_json({name: batch[name] for name in
+                           ('institution', 'sequence', 'root', 'size', 'previous_root', 'sealed_at')})
+
+
+def verify_signature(public_key_hex, message, signature_hex):
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+    try:
+        Ed25519PublicKey.from_public_bytes(bytes.fromhex(public_key_hex)).verify(bytes.fromhex(signature_hex), message)
+    except (InvalidSignature, ValueError):
+        return False
+    return True
+
+
+def verify_bundle(bundle, public_key, published_roots=None):
+    """
+    Checks every record in a proof bundle offline. `public_key` is the hex
+    Ed25519 key the roots are signed with. `published_roots`, if given, is the
+    `roots` list served by /api/seals/roots/; each batch must match its published
+    root. Returns [(record, problem or None)].
+    """
+    if bundle.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"Not a {BUNDLE_FORMAT} bundle.")
+    published = {(root['institution'], root['sequence']): root['root'] for root in published_roots or ()}
+    results = []
+    for entry in bundle['records']:
+        record, batch = entry['record'], entry['batch']
+        problem = None
+        try:
+            root = root_from_proof(leaf_hash(record), entry['leaf_index'], batch['size'], entry['proof'])
+        except ValueError as exc:
+            problem = str(exc)
+        else:
+            if root != batch['root']:
+                problem = 'Record does not match the sealed root.'
+            elif not verify_signature(public_key, batch_message(batch), batch['signature']):
+                problem = 'Bad signature on the root.'
+            elif published_roots is not None and published.get((batch['institution'], batch['sequence'])) != root:
+                problem = 'Root is not among the published roots.'
+        results.append((record, problem))
+    return results
@@ -0,0 +1,29 @@
+import threading
+from collections import Counter
+
+# ==============================================================================
+# Process-local counters for tuning caches and other hot paths.
+#
+# Counting happens on every request, so it must be cheap: a dict increment under
+# a lock, no cache or database round trip. Each worker process keeps its own
+# numbers; GET /api/metrics/ reports those of the process that serves it.
+# ==============================================================================
+
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def snapshot():
+    """A plain dict copy of every counter, sorted by name."""
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def reset():
+    with _lock:
+        _counters.clear()
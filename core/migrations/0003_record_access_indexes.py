@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_semestersummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='academicrecord',
+            index=models.Index(fields=['student', 'semester'], name='acad_student_semester_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='academicrecord',
+            index=models.Index(fields=['student', 'record_type'], name='acad_student_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='academicrecord',
+            index=models.Index(fields=['verified_by', 'recorded_at'], name='acad_verifier_recorded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='academicrecord',
+            index=models.Index(fields=['recorded_at', 'id'], name='acad_recorded_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cocurricularrecord',
+            index=models.Index(fields=['student', 'record_type'], name='cocur_student_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examresult',
+            index=models.Index(fields=['student', 'record_type'], name='exam_student_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examresult',
+            index=models.Index(fields=['verified_by', 'recorded_at'], name='exam_verifier_recorded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examresult',
+            index=models.Index(fields=['exam_name', 'score'], name='exam_name_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examresult',
+            index=models.Index(fields=['recorded_at', 'id'], name='exam_recorded_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_institution_admin_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
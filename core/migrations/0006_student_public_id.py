@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Step 1 of 3: a unique default can't be added to existing rows in one go
+    # (every row would get the same UUID), so the column starts out nullable.
+
+    dependencies = [
+        ('core', '0005_student_photo_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='public_id',
+            field=models.UUIDField(null=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:05
+
+import uuid
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def populate_public_ids(apps, schema_editor):
+    Student = apps.get_model('core', 'Student')
+    missing = Student.objects.filter(public_id__isnull=True).only('pk')
+    while True:
+        batch = list(missing[:BATCH_SIZE])
+        if not batch:
+            break
+        for student in batch:
+            student.public_id = uuid.uuid4()
+        Student.objects.bulk_update(batch, ['public_id'])
+
+
+class Migration(migrations.Migration):
+    # Step 2 of 3: give every existing student their own UUID.
+
+    dependencies = [
+        ('core', '0006_student_public_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_public_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:05
+
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Step 3 of 3: every row has a UUID now; make the column required and unique.
+
+    dependencies = [
+        ('core', '0007_populate_student_public_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='student',
+            name='public_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
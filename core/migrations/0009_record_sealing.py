@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_student_public_id_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SealBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('root', models.CharField(max_length=64)),
+                ('previous_root', models.CharField(blank=True, max_length=64, null=True)),
+                ('size', models.PositiveIntegerField()),
+                ('signature', models.CharField(max_length=128)),
+                ('key_id', models.CharField(max_length=16)),
+                ('sealed_at', models.DateTimeField()),
+                ('institution', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='seal_batches', to='core.institution')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecordSeal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_kind', models.CharField(choices=[('academic', 'Academic record'), ('cocurricular', 'Co-curricular record'), ('exam', 'Exam result')], max_length=20)),
+                ('record_id', models.PositiveBigIntegerField()),
+                ('leaf_index', models.PositiveIntegerField()),
+                ('proof', models.JSONField(default=list)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seals', to='core.sealbatch')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='sealbatch',
+            constraint=models.UniqueConstraint(fields=('institution', 'sequence'), name='unique_institution_seal_sequence'),
+        ),
+        migrations.AddConstraint(
+            model_name='recordseal',
+            constraint=models.UniqueConstraint(fields=('record_kind', 'record_id'), name='unique_record_seal'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_record_sealing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogHorizon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pruned_through', models.PositiveBigIntegerField(default=0)),
+                ('pruned_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangeLogSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_position', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('position', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('kind', models.CharField(choices=[('student', 'Student'), ('academic', 'Academic record'), ('cocurricular', 'Co-curricular record'), ('exam', 'Exam result')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('student_id', models.PositiveBigIntegerField()),
+                ('action', models.CharField(choices=[('create', 'Created'), ('update', 'Updated'), ('delete', 'Deleted')], max_length=10)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'object_id', 'id'], name='changelog_object_idx'), models.Index(fields=['changed_at'], name='changelog_changed_at_idx'), models.Index(fields=['position'], name='changelog_position_idx')],
+            },
+        ),
+    ]
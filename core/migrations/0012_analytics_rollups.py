@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_report_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyRollupBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('exam', 'Exam scores'), ('grade', 'Grades')], max_length=10)),
+                ('name', models.CharField(max_length=255)),
+                ('semester', models.PositiveIntegerField(default=0)),
+                ('institution_id', models.PositiveBigIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExamScoreRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_name', models.CharField(max_length=255)),
+                ('scope', models.CharField(choices=[('institution', 'Institution'), ('university', 'University'), ('all', 'All universities')], max_length=12)),
+                ('scope_id', models.PositiveBigIntegerField()),
+                ('count', models.PositiveIntegerField()),
+                ('pass_count', models.PositiveIntegerField()),
+                ('mean', models.FloatField()),
+                ('minimum', models.FloatField()),
+                ('p10', models.FloatField()),
+                ('p25', models.FloatField()),
+                ('median', models.FloatField()),
+                ('p75', models.FloatField()),
+                ('p90', models.FloatField()),
+                ('maximum', models.FloatField()),
+                ('histogram', models.JSONField(default=list)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('university', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.university')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scope', 'university'], name='exam_rollup_scope_uni_idx')],
+                'constraints': [models.UniqueConstraint(fields=('exam_name', 'scope', 'scope_id'), name='unique_exam_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GradeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course_name', models.CharField(max_length=100)),
+                ('semester', models.PositiveIntegerField()),
+                ('record_count', models.PositiveIntegerField()),
+                ('graded_count', models.PositiveIntegerField()),
+                ('pass_count', models.PositiveIntegerField()),
+                ('points_total', models.FloatField()),
+                ('distribution', models.JSONField(default=dict)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('institution', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.institution')),
+                ('university', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.university')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['university', 'institution'], name='grade_rollup_hierarchy_idx')],
+                'constraints': [models.UniqueConstraint(fields=('course_name', 'semester', 'institution'), name='unique_grade_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:53
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_scores(apps, schema_editor):
+    ExamResult = apps.get_model('core', 'ExamResult')
+    ExamScoreCount = apps.get_model('core', 'ExamScoreCount')
+    rows = ExamResult.objects.values_list('exam_name', 'score').annotate(count=Count('id')).order_by()
+    ExamScoreCount.objects.bulk_create(
+        [ExamScoreCount(exam_name=name, score=score, count=count) for name, score, count in rows.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamScoreCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_name', models.CharField(max_length=255)),
+                ('score', models.FloatField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('exam_name', 'score'), name='unique_exam_score_count')],
+            },
+        ),
+        migrations.RunPython(count_scores, migrations.RunPython.noop),
+    ]
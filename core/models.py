@@ -1,5 +1,10 @@
-from django.db import models
+import uuid
+
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .storage import report_storage
 
 # ==============================================================================
 # NEW MODEL: The top of the hierarchy, managed by the Admin.
@@ -21,24 +26,76 @@ class Institution(models.Model):
     address = models.TextField()
     contact_email = models.EmailField(blank=True, null=True)
     status = models.CharField(max_length=50, default='active')
+    # The staff account that manages this institution's dashboard.
+    admin_user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='managed_institution')
 
     def __str__(self):
         return f"{self.name} ({self.university.name})"
 
+    @classmethod
+    def for_user(cls, user):
+        """The institution managed by `user`, or None."""
+        if user is None or not user.is_authenticated:
+            return None
+        return cls.objects.select_related('university').filter(admin_user=user).first()
+
+# ==============================================================================
+# QuerySets: keep the joins needed for serialization in one place so every
+# list/retrieve path issues a fixed number of queries regardless of row count.
+# Serializers render institutions from the reference cache (core.reference),
+# so API querysets don't join them; with_verifier() is for code that renders
+# record.verified_by through Institution.__str__ itself.
+# ==============================================================================
+class RecordQuerySet(models.QuerySet):
+    def with_verifier(self):
+        # verified_by is rendered through Institution.__str__, which reads university.name
+        return self.select_related('verified_by__university')
+
+
+class StudentQuerySet(models.QuerySet):
+    def with_profile(self):
+        # user is rendered through its __str__ method
+        return self.select_related('user')
+
+    def with_records(self, *relations):
+        # all three record sets unless the caller names the ones it renders
+        relations = relations or ('academicrecord_set', 'cocurricularrecord_set', 'examresult_set')
+        return self.with_profile().prefetch_related(*relations)
+
+# ==============================================================================
+# Models whose writes are recorded in the change log (core.changelog). save()
+# runs in a transaction so the post_save handlers, and the log entry they
+# write, commit or roll back together with the row. Deletes already do.
+# ==============================================================================
+class ChangeLogged(models.Model):
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
 # ==============================================================================
 # MODIFIED MODEL: Added fields for students to edit themselves.
 # ==============================================================================
-class Student(models.Model):
+class Student(ChangeLogged):
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    # Shared with third parties to verify the student's records (GET /api/verify/<public_id>/).
+    public_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     # The institution that currently holds the student's records
     current_institution = models.ForeignKey(Institution, on_delete=models.SET_NULL, null=True, blank=True)
     
     # --- NEW: Fields editable by the student ---
     photo = models.ImageField(upload_to='student_photos/', null=True, blank=True)
+    # Resized copies of `photo`, {variant: storage name}; filled in by core.photos.
+    photo_variants = models.JSONField(default=dict, blank=True)
     phone_no = models.CharField(max_length=20, null=True, blank=True)
     # The user's primary email will be on the User model, this can be a secondary one
     contact_email = models.EmailField(null=True, blank=True)
 
+    objects = StudentQuerySet.as_manager()
+
     # Note: Students cannot be removed, so we don't need a status field.
     # To "deactivate", an admin could deactivate their User account.
 
@@ -53,7 +110,7 @@ RECORD_TYPE_CHOICES = [
     ('COLLEGE', 'College Level'),
 ]
 
-class AcademicRecord(models.Model):
+class AcademicRecord(ChangeLogged):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     course_name = models.CharField(max_length=100)
     semester = models.PositiveIntegerField()
@@ -64,10 +121,23 @@ class AcademicRecord(models.Model):
     verified_by = models.ForeignKey(Institution, on_delete=models.PROTECT, help_text="The institution that verified this record.")
     recorded_at = models.DateTimeField(auto_now_add=True)
 
+    objects = RecordQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # a student's transcript, semester by semester
+            models.Index(fields=['student', 'semester'], name='acad_student_semester_idx'),
+            models.Index(fields=['student', 'record_type'], name='acad_student_type_idx'),
+            # an institution's records, newest first
+            models.Index(fields=['verified_by', 'recorded_at'], name='acad_verifier_recorded_idx'),
+            # keyset pagination order (core.pagination.RecordPagination)
+            models.Index(fields=['recorded_at', 'id'], name='acad_recorded_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.student.user.username} - {self.course_name}"
 
-class CoCurricularRecord(models.Model):
+class CoCurricularRecord(ChangeLogged):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     activity_name = models.CharField(max_length=255)
     description = models.TextField()
@@ -77,12 +147,19 @@ class CoCurricularRecord(models.Model):
     record_type = models.CharField(max_length=20, choices=RECORD_TYPE_CHOICES)
     verified_by = models.ForeignKey(Institution, on_delete=models.PROTECT, help_text="The institution that verified this record.")
 
+    objects = RecordQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'record_type'], name='cocur_student_type_idx'),
+        ]
+
     def __str__(self):
         return f"{self.student.user.username} - {self.activity_name}"
     
 
 
-class ExamResult(models.Model):
+class ExamResult(ChangeLogged):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     exam_name = models.CharField(max_length=255)
     score = models.FloatField()
@@ -92,5 +169,292 @@ class ExamResult(models.Model):
     verified_by = models.ForeignKey(Institution, on_delete=models.PROTECT, help_text="The institution that verified this record.")
     recorded_at = models.DateTimeField(auto_now_add=True)
 
+    objects = RecordQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'record_type'], name='exam_student_type_idx'),
+            models.Index(fields=['verified_by', 'recorded_at'], name='exam_verifier_recorded_idx'),
+            # rankings: all scores of one exam, in score order
+            models.Index(fields=['exam_name', 'score'], name='exam_name_score_idx'),
+            # keyset pagination order (core.pagination.RecordPagination)
+            models.Index(fields=['recorded_at', 'id'], name='exam_recorded_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.user.username} - {self.exam_name}"    
+
+# ==============================================================================
+# DERIVED DATA: Per-student/semester transcript summary.
+# Maintained by core.summaries from the AcademicRecord write paths; never
+# edited by hand. `rebuild_summaries` recomputes the whole table.
+# ==============================================================================
+class SemesterSummary(models.Model):
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='semester_summaries')
+    semester = models.PositiveIntegerField()
+    record_count = models.PositiveIntegerField(default=0)
+    # records whose grade is on the active grade scale
+    graded_count = models.PositiveIntegerField(default=0)
+    passed_count = models.PositiveIntegerField(default=0)
+    points_total = models.FloatField(default=0)
+    gpa = models.FloatField(null=True, blank=True)
+    latest_recorded_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'semester'], name='unique_student_semester_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - semester {self.semester}"
+
+# ==============================================================================
+# SEALING: institutions' verified records, batched into signed Merkle trees.
+# Written by core.sealing (manage.py seal_records); a record's RecordSeal holds
+# its inclusion proof. Editing a sealed record deletes its seal, so the new
+# content is sealed again in a later batch.
+# ==============================================================================
+SEALED_RECORD_KINDS = [
+    ('academic', 'Academic record'),
+    ('cocurricular', 'Co-curricular record'),
+    ('exam', 'Exam result'),
+]
+
+class SealBatch(models.Model):
+    institution = models.ForeignKey(Institution, on_delete=models.PROTECT, related_name='seal_batches')
+    # 1, 2, 3... per institution; each batch signs the previous batch's root too
+    sequence = models.PositiveIntegerField()
+    root = models.CharField(max_length=64)
+    previous_root = models.CharField(max_length=64, null=True, blank=True)
+    size = models.PositiveIntegerField()
+    signature = models.CharField(max_length=128)
+    key_id = models.CharField(max_length=16)
+    sealed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['institution', 'sequence'], name='unique_institution_seal_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.institution_id} #{self.sequence}"
+
+class RecordSeal(models.Model):
+    batch = models.ForeignKey(SealBatch, on_delete=models.CASCADE, related_name='seals')
+    record_kind = models.CharField(max_length=20, choices=SEALED_RECORD_KINDS)
+    record_id = models.PositiveBigIntegerField()
+    leaf_index = models.PositiveIntegerField()
+    # audit path from the record's leaf to the batch root, as hex hashes
+    proof = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['record_kind', 'record_id'], name='unique_record_seal'),
+        ]
+
+    def __str__(self):
+        return f"{self.record_kind} {self.record_id} in {self.batch}"
+
+# ==============================================================================
+# CHANGE LOG: append-only creates/updates/deletes of students and their
+# records, for incremental sync through GET /api/changes/?since=<cursor>.
+# Written by core.changelog in the same transaction as the change, given a
+# position in commit order once committed, and trimmed by
+# `manage.py compact_changelog`.
+# ==============================================================================
+CHANGE_KINDS = [('student', 'Student')] + SEALED_RECORD_KINDS
+
+CHANGE_ACTIONS = [
+    ('create', 'Created'),
+    ('update', 'Updated'),
+    ('delete', 'Deleted'),
+]
+
+class ChangeLogEntry(models.Model):
+    # insertion order, which is not commit order
+    id = models.BigAutoField(primary_key=True)
+    # the cursor, handed out in commit order by core.changelog.sequence();
+    # null until then. Consumers ask for entries after the last one they processed.
+    position = models.PositiveBigIntegerField(null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=CHANGE_KINDS)
+    object_id = models.PositiveBigIntegerField()
+    # plain ids rather than foreign keys: entries outlive deleted rows
+    student_id = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=10, choices=CHANGE_ACTIONS)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # compaction: an object's entries, newest last
+            models.Index(fields=['kind', 'object_id', 'id'], name='changelog_object_idx'),
+            models.Index(fields=['changed_at'], name='changelog_changed_at_idx'),
+            # the feed, and entries still waiting for a position
+            models.Index(fields=['position'], name='changelog_position_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.action} {self.kind} {self.object_id}"
+
+class ChangeLogSequence(models.Model):
+    """Single row: the highest change-log position handed out. Locked while positions are assigned."""
+    last_position = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"positions through {self.last_position}"
+
+class ChangeLogHorizon(models.Model):
+    """Single row: the highest position dropped by retention. Older cursors can't resume."""
+    pruned_through = models.PositiveBigIntegerField(default=0)
+    pruned_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"pruned through #{self.pruned_through}"
+
+# ==============================================================================
+# REPORT JOBS: printable mark sheets and result books, built in the background
+# by `manage.py run_report_workers` (core.reports). The row is the queue: a
+# worker claims a queued job, reports progress and a heartbeat as it goes, and
+# stores the finished document in `artifact`, in the private report storage
+# (core.storage).
+# ==============================================================================
+REPORT_KINDS = [
+    ('mark_sheets', 'Mark sheets'),
+    ('result_book', 'Semester result book'),
+]
+
+REPORT_STATUSES = [
+    ('queued', 'Queued'),
+    ('running', 'Running'),
+    ('done', 'Done'),
+    ('failed', 'Failed'),
+]
+
+class ReportJob(models.Model):
+    institution = models.ForeignKey(Institution, on_delete=models.CASCADE, related_name='report_jobs')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=REPORT_KINDS)
+    # {'student_ids': [...] or None for all current students, 'semester': n}
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=REPORT_STATUSES, default='queued')
+    # students rendered so far, out of total
+    done = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    artifact = models.FileField(storage=report_storage, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # workers: the oldest queued job; stale running ones
+            models.Index(fields=['status', 'id'], name='reportjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+# ==============================================================================
+# ANALYTICS ROLLUPS: derived tables behind /api/analytics/ (core.analytics).
+# Record writes only mark the buckets they touch as dirty; refresh_dirty()
+# recomputes just those. `manage.py rebuild_analytics` recomputes everything.
+# ==============================================================================
+ANALYTICS_SCOPES = [
+    ('institution', 'Institution'),
+    ('university', 'University'),
+    ('all', 'All universities'),
+]
+
+class ExamScoreRollup(models.Model):
+    """Score statistics of one exam within an institution, a university, or overall."""
+    exam_name = models.CharField(max_length=255)
+    scope = models.CharField(max_length=12, choices=ANALYTICS_SCOPES)
+    # institution or university id per scope; 0 for 'all'
+    scope_id = models.PositiveBigIntegerField()
+    university = models.ForeignKey(University, on_delete=models.CASCADE, null=True, blank=True)
+    count = models.PositiveIntegerField()
+    pass_count = models.PositiveIntegerField()
+    mean = models.FloatField()
+    minimum = models.FloatField()
+    p10 = models.FloatField()
+    p25 = models.FloatField()
+    median = models.FloatField()
+    p75 = models.FloatField()
+    p90 = models.FloatField()
+    maximum = models.FloatField()
+    # counts per score band, see core.analytics.score_bands()
+    histogram = models.JSONField(default=list)
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['exam_name', 'scope', 'scope_id'], name='unique_exam_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['scope', 'university'], name='exam_rollup_scope_uni_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.exam_name} ({self.scope} {self.scope_id})"
+
+class GradeRollup(models.Model):
+    """Grade distribution of one course and semester at one institution. Counts add up across rows."""
+    course_name = models.CharField(max_length=100)
+    semester = models.PositiveIntegerField()
+    institution = models.ForeignKey(Institution, on_delete=models.CASCADE)
+    university = models.ForeignKey(University, on_delete=models.CASCADE)
+    record_count = models.PositiveIntegerField()
+    # records whose grade is on the active grade scale
+    graded_count = models.PositiveIntegerField()
+    pass_count = models.PositiveIntegerField()
+    points_total = models.FloatField()
+    # {grade: count}
+    distribution = models.JSONField(default=dict)
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course_name', 'semester', 'institution'], name='unique_grade_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['university', 'institution'], name='grade_rollup_hierarchy_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course_name} semester {self.semester} @ {self.institution_id}"
+
+class DirtyRollupBucket(models.Model):
+    """
+    A rollup bucket whose records changed. Written in the same transaction as
+    the change; a bucket may be marked many times before it is refreshed.
+    """
+    kind = models.CharField(max_length=10, choices=[('exam', 'Exam scores'), ('grade', 'Grades')])
+    # exam or course name
+    name = models.CharField(max_length=255)
+    semester = models.PositiveIntegerField(default=0)  # 0 for exams
+    institution_id = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return f"{self.kind} {self.name} {self.semester} @ {self.institution_id}"
+
+# ==============================================================================
+# EXAM RANK INDEX: how many results of each exam have each distinct score,
+# kept current on every write (core.ranking). Rank and percentile lookups
+# bisect a cached copy instead of counting ExamResult rows.
+# ==============================================================================
+class ExamScoreCount(models.Model):
+    exam_name = models.CharField(max_length=255)
+    score = models.FloatField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['exam_name', 'score'], name='unique_exam_score_count'),
+        ]
+
     def __str__(self):
-        return f"{self.student.user.username} - {self.exam_name}"    
\ No newline at end of file
+        return f"{self.exam_name}: {self.count} x {self.score}"
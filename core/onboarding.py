@@ -0,0 +1,182 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .changelog import log_changes
+from .dashboard import invalidate_institution_stats
+from .models import Student
+from .roles import STUDENTS, invalidate_user_roles
+
+# ==============================================================================
+# Bulk student onboarding from a roster file.
+#
+# Password hashing (PBKDF2, ~100 ms of CPU each) is the bottleneck, so it is
+# spread over a process pool; the database side is a few bulk INSERTs per batch
+# for users, students and Students-group memberships. Duplicate usernames are
+# reported per row and never abort the batch.
+# ==============================================================================
+
+ONBOARDING_BATCH_SIZE = 500
+
+_username_validator = UnicodeUsernameValidator()
+_pool = None
+
+
+def _init_worker():
+    # Needed under the 'spawn' start method; a no-op for forked workers.
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'markR.settings')
+    django.setup()
+
+
+def hashing_workers():
+    """Size of the hashing pool: ONBOARDING_WORKERS, or one process per CPU."""
+    return getattr(settings, 'ONBOARDING_WORKERS', None) or os.cpu_count()
+
+
+def get_hashing_pool():
+    """A process pool shared by every onboarding run in this process."""
+    global _pool
+    if _pool is None:
+        # Sized from the setting only, never by whichever caller came first.
+        _pool = ProcessPoolExecutor(max_workers=hashing_workers(), initializer=_init_worker)
+    return _pool
+
+
+class RosterOnboarder:
+    """
+    Creates a User + Student (+ Students group membership) for every roster row.
+    ONBOARDING_WORKERS = 1 hashes in-process, which is what the tests use.
+    """
+
+    def __init__(self, institution, batch_size=ONBOARDING_BATCH_SIZE):
+        self.institution = institution
+        self.workers = hashing_workers()
+        self.batch_size = batch_size
+        self.group, _ = Group.objects.get_or_create(name=STUDENTS)
+        self.seen = set()
+        self.created = 0
+        self.duplicates = []
+        self.errors = []
+
+    def onboard(self, rows):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self._onboard_batch(batch)
+        if self.created and self.institution is not None:
+            invalidate_institution_stats(self.institution.pk)
+        return {
+            'created': self.created,
+            'duplicates': sorted(self.duplicates, key=lambda item: item['row']),
+            'errors': self.errors,
+        }
+
+    # --- Batch processing ---
+
+    def _onboard_batch(self, batch):
+        candidates = []
+        for row_number, row, error in batch:
+            if error is None:
+                row, error = self._clean_row(row)
+            if error:
+                self.errors.append({'row': row_number, 'errors': error})
+                continue
+            if row['username'] in self.seen:
+                self.duplicates.append({'row': row_number, 'username': row['username'],
+                                        'reason': 'Repeated earlier in the roster.'})
+                continue
+            self.seen.add(row['username'])
+            candidates.append((row_number, row))
+
+        existing = set(User.objects.filter(
+            username__in=[row['username'] for _, row in candidates]
+        ).values_list('username', flat=True))
+        fresh = []
+        for row_number, row in candidates:
+            if row['username'] in existing:
+                self.duplicates.append({'row': row_number, 'username': row['username'],
+                                        'reason': 'A user with that username already exists.'})
+            else:
+                fresh.append((row_number, row))
+        if not fresh:
+            return
+
+        hashes = self._hash([row.pop('password') for _, row in fresh])
+        users = [User(password=password, **row) for (_, row), password in zip(fresh, hashes)]
+        try:
+            with transaction.atomic():
+                self._create(users)
+        except IntegrityError:
+            # Someone registered one of these usernames since we checked;
+            # fall back to row-by-row so only the clashing rows are rejected.
+            for (row_number, row), user in zip(fresh, users):
+                user.pk = None
+                try:
+                    with transaction.atomic():
+                        self._create([user])
+                except IntegrityError:
+                    self.duplicates.append({'row': row_number, 'username': row['username'],
+                                            'reason': 'A user with that username already exists.'})
+
+    def _create(self, users):
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        # MySQL doesn't return primary keys from bulk_create, so read them back.
+        ids = list(User.objects.filter(username__in=[user.username for user in users]).values_list('pk', flat=True))
+        Student.objects.bulk_create(
+            [Student(user_id=pk, current_institution=self.institution) for pk in ids], batch_size=self.batch_size
+        )
+        User.groups.through.objects.bulk_create(
+            [User.groups.through(user_id=pk, group_id=self.group.pk) for pk in ids], batch_size=self.batch_size
+        )
+        invalidate_user_roles(*ids)
+        log_changes('student', 'create', [(pk, pk) for pk in ids])
+        self.created += len(ids)
+
+    def _hash(self, passwords):
+        if self.workers == 1 or len(passwords) < 2:
+            return [make_password(password) for password in passwords]
+        pool = get_hashing_pool()
+        # a few chunks per worker keeps every core busy without per-item IPC overhead
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+    def _clean_row(self, row):
+        errors = {}
+        username = str(row.get('username') or '').strip()
+        email = str(row.get('email') or '').strip()
+        password = str(row.get('password') or '')
+        if not username:
+            errors['username'] = ['This field is required.']
+        elif len(username) > 150:
+            errors['username'] = ['Ensure this field has no more than 150 characters.']
+        else:
+            try:
+                _username_validator(username)
+            except ValidationError as exc:
+                errors['username'] = exc.messages
+        if email:
+            try:
+                validate_email(email)
+            except ValidationError as exc:
+                errors['email'] = exc.messages
+        if not password:
+            errors['password'] = ['This field is required.']
+        cleaned = {
+            'username': username,
+            'email': email,
+            'password': password,
+            'first_name': str(row.get('first_name') or '').strip()[:150],
+            'last_name': str(row.get('last_name') or '').strip()[:150],
+        }
+        return cleaned, errors
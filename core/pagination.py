@@ -0,0 +1,122 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+# ==============================================================================
+# Keyset (cursor) pagination for the core API.
+#
+# Every list endpoint pages on an indexed, stable ordering and encodes the last
+# seen position into an opaque cursor, so page 1000 costs the same as page 1:
+# no OFFSET scan over skipped rows and no COUNT(*) over the whole table.
+#
+# DRF's CursorPagination positions on the first ordering field alone and steps
+# over ties with an offset, so rows inserted or deleted inside a run of equal
+# values can be skipped or repeated. Orderings on a non-unique field use
+# CompositeKeysetPagination instead, whose cursor holds every ordering field.
+# ==============================================================================
+
+
+def keyset_filter(ordering, position, reverse=False):
+    """
+    Rows strictly after `position` (one value per field) in `ordering`, e.g.
+    ('-recorded_at', '-id'); strictly before it if `reverse`.
+    """
+    names = [field.lstrip('-') for field in ordering]
+    condition = Q()
+    for i, field in enumerate(ordering):
+        lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+        condition |= Q(**dict(zip(names[:i], position[:i])), **{f'{names[i]}__{lookup}': position[i]})
+    return condition
+
+
+class KeysetPagination(CursorPagination):
+    """Base cursor pagination, ordered by primary key."""
+    ordering = 'id'
+    # page_size comes from REST_FRAMEWORK['PAGE_SIZE'].
+    # Clients may ask for a different page size with ?page_size=, up to the cap.
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+
+
+class StudentPagination(KeysetPagination):
+    # Student's primary key is the OneToOne to User.
+    ordering = 'user_id'
+
+
+class CompositeKeysetPagination(KeysetPagination):
+    """
+    Cursor pagination on a composite ordering whose last field is unique. The
+    cursor position holds all of the fields, so every row has a distinct
+    position and no offsets are needed.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # CursorPagination.paginate_queryset with the position filter on every
+        # ordering field instead of the first one.
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if current_position is not None:
+            queryset = queryset.filter(keyset_filter(self.ordering, self._parse_position(queryset.model,
+                                                                                         current_position), reverse))
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = (self._get_position_from_instance(results[-1], self.ordering)
+                              if len(results) > len(self.page) else None)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position, self.previous_position = current_position, following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position, self.previous_position = following_position, current_position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = [instance[name] if isinstance(instance, dict) else getattr(instance, name)
+                  for name in (field.lstrip('-') for field in ordering)]
+        # isoformat() keeps the microseconds that DjangoJSONEncoder would round away
+        return json.dumps(values, default=lambda value: value.isoformat())
+
+    def _parse_position(self, model, position):
+        names = [field.lstrip('-') for field in self.ordering]
+        # Cursors come from the client: anything that isn't one of ours is a 404.
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(names) or None in values:
+                raise ValueError(position)
+            return [model._meta.get_field(name).to_python(value) for name, value in zip(names, values)]
+        except (ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class RecordPagination(CompositeKeysetPagination):
+    # Newest first; id breaks ties between rows written in the same instant.
+    ordering = ('-recorded_at', '-id')
+
+
+class CoCurricularRecordPagination(KeysetPagination):
+    # CoCurricularRecord has no recorded_at and `date` has far too many ties to
+    # page on, so insertion order (newest first) is used instead.
+    ordering = '-id'
+
+
+class ReportJobPagination(KeysetPagination):
+    # Newest job first.
+    ordering = '-id'
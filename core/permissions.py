@@ -1,23 +1,28 @@
 from rest_framework import permissions
 
+from .roles import STUDENTS, STUDYING_INSTITUTIONS, OTHER_INSTITUTIONS, has_role
+
+# Roles come from the signed JWT claim when present (no database hit), otherwise
+# from the cached group lookup in core.roles.
+
 class IsStudent(permissions.BasePermission):
     """Allows access only to users in the 'Students' group."""
     def has_permission(self, request, view):
         # We also check if the user is authenticated.
         if not request.user or not request.user.is_authenticated:
             return False
-        return request.user.groups.filter(name='Students').exists()
+        return has_role(request, STUDENTS)
 
 class IsStudyingInstitution(permissions.BasePermission):
     """Allows access only to users in the 'Studying_Institutions' group."""
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        return request.user.groups.filter(name='Studying_Institutions').exists()
+        return has_role(request, STUDYING_INSTITUTIONS)
 
 class IsOtherInstitution(permissions.BasePermission):
     """Allows access only to users in the 'Other_Institutions' group."""
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        return request.user.groups.filter(name='Other_Institutions').exists()
\ No newline at end of file
+        return has_role(request, OTHER_INSTITUTIONS)
@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .models import Student
+
+# ==============================================================================
+# Student photo pipeline.
+#
+# Uploads are hashed while they are read chunk by chunk and stored once per
+# distinct content under student_photos/<aa>/<sha256>.<ext>, so re-uploading
+# the same picture costs no disk space. The resized JPEG variants list views
+# need are produced after the request has returned, by a small thread pool
+# (Pillow releases the GIL while decoding, resizing and encoding), and recorded
+# on Student.photo_variants once they exist.
+# ==============================================================================
+
+logger = logging.getLogger(__name__)
+
+PHOTO_DIR = 'student_photos'
+VARIANT_DIR = f'{PHOTO_DIR}/variants'
+# variant name -> bounding box; images are shrunk to fit, never enlarged
+PHOTO_VARIANTS = getattr(settings, 'PHOTO_VARIANTS', {'thumb': (128, 128), 'profile': (512, 512)})
+PHOTO_JPEG_QUALITY = getattr(settings, 'PHOTO_JPEG_QUALITY', 85)
+# 0 generates variants inline, which is what the tests use.
+PHOTO_WORKERS = getattr(settings, 'PHOTO_WORKERS', 2)
+
+_extensions = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+_pool = None
+
+
+def get_photo_pool():
+    """A thread pool shared by every photo job in this process."""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=PHOTO_WORKERS, thread_name_prefix='photo')
+    return _pool
+
+
+# --- Upload ---
+
+def store_photo(upload):
+    """
+    Save an uploaded image under its content hash and return the storage name.
+    An identical image that is already stored is reused, not written again.
+    """
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    sha = digest.hexdigest()
+
+    upload.seek(0)
+    with Image.open(upload) as image:
+        extension = _extensions.get(image.format, 'img')
+    name = f'{PHOTO_DIR}/{sha[:2]}/{sha}.{extension}'
+    if not default_storage.exists(name):
+        upload.seek(0)
+        saved = default_storage.save(name, upload)
+        if saved != name:
+            # Lost a race with an identical upload; keep the first copy.
+            default_storage.delete(saved)
+    return name
+
+
+def set_student_photo(student, upload):
+    """Point `student` at the stored upload and queue its variants."""
+    name = store_photo(upload)
+    student.photo.name = name
+    student.photo_variants = {}
+    student.save(update_fields=['photo', 'photo_variants'])
+    schedule_variants(name)
+    return name
+
+
+def clear_student_photo(student):
+    """Remove the student's photo. The stored files stay: other students may share them."""
+    student.photo = None
+    student.photo_variants = {}
+    student.save(update_fields=['photo', 'photo_variants'])
+
+
+# --- Variants ---
+
+def variant_name(name, variant):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{VARIANT_DIR}/{stem}_{variant}.jpg'
+
+
+def _render_variant(name, size):
+    with default_storage.open(name, 'rb') as source, Image.open(source) as image:
+        # Let the JPEG decoder downscale while decoding; far cheaper than
+        # decoding a 12-megapixel photo in full just to shrink it.
+        image.draft('RGB', size)
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+        output = ContentFile(b'')
+        image.save(output, 'JPEG', quality=PHOTO_JPEG_QUALITY, optimize=True, progressive=True)
+        return output
+
+
+def generate_variants(name):
+    """
+    Create every missing variant of the stored photo `name` and record them on
+    all students still using it. Returns {variant: storage name}.
+    """
+    variants = {}
+    for variant, size in PHOTO_VARIANTS.items():
+        target = variant_name(name, variant)
+        if not default_storage.exists(target):
+            saved = default_storage.save(target, _render_variant(name, size))
+            if saved != target:
+                default_storage.delete(saved)
+        variants[variant] = target
+    # Only students still pointing at this file; the row may have moved on.
+    Student.objects.filter(photo=name).update(photo_variants=variants)
+    return variants
+
+
+def _generate_in_background(name):
+    try:
+        generate_variants(name)
+    except Exception:
+        logger.exception('Generating variants for %s failed', name)
+    finally:
+        # Pool threads outlive requests; don't let them hoard connections.
+        close_old_connections()
+
+
+def schedule_variants(name):
+    """Generate the variants of `name` once the current transaction commits."""
+    if PHOTO_WORKERS == 0:
+        transaction.on_commit(lambda: generate_variants(name))
+    else:
+        transaction.on_commit(lambda: get_photo_pool().submit(_generate_in_background, name))
+
+
+def photo_urls(student, request=None):
+    """{'original': url, <variant>: url, ...}; variants still being generated are omitted."""
+    if not student.photo:
+        return {}
+    names = {'original': student.photo.name, **(student.photo_variants or {})}
+    urls = {}
+    for variant, name in names.items():
+        url = default_storage.url(name)
+        urls[variant] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,137 @@
+import hashlib
+from bisect import bisect_right
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import ExamResult, ExamScoreCount
+from .upserts import upsert
+
+# ==============================================================================
+# Rank and percentile of exam results.
+#
+# ExamScoreCount holds, per exam, how many results have each distinct score;
+# signal handlers (core/signals.py) keep it current with one UPDATE per saved
+# or deleted result, and bulk paths apply the per-score changes of the rows
+# they wrote (recounting is left to rebuild_rank_index). Distinct
+# scores are few even when candidates are many, so an exam's whole index is a
+# small sorted list: the scores and, for each, how many results scored at or
+# below it. It is cached per exam and dropped whenever the exam's counts change.
+#
+# A lookup is then a bisect over the cached list, O(log distinct scores),
+# instead of a COUNT(*) over the exam's results. Ties share a rank (competition
+# ranking: 1, 2, 2, 4), and the percentile is the share of results scoring at
+# or below the score, so tied results also share a percentile.
+# ==============================================================================
+
+RANK_INDEX_TIMEOUT = getattr(settings, 'RANK_INDEX_TIMEOUT', 24 * 3600)
+
+
+def _index_key(exam_name):
+    # exam names may hold spaces and run long; memcached keys may not
+    return f'markr:rank-index:{hashlib.md5(exam_name.encode()).hexdigest()}'
+
+
+# --- Keeping the counts ---
+
+def _drop_indexes(exam_names):
+    keys = [_index_key(name) for name in set(exam_names)]
+    cache.delete_many(keys)
+    # A reader between now and the commit would cache the old counts; drop
+    # them again once the new ones are visible.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def adjust_counts(deltas):
+    """Applies {(exam_name, score): change in the number of results}."""
+    counts = ExamScoreCount.objects
+    for (exam_name, score), delta in deltas.items():
+        if not delta:
+            continue
+        bucket = counts.filter(exam_name=exam_name, score=score)
+        if not bucket.update(count=F('count') + delta) and delta > 0:
+            # First result with this score; a racing writer may create it too.
+            counts.bulk_create([ExamScoreCount(exam_name=exam_name, score=score, count=0)], ignore_conflicts=True)
+            bucket.update(count=F('count') + delta)
+        if delta < 0:
+            bucket.filter(count__lte=0).delete()
+    _drop_indexes(exam_name for (exam_name, _), delta in deltas.items() if delta)
+
+
+def recount_exams(exam_names):
+    """Rebuilds the counts of the given exams from their results."""
+    exam_names = set(exam_names)
+    rows = (ExamResult.objects.filter(exam_name__in=exam_names)
+            .values_list('exam_name', 'score').annotate(count=Count('id')).order_by())
+    counts = [ExamScoreCount(exam_name=name, score=score, count=count) for name, score, count in rows]
+    with transaction.atomic():
+        upsert(ExamScoreCount, counts, ['exam_name', 'score'], ['count'])
+        # Scores nobody has any more.
+        current = {(row.exam_name, row.score) for row in counts}
+        stale = ExamScoreCount.objects.filter(exam_name__in=exam_names).values_list('pk', 'exam_name', 'score')
+        stale_ids = [pk for pk, *key in stale if tuple(key) not in current]
+        if stale_ids:
+            ExamScoreCount.objects.filter(pk__in=stale_ids).delete()
+    _drop_indexes(exam_names)
+
+
+def rebuild_all(batch_size=500):
+    """Recounts every exam; returns how many there were."""
+    exams = list(ExamResult.objects.values_list('exam_name', flat=True).distinct().order_by('exam_name'))
+    ExamScoreCount.objects.exclude(exam_name__in=exams).delete()
+    for start in range(0, len(exams), batch_size):
+        recount_exams(exams[start:start + batch_size])
+    return len(exams)
+
+
+# --- Lookups ---
+
+def load_indexes(exam_names, memo=None):
+    """
+    {exam_name: (ascending scores, results at or below each)} for the given
+    exams: one cache round trip, plus one query for those not cached. Pass a
+    `memo` dict to reuse indexes across calls (e.g. for one response).
+    """
+    memo = {} if memo is None else memo
+    wanted = {_index_key(name): name for name in set(exam_names) if name not in memo}
+    if not wanted:
+        return memo
+    found = cache.get_many(wanted)
+    memo.update((wanted[key], index) for key, index in found.items())
+    missing = [name for key, name in wanted.items() if key not in found]
+    if missing:
+        built = {name: ([], []) for name in missing}
+        for name, score, count in (ExamScoreCount.objects.filter(exam_name__in=missing, count__gt=0)
+                                   .order_by('exam_name', 'score').values_list('exam_name', 'score', 'count')):
+            built[name][0].append(score)
+            built[name][1].append(count)
+        built = {name: (scores, list(accumulate(counts))) for name, (scores, counts) in built.items()}
+        cache.set_many({_index_key(name): index for name, index in built.items()}, RANK_INDEX_TIMEOUT)
+        memo.update(built)
+    return memo
+
+
+def rank_in(index, score):
+    """(rank, out of, percentile) of `score` in an exam index; rank None if the exam has no results."""
+    scores, at_or_below = index
+    total = at_or_below[-1] if at_or_below else 0
+    if not total:
+        return None, 0, None
+    position = bisect_right(scores, score)
+    not_above = at_or_below[position - 1] if position else 0
+    return total - not_above + 1, total, round(100 * not_above / total, 2)
+
+
+def rank_results(results, memo=None):
+    """A rank entry per (id, exam_name, score) in `results`, in order."""
+    results = list(results)
+    indexes = load_indexes({exam_name for _, exam_name, _ in results}, memo)
+    entries = []
+    for pk, exam_name, score in results:
+        rank, out_of, percentile = rank_in(indexes[exam_name], score)
+        entries.append({'id': pk, 'exam_name': exam_name, 'score': score, 'rank': rank, 'out_of': out_of,
+                        'percentile': percentile})
+    return entries
@@ -0,0 +1,115 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+from .models import Institution
+
+# ==============================================================================
+# Read-through cache for reference data (universities, institutions and the
+# rendered institution labels every record response shows).
+#
+# This data changes a few times a year, so everything is cached under keys that
+# embed a single version number. Saving or deleting a University or Institution
+# (see core/signals.py) bumps the version, which orphans every old entry at
+# once; nothing is deleted key by key. Only incr/add/get/set are used, so any
+# backend with Redis-like atomic increments works.
+# ==============================================================================
+
+REFERENCE_CACHE_TIMEOUT = getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 24 * 3600)
+
+VERSION_KEY = 'markr:reference:version'
+
+
+def _initial_version():
+    # If the version key is ever evicted, restarting at 1 could resurrect entries
+    # written under an old version; a clock-based start can't collide with them.
+    return time.time_ns()
+
+
+def reference_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _initial_version(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_reference_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, _initial_version(), None)
+
+
+def cached(name, compute):
+    """Return the cached value for `name` under the current version, computing it on a miss."""
+    key = f'markr:reference:{reference_version()}:{name}'
+    value = cache.get(key)
+    if value is None:
+        metrics.increment('reference_cache.misses')
+        value = compute()
+        cache.set(key, value, REFERENCE_CACHE_TIMEOUT)
+    else:
+        metrics.increment('reference_cache.hits')
+    return value
+
+
+async def areference_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, _initial_version(), None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+async def acached(name, acompute):
+    """Async counterpart of cached(); `acompute` is a coroutine function."""
+    key = f'markr:reference:{await areference_version()}:{name}'
+    value = await cache.aget(key)
+    if value is None:
+        metrics.increment('reference_cache.misses')
+        value = await acompute()
+        await cache.aset(key, value, REFERENCE_CACHE_TIMEOUT)
+    else:
+        metrics.increment('reference_cache.hits')
+    return value
+
+
+def request_key(request):
+    """Cache name for a GET response: the full URL, hashed to a safe key length."""
+    return hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+
+def _load_institution_labels():
+    # Same text as Institution.__str__, for every institution in one query.
+    rows = Institution.objects.values_list('pk', 'name', 'university__name')
+    return {pk: f'{name} ({university})' for pk, name, university in rows}
+
+
+def institution_labels():
+    """{institution id: str(institution)} for every institution."""
+    return cached('institution-labels', _load_institution_labels)
+
+
+async def _aload_institution_labels():
+    rows = Institution.objects.values_list('pk', 'name', 'university__name')
+    return {pk: f'{name} ({university})' async for pk, name, university in rows}
+
+
+async def ainstitution_labels():
+    return await acached('institution-labels', _aload_institution_labels)
+
+
+def institution_label(pk, labels=None):
+    if pk is None:
+        return None
+    labels = institution_labels() if labels is None else labels
+    label = labels.get(pk)
+    if label is None:
+        # Only possible if a write skipped the signals; render it directly.
+        institution = Institution.objects.select_related('university').filter(pk=pk).first()
+        label = str(institution) if institution else None
+    return label
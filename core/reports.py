@@ -0,0 +1,254 @@
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connections
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import metrics
+from .grading import get_grade_scale
+from .models import Student, AcademicRecord, ExamResult, SemesterSummary, ReportJob
+from .reference import institution_labels
+from .storage import report_storage
+
+# ==============================================================================
+# Background report jobs: printable mark sheets and semester result books.
+#
+# The ReportJob table is the queue, so jobs outlive any worker. A worker claims
+# the oldest queued job with a conditional UPDATE (portable, no row locks).
+# It renders the students a chunk at a time into a temporary file, bumping
+# progress and its heartbeat after each chunk, then stores the HTML document
+# in the private report storage (core.storage). Running jobs whose heartbeat stops are requeued, up to
+# REPORT_MAX_ATTEMPTS, so a killed or restarted worker loses no work for good.
+# Every write a worker makes is conditional on still owning the job, so a
+# worker that was given up on cannot overwrite its successor.
+#
+# `manage.py run_report_workers` runs a pool of these loops in threads or
+# processes. work() and process_next_job() run one in the calling thread,
+# which is what the tests use.
+# ==============================================================================
+
+logger = logging.getLogger(__name__)
+
+# Students rendered between two progress updates.
+REPORT_CHUNK_SIZE = getattr(settings, 'REPORT_CHUNK_SIZE', 50)
+# A running job without a heartbeat for this long is assumed lost.
+REPORT_STALE_SECONDS = getattr(settings, 'REPORT_STALE_SECONDS', 300)
+REPORT_MAX_ATTEMPTS = getattr(settings, 'REPORT_MAX_ATTEMPTS', 3)
+REPORT_POLL_SECONDS = getattr(settings, 'REPORT_POLL_SECONDS', 2)
+
+
+class JobLost(Exception):
+    """The job was requeued or taken over while this worker was running it."""
+
+
+# --- Report data ---
+
+def _students(student_ids):
+    rows = Student.objects.filter(pk__in=student_ids).values_list(
+        'pk', 'user__username', 'user__first_name', 'user__last_name')
+    return {pk: {'id': pk, 'username': username, 'name': f'{first} {last}'.strip() or username,
+                 'semesters': {}, 'exams': []}
+            for pk, username, first, last in rows}
+
+
+def _add_academic(students, semester=None):
+    """Fills in each student's semesters: records and GPA, from two queries."""
+    scale, labels = get_grade_scale(), institution_labels()
+    records = AcademicRecord.objects.filter(student_id__in=students)
+    summaries = SemesterSummary.objects.filter(student_id__in=students)
+    if semester is not None:
+        records, summaries = records.filter(semester=semester), summaries.filter(semester=semester)
+    for student_id, number, course, grade, verifier in (
+            records.order_by('student_id', 'semester', 'course_name', 'pk')
+            .values_list('student_id', 'semester', 'course_name', 'grade', 'verified_by_id')):
+        entry = students[student_id]['semesters'].setdefault(number, {'semester': number, 'records': [], 'gpa': None})
+        entry['records'].append({'course_name': course, 'grade': grade, 'points': scale.points_for(grade),
+                                 'passed': scale.is_pass(grade), 'verified_by': labels.get(verifier)})
+    totals = defaultdict(lambda: [0, 0.0])
+    for student_id, number, gpa, graded, points in summaries.values_list(
+            'student_id', 'semester', 'gpa', 'graded_count', 'points_total'):
+        if number in students[student_id]['semesters']:
+            students[student_id]['semesters'][number]['gpa'] = gpa
+        totals[student_id][0] += graded
+        totals[student_id][1] += points
+    for student_id, student in students.items():
+        student['semesters'] = [student['semesters'][number] for number in sorted(student['semesters'])]
+        graded, points = totals[student_id]
+        student['cgpa'] = round(points / graded, 2) if graded else None
+
+
+def mark_sheet_data(student_ids, params):
+    """Every semester and exam result of each student."""
+    students = _students(student_ids)
+    _add_academic(students)
+    for student_id, exam, score, record_type in (
+            ExamResult.objects.filter(student_id__in=students).order_by('student_id', 'exam_name', 'pk')
+            .values_list('student_id', 'exam_name', 'score', 'record_type')):
+        students[student_id]['exams'].append({'exam_name': exam, 'score': score, 'record_type': record_type})
+    return [students[pk] for pk in student_ids if pk in students]
+
+
+def result_book_data(student_ids, params):
+    """One semester's courses, grades and GPA for each student."""
+    students = _students(student_ids)
+    _add_academic(students, params['semester'])
+    return [students[pk] for pk in student_ids if pk in students]
+
+
+# kind -> (title, template for a chunk of students, data builder)
+REPORTS = {
+    'mark_sheets': ('Mark sheets', 'core/reports/mark_sheets.html', mark_sheet_data),
+    'result_book': ('Semester result book', 'core/reports/result_book.html', result_book_data),
+}
+
+
+# --- Queue ---
+
+def requeue_stale():
+    """Requeues running jobs whose worker went quiet; fails those out of attempts."""
+    now = timezone.now()
+    stale = ReportJob.objects.filter(status='running', heartbeat_at__lt=now - timedelta(seconds=REPORT_STALE_SECONDS))
+    failed = stale.filter(attempts__gte=REPORT_MAX_ATTEMPTS).update(
+        status='failed', error='The worker running this job stopped responding.', finished_at=now)
+    requeued = stale.filter(attempts__lt=REPORT_MAX_ATTEMPTS).update(status='queued', worker='')
+    if requeued:
+        metrics.increment('reports.requeued', requeued)
+    return requeued + failed
+
+
+def claim_next(worker):
+    """Marks the oldest queued job as running for `worker` and returns it, or None."""
+    candidates = ReportJob.objects.filter(status='queued').order_by('id').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        now = timezone.now()
+        claimed = ReportJob.objects.filter(pk=pk, status='queued').update(
+            status='running', worker=worker, attempts=F('attempts') + 1, done=0, error='',
+            heartbeat_at=now, started_at=now)
+        if claimed:
+            return ReportJob.objects.get(pk=pk)
+    return None
+
+
+def _owned(job, worker):
+    return ReportJob.objects.filter(pk=job.pk, status='running', worker=worker)
+
+
+def _progress(job, worker, **fields):
+    if not _owned(job, worker).update(heartbeat_at=timezone.now(), **fields):
+        raise JobLost(job.pk)
+
+
+def job_students(job):
+    """Ids of the students the job covers, restricted to the job's institution."""
+    students = Student.objects.filter(current_institution_id=job.institution_id)
+    if job.params.get('student_ids') is not None:
+        students = students.filter(pk__in=job.params['student_ids'])
+    return list(students.order_by('pk').values_list('pk', flat=True))
+
+
+def run_job(job, worker):
+    """Renders a claimed job and stores the document."""
+    title, template, build = REPORTS[job.kind]
+    student_ids = job_students(job)
+    _progress(job, worker, total=len(student_ids))
+    with tempfile.TemporaryFile() as document:
+        document.write(render_to_string('core/reports/header.html', {
+            'title': title, 'job': job, 'institution': institution_labels().get(job.institution_id),
+            'generated_at': timezone.now(),
+        }).encode())
+        for start in range(0, len(student_ids), REPORT_CHUNK_SIZE):
+            chunk = student_ids[start:start + REPORT_CHUNK_SIZE]
+            document.write(render_to_string(template, {'students': build(chunk, job.params), 'job': job}).encode())
+            _progress(job, worker, done=start + len(chunk))
+        document.write(b'</main>\n</body>\n</html>\n')
+        document.seek(0)
+        name = report_storage.save(f'{job.pk}/{job.kind}-{job.pk}.html', File(document))
+    if not _owned(job, worker).update(status='done', artifact=name, finished_at=timezone.now()):
+        report_storage.delete(name)
+        raise JobLost(job.pk)
+
+
+def process_next_job(worker):
+    """Claims and runs one job in this thread; returns it, or None if the queue is empty."""
+    requeue_stale()
+    job = claim_next(worker)
+    if job is None:
+        return None
+    try:
+        run_job(job, worker)
+    except JobLost:
+        logger.warning('Report job %s was taken away from %s', job.pk, worker)
+    except Exception as exc:
+        logger.exception('Report job %s failed', job.pk)
+        _owned(job, worker).update(status='failed', error=str(exc) or type(exc).__name__, finished_at=timezone.now())
+        metrics.increment('reports.failed')
+    else:
+        metrics.increment('reports.completed')
+    return job
+
+
+# --- Workers ---
+
+def work(slot=0, once=False, stop=None):
+    """
+    A worker loop: runs jobs until `stop` is set, or with `once` until the
+    queue is empty. Returns the number of jobs it picked up.
+    """
+    worker = f'{socket.gethostname()}:{os.getpid()}:{slot}'
+    processed = 0
+    while stop is None or not stop.is_set():
+        job = process_next_job(worker)
+        # Long-lived loops must not hoard broken or expired connections.
+        close_old_connections()
+        if job is not None:
+            processed += 1
+        elif once:
+            break
+        elif stop is not None:
+            stop.wait(REPORT_POLL_SECONDS)
+        else:
+            time.sleep(REPORT_POLL_SECONDS)
+    return processed
+
+
+def _init_worker():
+    # Needed under the 'spawn' start method; a no-op for forked workers.
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'markR.settings')
+    django.setup()
+
+
+def run_workers(count, processes=False, once=False):
+    """
+    Runs `count` worker loops in a thread pool, or a process pool for
+    CPU-bound rendering across cores, until interrupted (or, with `once`, until
+    the queue is drained). Returns the number of jobs picked up.
+    """
+    stop = None
+    if processes:
+        # Children must open their own connections, not share the parent's.
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=count, initializer=_init_worker)
+    else:
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=count, thread_name_prefix='report')
+    with executor:
+        futures = [executor.submit(work, slot, once, stop) for slot in range(count)]
+        try:
+            return sum(future.result() for future in futures)
+        except KeyboardInterrupt:
+            # Threads finish their current job and stop; processes got the signal too.
+            if stop is not None:
+                stop.set()
+            raise
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.cache import cache
+
+# ==============================================================================
+# Role resolution.
+#
+# A user's roles are their auth group names. They are loaded at most once per
+# request (memoised on the user object), cached across requests in the Django
+# cache, and invalidated by the signal handlers in core/signals.py whenever
+# User.groups changes. API requests authenticated with a JWT issued by
+# /api/token/ carry the roles as a signed claim and never touch the database.
+# ==============================================================================
+
+STUDENTS = 'Students'
+STUDYING_INSTITUTIONS = 'Studying_Institutions'
+OTHER_INSTITUTIONS = 'Other_Institutions'
+
+# Name of the JWT claim holding the user's roles.
+ROLES_CLAIM = 'roles'
+
+ROLE_CACHE_TIMEOUT = getattr(settings, 'ROLE_CACHE_TIMEOUT', 300)
+
+
+def _cache_key(user_id):
+    return f'markr:roles:{user_id}'
+
+
+def get_user_roles(user):
+    """Return the frozenset of role (group) names for `user`."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, '_markr_roles', None)
+    if roles is None:
+        key = _cache_key(user.pk)
+        names = cache.get(key)
+        if names is None:
+            names = list(user.groups.values_list('name', flat=True))
+            cache.set(key, names, ROLE_CACHE_TIMEOUT)
+        roles = frozenset(names)
+        user._markr_roles = roles
+    return roles
+
+
+def get_request_roles(request):
+    """
+    Roles for the current request. Signed JWT claims win; session and other
+    requests fall back to the (cached) group lookup.
+    """
+    token = getattr(request, 'auth', None)
+    if token is not None:
+        roles = _claimed_roles(token)
+        if roles is not None:
+            return roles
+    return get_user_roles(getattr(request, 'user', None))
+
+
+async def aget_request_roles(user, token=None):
+    """Async counterpart of get_request_roles() for an already-authenticated user."""
+    if token is not None:
+        roles = _claimed_roles(token)
+        if roles is not None:
+            return roles
+    return await aget_user_roles(user)
+
+
+async def aget_user_roles(user):
+    """Async counterpart of get_user_roles() for async views."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, '_markr_roles', None)
+    if roles is None:
+        key = _cache_key(user.pk)
+        names = await cache.aget(key)
+        if names is None:
+            names = [name async for name in user.groups.values_list('name', flat=True)]
+            await cache.aset(key, names, ROLE_CACHE_TIMEOUT)
+        roles = frozenset(names)
+        user._markr_roles = roles
+    return roles
+
+
+def _claimed_roles(token):
+    try:
+        return frozenset(token[ROLES_CLAIM])
+    except (KeyError, TypeError):
+        # Tokens issued before roles were added, or non-JWT auth.
+        return None
+
+
+def has_role(request, role):
+    return role in get_request_roles(request)
+
+
+def invalidate_user_roles(*user_ids):
+    if user_ids:
+        cache.delete_many([_cache_key(user_id) for user_id in user_ids])
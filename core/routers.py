@@ -0,0 +1,145 @@
+import logging
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+from . import metrics
+
+# ==============================================================================
+# Read-replica routing.
+#
+# Writes always go to `default`. Reads go to a replica only when all of these hold:
+#   * the request is a GET/HEAD/OPTIONS to a view marked with @replica_reads
+#     (or a viewset with `replica_reads = True`);
+#   * the model belongs to REPLICA_APPS. Sessions, users and groups stay on the
+#     primary, so a fresh login or role change is never read back stale;
+#   * the request itself hasn't written yet;
+#   * the user hasn't written anything in the last REPLICA_PIN_SECONDS.
+#
+# That last rule gives read-your-writes. After a request writes a routed model,
+# the user is pinned to the primary for the window, by a cookie (browsers) and a
+# cache key per user (API clients, which often drop cookies).
+#
+# The replica decision is made once per request, at its first routed read. DRF
+# has authenticated the user by then, so JWT requests are pinned as well.
+# Outcomes are counted in core.metrics under db_router.*.
+# ==============================================================================
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'markr_primary'
+
+_routing = ContextVar('markr_db_routing', default=None)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+def _pin_key(user_id):
+    return f'markr:db:pinned:{user_id}'
+
+
+def _routed(model):
+    return model._meta.app_label in getattr(settings, 'REPLICA_APPS', ('core',))
+
+
+def replica_reads(view):
+    """Marks a view whose safe requests may read from a replica."""
+    view.replica_reads = True
+    return view
+
+
+class _RequestRouting:
+    """Routing state for the request being served."""
+
+    def __init__(self, request):
+        self.request = request
+        self.eligible = False
+        self.alias = None
+        self.wrote = False
+
+    def user_id(self):
+        user = getattr(self.request, 'user', None)
+        return user.pk if user is not None and user.is_authenticated else None
+
+    def choose(self):
+        if self.alias is None:
+            user_id = self.user_id()
+            if PIN_COOKIE in self.request.COOKIES or (user_id and cache.get(_pin_key(user_id))):
+                self.alias = DEFAULT_DB_ALIAS
+                metrics.increment('db_router.pinned')
+            else:
+                self.alias = random.choice(replica_aliases())
+                metrics.increment('db_router.replica')
+            logger.debug('%s %s reads from %s', self.request.method, self.request.path, self.alias)
+        return self.alias
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.eligible or state.wrote or not _routed(model):
+            return None
+        return state.choose()
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None and _routed(model):
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tracks which requests may use a replica and pins users who write. Place it
+    after AuthenticationMiddleware. Unused when DATABASE_REPLICAS is empty.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _RequestRouting(request)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if state.wrote:
+            self.pin(state, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        if state is not None and request.method in self.SAFE_METHODS:
+            view_class = getattr(view_func, 'cls', None)  # DRF views and viewsets
+            state.eligible = bool(getattr(view_func, 'replica_reads', False)
+                                  or getattr(view_class, 'replica_reads', False))
+
+    def pin(self, state, response):
+        seconds = pin_seconds()
+        response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+        user_id = state.user_id()
+        if user_id:
+            cache.set(_pin_key(user_id), 1, seconds)
+        metrics.increment('db_router.pins')
@@ -0,0 +1,195 @@
+import hashlib
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import metrics
+from .merkle import BUNDLE_FORMAT, batch_message, build_tree, leaf_hash, root_from_proof
+from .models import Institution, AcademicRecord, CoCurricularRecord, ExamResult, SealBatch, RecordSeal
+
+try:
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+except ImportError:  # optional; only sealing itself needs it
+    Ed25519PrivateKey = None
+
+# ==============================================================================
+# Sealing: institutions' records in signed Merkle trees (see core/merkle.py).
+#
+# seal_pending() takes each institution's records that have no RecordSeal yet,
+# up to SEAL_BATCH_SIZE at a time, and hashes them into one tree per batch.
+# It signs the root with the platform's Ed25519 key, chained to the
+# institution's previous root. Every record's audit path is stored with its
+# seal. Each batch is a handful of queries plus hashing, so sealing runs at
+# thousands of records per second.
+#
+# The roots are published at /api/seals/roots/. A student's proof bundle
+# (/api/students/<id>/proof-bundle/) holds each sealed record, its proof and
+# its batch's signed root. core.merkle.verify_bundle() checks such a bundle
+# with no access to markR.
+# ==============================================================================
+
+SEAL_BATCH_SIZE = getattr(settings, 'SEAL_BATCH_SIZE', 10_000)
+SEAL_WRITE_BATCH_SIZE = 1000
+
+# kind -> (model, the fields a leaf covers besides kind, id and student)
+SEALED_MODELS = {
+    'academic': (AcademicRecord, ('course_name', 'semester', 'grade', 'record_type', 'verified_by_id', 'recorded_at')),
+    'cocurricular': (CoCurricularRecord, ('activity_name', 'description', 'date', 'record_type', 'verified_by_id')),
+    'exam': (ExamResult, ('exam_name', 'score', 'record_type', 'verified_by_id', 'recorded_at')),
+}
+KIND_OF_MODEL = {model: kind for kind, (model, _) in SEALED_MODELS.items()}
+
+
+# --- Signing key ---
+
+@lru_cache(maxsize=4)
+def _load_key(seed):
+    if Ed25519PrivateKey is None:
+        raise ImproperlyConfigured('Sealing records requires the cryptography package.')
+    return Ed25519PrivateKey.from_private_bytes(seed)
+
+
+def signing_key():
+    """The Ed25519 key from SEAL_SIGNING_KEY (a hex seed)."""
+    # Never derived from anything else: signed roots are checked offline for
+    # good, so a guessable key (e.g. from the committed SECRET_KEY) would let
+    # anyone forge them.
+    seed = getattr(settings, 'SEAL_SIGNING_KEY', None)
+    if not seed:
+        raise ImproperlyConfigured('Sealing records requires SEAL_SIGNING_KEY.')
+    try:
+        seed = bytes.fromhex(seed)
+    except (TypeError, ValueError):
+        seed = None
+    if seed is None or len(seed) != 32:
+        raise ImproperlyConfigured('SEAL_SIGNING_KEY must be a hex-encoded 32-byte seed.')
+    return _load_key(seed)
+
+
+def public_key():
+    """{'algorithm', 'key_id', 'public_key'} for verifiers."""
+    raw = signing_key().public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    return {'algorithm': 'Ed25519', 'key_id': hashlib.sha256(raw).hexdigest()[:16], 'public_key': raw.hex()}
+
+
+# --- Leaves ---
+
+def record_leaf(kind, pk, public_id, values):
+    """The dict a record's leaf hashes: kind, id, the student's public_id and the sealed fields."""
+    record = {'kind': kind, 'id': pk, 'student': str(public_id)}
+    for name, value in zip(SEALED_MODELS[kind][1], values):
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        record[name.removesuffix('_id')] = value
+    return record
+
+
+def batch_data(batch):
+    return {
+        'institution': batch.institution_id,
+        'sequence': batch.sequence,
+        'root': batch.root,
+        'previous_root': batch.previous_root,
+        'size': batch.size,
+        'sealed_at': batch.sealed_at.isoformat(),
+        'signature': batch.signature,
+        'key_id': batch.key_id,
+    }
+
+
+# --- Sealing ---
+
+def _pending(kind, institution_id, limit):
+    model, fields = SEALED_MODELS[kind]
+    sealed = RecordSeal.objects.filter(record_kind=kind, record_id=OuterRef('pk'))
+    return (model.objects.filter(verified_by_id=institution_id).filter(~Exists(sealed))
+            .order_by('pk').values_list('pk', 'student__public_id', *fields)[:limit])
+
+
+def seal_batch(institution_id, limit=SEAL_BATCH_SIZE):
+    """Seals up to `limit` of an institution's unsealed records; returns the SealBatch or None."""
+    key = signing_key()
+    with transaction.atomic():
+        # One sealer per institution at a time: sequences and "unsealed" must not race.
+        list(Institution.objects.select_for_update().filter(pk=institution_id).values_list('pk'))
+        entries = []
+        for kind in SEALED_MODELS:
+            if len(entries) >= limit:
+                break
+            for pk, public_id, *values in _pending(kind, institution_id, limit - len(entries)):
+                entries.append((kind, pk, record_leaf(kind, pk, public_id, values)))
+        if not entries:
+            return None
+
+        root, proofs = build_tree([leaf_hash(record) for _, _, record in entries])
+        previous = (SealBatch.objects.filter(institution_id=institution_id)
+                    .order_by('-sequence').values_list('sequence', 'root').first())
+        batch = SealBatch(
+            institution_id=institution_id, sequence=previous[0] + 1 if previous else 1, root=root,
+            previous_root=previous[1] if previous else None, size=len(entries),
+            # whole seconds, so the signed text survives any database's datetime precision
+            sealed_at=timezone.now().replace(microsecond=0), key_id=public_key()['key_id'],
+        )
+        batch.signature = key.sign(batch_message(batch_data(batch))).hex()
+        batch.save()
+        RecordSeal.objects.bulk_create(
+            [RecordSeal(batch=batch, record_kind=kind, record_id=pk, leaf_index=index, proof=proofs[index])
+             for index, (kind, pk, _) in enumerate(entries)],
+            batch_size=SEAL_WRITE_BATCH_SIZE,
+        )
+    metrics.increment('sealing.records', len(entries))
+    return batch
+
+
+def seal_pending(institution_ids=None, batch_size=SEAL_BATCH_SIZE):
+    """Seals every unsealed record, batch by batch; returns the new batches."""
+    if institution_ids is None:
+        institution_ids = Institution.objects.order_by('pk').values_list('pk', flat=True)
+    batches = []
+    for institution_id in institution_ids:
+        while True:
+            batch = seal_batch(institution_id, batch_size)
+            if batch is None:
+                break
+            batches.append(batch)
+            if batch.size < batch_size:
+                break
+    return batches
+
+
+def unseal(kind, record_ids):
+    """Drops the seals of edited records so their new content gets sealed again."""
+    RecordSeal.objects.filter(record_kind=kind, record_id__in=list(record_ids)).delete()
+
+
+# --- Proof bundles ---
+
+def proof_bundle(student):
+    """
+    Everything a verifier needs to check the student's sealed records offline.
+    Records edited since sealing, or not sealed yet, are counted in `unsealed`.
+    """
+    records, unsealed = [], 0
+    for kind, (model, fields) in SEALED_MODELS.items():
+        rows = model.objects.filter(student=student).order_by('pk').values_list('pk', *fields)
+        current = {pk: record_leaf(kind, pk, student.public_id, values) for pk, *values in rows}
+        seals = RecordSeal.objects.filter(record_kind=kind, record_id__in=list(current)).select_related('batch')
+        for seal in seals.order_by('record_id'):
+            record, batch = current[seal.record_id], seal.batch
+            if root_from_proof(leaf_hash(record), seal.leaf_index, batch.size, seal.proof) != batch.root:
+                continue  # edited without passing through the signals
+            records.append({'record': record, 'leaf_index': seal.leaf_index, 'proof': seal.proof,
+                            'batch': batch_data(batch)})
+        unsealed += len(current) - sum(1 for entry in records if entry['record']['kind'] == kind)
+    return {
+        'format': BUNDLE_FORMAT,
+        'student': str(student.public_id),
+        'public_key': public_key(),
+        'records': records,
+        'unsealed': unsealed,
+    }
@@ -0,0 +1,214 @@
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.db import transaction
+
+from .dashboard import invalidate_institution_stats
+from .grading import get_grade_scale
+from .models import University, Institution, Student, AcademicRecord, CoCurricularRecord, ExamResult
+from .reference import bump_reference_version
+from .roles import STUDENTS, STUDYING_INSTITUTIONS, invalidate_user_roles
+from .signals import records_bulk_changed
+
+# ==============================================================================
+# Synthetic dataset generator (manage.py seed_data).
+#
+# Builds universities -> institutions -> students -> records at any scale. All
+# randomness comes from one seeded random.Random, so a given seed and scale
+# always produce the same data. Rows are written with bulk_create, a batch of
+# students (and all their records) per transaction; the bulk paths then send
+# the same signals/invalidations the ingest code does, so derived data
+# (semester summaries, cached counts) stays consistent.
+# ==============================================================================
+
+SEED_BATCH_SIZE = 500
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Akhil', 'Ananya', 'Arjun', 'Devika', 'Farhan', 'Gauri', 'Harini', 'Ishaan', 'Jaya',
+    'Karthik', 'Lakshmi', 'Meera', 'Nikhil', 'Priya', 'Rahul', 'Sneha', 'Tanvi', 'Varun', 'Zara',
+]
+LAST_NAMES = [
+    'Menon', 'Nair', 'Pillai', 'Iyer', 'Sharma', 'Reddy', 'Thomas', 'Joseph', 'Khan', 'Das', 'Varghese',
+    'Kurian', 'Rao', 'Patel', 'George', 'Mathew',
+]
+SUBJECTS = [
+    'Mathematics', 'Physics', 'Chemistry', 'Computer Science', 'Electronics', 'Economics', 'English',
+    'Statistics', 'Biology', 'Mechanics', 'Data Structures', 'Operating Systems', 'Databases', 'Networks',
+    'Signals and Systems', 'Thermodynamics', 'Linear Algebra', 'Discrete Mathematics', 'Algorithms',
+    'Environmental Studies',
+]
+ACTIVITIES = [
+    'NSS Volunteer', 'Football Team', 'Debate Club', 'Robotics Club', 'Music Ensemble', 'Hackathon',
+    'Drama Society', 'Student Council', 'Photography Club', 'Science Fair', 'Blood Donation Drive', 'Chess Club',
+]
+EXAMS = ['Internal Assessment', 'Mid Term', 'Model Exam', 'Lab Exam', 'Viva', 'Project Review', 'Quiz']
+CITIES = ['Kochi', 'Thiruvananthapuram', 'Kozhikode', 'Thrissur', 'Kannur', 'Kollam', 'Palakkad', 'Kottayam']
+# rough shape of real results: mostly A/B range, a few failures
+GRADE_WEIGHTS = {'O': 8, 'A+': 16, 'A': 22, 'B+': 20, 'B': 14, 'C': 9, 'P': 5, 'F': 4, 'AB': 2}
+
+
+class DatasetSeeder:
+    """
+    Creates `universities` x `institutions` x `students` and, per student, the
+    given number of academic, co-curricular and exam records. Every username
+    starts with `prefix`, so several datasets can live side by side.
+    """
+
+    def __init__(self, universities=2, institutions=3, students=50, academic=16, cocurricular=3, exams=6,
+                 seed=1, prefix='seed', password='password123', batch_size=SEED_BATCH_SIZE, stdout=None):
+        self.universities = universities
+        self.institutions = institutions
+        self.students = students
+        self.academic = academic
+        self.cocurricular = cocurricular
+        self.exams = exams
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.random = random.Random(seed)
+        # One hash for every seeded account: hashing is ~100 ms per call.
+        self.password = make_password(password)
+        scale = get_grade_scale()
+        self.grades = [grade for grade in GRADE_WEIGHTS if grade in scale.points] or list(scale.points)
+        self.grade_weights = [GRADE_WEIGHTS.get(grade, 1) for grade in self.grades]
+        self.counts = dict.fromkeys(
+            ['universities', 'institutions', 'staff', 'students', 'academic_records', 'cocurricular_records',
+             'exam_results'], 0)
+
+    def _log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def run(self):
+        if User.objects.filter(username__startswith=f'{self.prefix}-').exists():
+            raise ValueError(f"Users prefixed '{self.prefix}-' already exist; pick another prefix.")
+        students_group, _ = Group.objects.get_or_create(name=STUDENTS)
+        staff_group, _ = Group.objects.get_or_create(name=STUDYING_INSTITUTIONS)
+
+        institutions = self._create_institutions(staff_group)
+        for number, institution in enumerate(institutions, start=1):
+            for start in range(0, self.students, self.batch_size):
+                size = min(self.batch_size, self.students - start)
+                with transaction.atomic():
+                    self._create_students(institution, number, start, size, students_group)
+            invalidate_institution_stats(institution.pk)
+            self._log(f'{institution.name}: {self.students} students')
+        return self.counts
+
+    # --- Hierarchy ---
+
+    def _create_institutions(self, staff_group):
+        universities = [
+            University(name=f'{self.prefix.title()} University {u}', address=f'{self.random.choice(CITIES)}, Kerala')
+            for u in range(1, self.universities + 1)
+        ]
+        University.objects.bulk_create(universities)
+        # MySQL doesn't return primary keys from bulk_create, so read them back.
+        universities = list(University.objects.filter(name__in=[u.name for u in universities]).order_by('name'))
+
+        staff = [
+            User(username=f'{self.prefix}-staff-{u}-{i}', email=f'office{u}{i}@{self.prefix}.example.edu',
+                 password=self.password, is_active=True)
+            for u in range(1, self.universities + 1) for i in range(1, self.institutions + 1)
+        ]
+        User.objects.bulk_create(staff)
+        staff = {user.username: user for user in User.objects.filter(username__in=[user.username for user in staff])}
+        User.groups.through.objects.bulk_create(
+            [User.groups.through(user_id=user.pk, group_id=staff_group.pk) for user in staff.values()]
+        )
+        invalidate_user_roles(*(user.pk for user in staff.values()))
+
+        institutions = []
+        for u, university in enumerate(universities, start=1):
+            for i in range(1, self.institutions + 1):
+                institutions.append(Institution(
+                    university=university, name=f'{self.prefix.title()} College {u}-{i}',
+                    address=f'{self.random.choice(CITIES)}, Kerala',
+                    contact_email=f'office{u}{i}@{self.prefix}.example.edu',
+                    admin_user=staff[f'{self.prefix}-staff-{u}-{i}'],
+                ))
+        Institution.objects.bulk_create(institutions)
+        bump_reference_version()
+        self.counts['universities'] = len(universities)
+        self.counts['institutions'] = len(institutions)
+        self.counts['staff'] = len(staff)
+        return list(Institution.objects.filter(admin_user__in=staff.values()).order_by('pk'))
+
+    def _create_students(self, institution, number, start, size, group):
+        users = []
+        for n in range(start, start + size):
+            first, last = self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+            username = f'{self.prefix}-{number}-{n}'
+            users.append(User(username=username, first_name=first, last_name=last,
+                              email=f'{username}@{self.prefix}.example.edu', password=self.password))
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        ids = list(User.objects.filter(username__in=[user.username for user in users])
+                   .order_by('pk').values_list('pk', flat=True))
+        Student.objects.bulk_create(
+            [Student(user_id=pk, current_institution=institution, phone_no=f'+91 9{self.random.randrange(10**9):09d}')
+             for pk in ids], batch_size=self.batch_size,
+        )
+        User.groups.through.objects.bulk_create(
+            [User.groups.through(user_id=pk, group_id=group.pk) for pk in ids], batch_size=self.batch_size
+        )
+        invalidate_user_roles(*ids)
+
+        academic, cocurricular, exams = [], [], []
+        for student_id in ids:
+            academic += self._academic_records(student_id, institution)
+            cocurricular += self._cocurricular_records(student_id, institution)
+            exams += self._exam_results(student_id, institution)
+        AcademicRecord.objects.bulk_create(academic, batch_size=self.batch_size)
+        CoCurricularRecord.objects.bulk_create(cocurricular, batch_size=self.batch_size)
+        ExamResult.objects.bulk_create(exams, batch_size=self.batch_size)
+        records_bulk_changed.send(sender=AcademicRecord,
+                                  values=[{'student_id': r.student_id, 'semester': r.semester, 'course_name': r.course_name,
+                                           'verified_by_id': r.verified_by_id} for r in academic])
+        records_bulk_changed.send(sender=ExamResult,
+                                  values=[{'student_id': r.student_id, 'exam_name': r.exam_name, 'score': r.score,
+                                           'verified_by_id': r.verified_by_id} for r in exams])
+
+        self.counts['students'] += len(ids)
+        self.counts['academic_records'] += len(academic)
+        self.counts['cocurricular_records'] += len(cocurricular)
+        self.counts['exam_results'] += len(exams)
+
+    # --- Records ---
+
+    def _academic_records(self, student_id, institution):
+        # (course_name, semester) is the natural key, so courses never repeat within a semester
+        records = []
+        per_semester = max(1, -(-self.academic // 8))
+        for n in range(self.academic):
+            semester = n // per_semester + 1
+            subject = SUBJECTS[(n % per_semester + semester * 3) % len(SUBJECTS)]
+            records.append(AcademicRecord(
+                student_id=student_id, course_name=f'{subject} {semester}', semester=semester,
+                grade=self.random.choices(self.grades, self.grade_weights)[0],
+                record_type=self.random.choice(('COLLEGE', 'UNIVERSITY')), verified_by=institution,
+            ))
+        return records
+
+    def _cocurricular_records(self, student_id, institution):
+        return [
+            CoCurricularRecord(
+                student_id=student_id, activity_name=self.random.choice(ACTIVITIES),
+                description='Participated and completed the activity.',
+                date=date(2021, 6, 1) + timedelta(days=self.random.randrange(4 * 365)),
+                record_type='COLLEGE', verified_by=institution,
+            )
+            for _ in range(self.cocurricular)
+        ]
+
+    def _exam_results(self, student_id, institution):
+        # exam_name is the natural key per student
+        return [
+            ExamResult(
+                student_id=student_id, exam_name=f'{EXAMS[n % len(EXAMS)]} {n // len(EXAMS) + 1}',
+                score=round(min(100.0, max(0.0, self.random.gauss(68, 14))), 1),
+                record_type='UNIVERSITY', verified_by=institution,
+            )
+            for n in range(self.exams)
+        ]
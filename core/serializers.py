@@ -1,7 +1,64 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User, Group
 # Import ALL the new models, including University and ExamResult
-from .models import University, Institution, Student, AcademicRecord, CoCurricularRecord, ExamResult
+from .models import University, Institution, Student, AcademicRecord, CoCurricularRecord, ExamResult, SemesterSummary, ReportJob
+from .roles import ROLES_CLAIM, get_user_roles
+from .reference import institution_label, institution_labels
+from .photos import clear_student_photo, photo_urls, set_student_photo
+from .ranking import rank_results
+
+# --- JWT ---
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Adds the user's roles to the signed token so permission checks on API
+    calls don't need a group query. A role change takes effect with the next
+    access token (see RoleRefreshToken).
+    """
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[ROLES_CLAIM] = sorted(get_user_roles(user))
+        return token
+
+
+class RoleRefreshToken(RefreshToken):
+    """Resolves the roles afresh for every access token it mints, instead of copying its own claim."""
+    @property
+    def access_token(self):
+        access = super().access_token
+        user = User.objects.filter(**{jwt_settings.USER_ID_FIELD: self.get(jwt_settings.USER_ID_CLAIM)}).first()
+        # served from the role cache, which group changes invalidate
+        access[ROLES_CLAIM] = sorted(get_user_roles(user))
+        return access
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RoleRefreshToken
+
+# --- Reference data ---
+class InstitutionLabelField(serializers.RelatedField):
+    """
+    Read-only institution rendered as str(institution), like StringRelatedField,
+    but resolved from the reference cache: no join, no per-row query. The label
+    map is fetched once per serializer and reused for every row; async views
+    pass an already loaded map as context['institution_labels'].
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self._labels = None
+
+    def use_pk_only_optimization(self):
+        return True
+
+    def to_representation(self, value):
+        if self._labels is None:
+            labels = self.context.get('institution_labels')
+            self._labels = institution_labels() if labels is None else labels
+        return institution_label(value.pk, self._labels)
 
 # --- Serializers for University and Institution ---
 class UniversitySerializer(serializers.ModelSerializer):
@@ -12,7 +69,9 @@ class UniversitySerializer(serializers.ModelSerializer):
 class InstitutionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Institution
-        fields = '__all__'
+        # admin_user decides who acts for the institution (Institution.for_user);
+        # it is reassigned in the Django admin only, and never shown.
+        exclude = ['admin_user']
 
 # --- Serializers for Creating and Managing Students ---
 class CreateStudentSerializer(serializers.Serializer):
@@ -45,39 +104,161 @@ class StudentProfileSerializer(serializers.ModelSerializer):
         model = Student
         fields = ['photo', 'phone_no', 'contact_email']
 
+    def update(self, instance, validated_data):
+        # Photos go through the content-addressed store; variants are made in the background.
+        # An absent photo is left alone; an explicit null or empty one clears it.
+        clear, photo = 'photo' in validated_data, validated_data.pop('photo', None)
+        instance = super().update(instance, validated_data)
+        if photo:
+            set_student_photo(instance, photo)
+        elif clear:
+            clear_student_photo(instance)
+        return instance
+
 # --- Serializers for Records (including ExamResult) ---
 class AcademicRecordSerializer(serializers.ModelSerializer):
-    verified_by = serializers.StringRelatedField()
+    verified_by = InstitutionLabelField()
     class Meta:
         model = AcademicRecord
         fields = '__all__'
 
 class CoCurricularRecordSerializer(serializers.ModelSerializer):
-    verified_by = serializers.StringRelatedField()
+    verified_by = InstitutionLabelField()
     class Meta:
         model = CoCurricularRecord
         fields = '__all__'
 
 class ExamResultSerializer(serializers.ModelSerializer): # <-- ADDED BACK IN
-    verified_by = serializers.StringRelatedField()
+    verified_by = InstitutionLabelField()
     class Meta:
         model = ExamResult # <-- Uses the correct, updated ExamResult model
         fields = '__all__'
 
 # --- Main Serializer for Viewing a Student's Full Profile ---
 class StudentSerializer(serializers.ModelSerializer):
+    """
+    Accepts `fields` (top-level field names to keep) and `expand` (nested record
+    collections to include); see resolve_shape() for the ?fields=/?expand= rules.
+    Without either it renders every field.
+    """
+    # Nested collections clients opt in to, and the relation each one reads.
+    EXPANDABLE = {
+        'academic_records': 'academicrecord_set',
+        'cocurricular_records': 'cocurricularrecord_set',
+        'exam_results': 'examresult_set',
+        'exam_ranks': 'examresult_set',
+    }
+    # Expandable, but only included when asked for by name.
+    OPT_IN = ('exam_ranks',)
+
     user = serializers.StringRelatedField()
-    current_institution = serializers.StringRelatedField()
+    current_institution = InstitutionLabelField()
     
     # Add all the record types to the nested view
     academic_records = AcademicRecordSerializer(many=True, read_only=True, source='academicrecord_set')
     cocurricular_records = CoCurricularRecordSerializer(many=True, read_only=True, source='cocurricularrecord_set')
     exam_results = ExamResultSerializer(many=True, read_only=True, source='examresult_set') # <-- ADDED BACK IN
+    # URLs of the original photo and its resized variants (thumb, profile)
+    photo_variants = serializers.SerializerMethodField()
+    # Rank and percentile of each exam result within its exam (core.ranking)
+    exam_ranks = serializers.SerializerMethodField()
 
     class Meta:
         model = Student
         fields = [
-            'user', 'current_institution', 'photo', 'phone_no', 'contact_email',
-            'academic_records', 'cocurricular_records', 'exam_results' # <-- ADDED BACK IN
+            'user', 'public_id', 'current_institution', 'photo', 'photo_variants', 'phone_no', 'contact_email',
+            'academic_records', 'cocurricular_records', 'exam_results', # <-- ADDED BACK IN
+            'exam_ranks',
         ]
-        
\ No newline at end of file
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and expand is None:
+            for name in self.OPT_IN:
+                self.fields.pop(name)
+            return
+        keep = set(fields) if fields else set(self.fields) - set(self.EXPANDABLE)
+        keep |= set(expand or ())
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+    @classmethod
+    def resolve_shape(cls, query_params, default_expand=()):
+        """
+        Parse ?fields=a,b and ?expand=x,y into (fields, expand). Naming a
+        collection in ?fields= expands it too; without ?expand= or ?fields=
+        the `default_expand` collections are included.
+        """
+        def names(param):
+            return [name.strip() for name in query_params.get(param, '').split(',') if name.strip()]
+
+        fields = names('fields') or None
+        expand = set(names('expand'))
+        errors = {}
+        unknown = sorted(set(fields or ()) - set(cls.Meta.fields))
+        if unknown:
+            errors['fields'] = [f"Unknown field(s): {', '.join(unknown)}."]
+        unknown = sorted(expand - set(cls.EXPANDABLE))
+        if unknown:
+            errors['expand'] = [f"Cannot expand: {', '.join(unknown)}. Choose from {', '.join(cls.EXPANDABLE)}."]
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        if 'expand' not in query_params and fields is None:
+            expand = set(default_expand) - set(cls.OPT_IN)
+        expand |= set(fields or ()) & set(cls.EXPANDABLE)
+        return fields, expand
+
+    def get_photo_variants(self, student):
+        return photo_urls(student, self.context.get('request'))
+
+    def get_exam_ranks(self, student):
+        # Exam indexes are loaded once per response; async views preload them
+        # into context['rank_indexes'].
+        results = [(result.pk, result.exam_name, result.score) for result in student.examresult_set.all()]
+        return rank_results(results, memo=self.context.setdefault('rank_indexes', {}))
+
+
+# --- Derived transcript summary ---
+class SemesterSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SemesterSummary
+        fields = ['semester', 'gpa', 'record_count', 'graded_count', 'passed_count', 'latest_recorded_at']
+
+
+# --- Background report jobs (core.reports) ---
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Submitting takes kind, optional student_ids and (for result books) semester."""
+    student_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False,
+                                        write_only=True)
+    semester = serializers.IntegerField(required=False, min_value=1, write_only=True)
+    progress = serializers.SerializerMethodField()
+    artifact_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'kind', 'status', 'params', 'progress', 'attempts', 'error', 'artifact_url',
+                  'created_at', 'started_at', 'finished_at', 'student_ids', 'semester']
+        read_only_fields = ['status', 'params', 'attempts', 'error', 'created_at', 'started_at', 'finished_at']
+
+    def validate(self, data):
+        if data['kind'] == 'result_book' and 'semester' not in data:
+            raise serializers.ValidationError({'semester': ['A result book needs a semester.']})
+        return data
+
+    def create(self, validated_data):
+        validated_data['params'] = {'student_ids': validated_data.pop('student_ids', None),
+                                    'semester': validated_data.pop('semester', None)}
+        return super().create(validated_data)
+
+    def get_progress(self, job):
+        return {'done': job.done, 'total': job.total,
+                'percent': round(100 * job.done / job.total) if job.total else (100 if job.status == 'done' else 0)}
+
+    def get_artifact_url(self, job):
+        if job.status != 'done':
+            return None
+        url = f'/api/reports/{job.pk}/artifact/'
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,291 @@
+from collections import Counter
+
+from django.contrib.auth.models import User, Group
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from .analytics import mark_exams_dirty, mark_grades_dirty
+from .changelog import log_bulk, log_instance
+from .dashboard import invalidate_institution_stats
+from .fragments import bump_records_versions
+from .ranking import adjust_counts
+from .models import University, Institution, Student, AcademicRecord, CoCurricularRecord, ExamResult
+from .reference import bump_reference_version
+from .roles import invalidate_user_roles
+from .sealing import KIND_OF_MODEL, unseal
+from .summaries import refresh_semester_summaries
+
+# ==============================================================================
+# Signal handlers. Connected from CoreConfig.ready().
+# ==============================================================================
+
+# Sent by bulk write paths (which bypass post_save) after they create or update
+# record rows. `values` is a list of the written field dicts, each holding at
+# least student_id, the model's natural key fields and verified_by_id; `updated_ids`, when
+# given, lists the primary keys of rows that existed before and were changed,
+# and `created_ids` those of the new rows. `previous`, when given, parallels
+# `values` with each row's fields as they were before the write (None for a new
+# row); without it every row is taken to be new.
+records_bulk_changed = Signal()
+
+# --- Role cache invalidation ---
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        # user.groups.add/remove/clear(...)
+        invalidate_user_roles(instance.pk)
+    elif action == 'pre_clear':
+        # group.user_set.clear(): pk_set is not provided, so collect members first
+        invalidate_user_roles(*instance.user_set.values_list('pk', flat=True))
+    else:
+        # group.user_set.add/remove(...)
+        invalidate_user_roles(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # A renamed or deleted group changes the roles of all its members.
+    invalidate_user_roles(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    # Primary keys can be reused after a delete; never inherit stale roles.
+    if created:
+        invalidate_user_roles(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_user_roles(instance.pk)
+
+
+# --- Reference data cache ---
+
+@receiver(post_save, sender=University)
+@receiver(post_delete, sender=University)
+@receiver(post_save, sender=Institution)
+@receiver(post_delete, sender=Institution)
+def reference_data_changed(sender, **kwargs):
+    bump_reference_version()
+
+
+# --- Semester summaries ---
+
+@receiver(pre_save, sender=AcademicRecord)
+def remember_summary_bucket(sender, instance, **kwargs):
+    # An update may move the record to another student/semester; remember the
+    # bucket it is leaving so that one gets recomputed too. The same read gives
+    # the grade rollup bucket it is leaving.
+    instance._previous_summary_key = instance._previous_grade_bucket = None
+    if instance.pk:
+        row = (AcademicRecord.objects.filter(pk=instance.pk)
+               .values_list('student_id', 'semester', 'course_name', 'verified_by_id').first())
+        if row:
+            student_id, semester, course_name, verified_by_id = row
+            instance._previous_summary_key = (student_id, semester)
+            instance._previous_grade_bucket = (course_name, semester, verified_by_id)
+
+
+@receiver(post_save, sender=AcademicRecord)
+def academic_record_saved(sender, instance, **kwargs):
+    keys = {(instance.student_id, int(instance.semester))}
+    if getattr(instance, '_previous_summary_key', None):
+        keys.add(instance._previous_summary_key)
+    refresh_semester_summaries(keys)
+
+
+@receiver(post_delete, sender=AcademicRecord)
+def academic_record_deleted(sender, instance, **kwargs):
+    refresh_semester_summaries({(instance.student_id, instance.semester)})
+
+
+@receiver(records_bulk_changed, sender=AcademicRecord)
+def academic_records_bulk_changed(sender, values, **kwargs):
+    refresh_semester_summaries({(row['student_id'], row['semester']) for row in values})
+
+
+# --- Analytics rollups (core.analytics) ---
+
+@receiver(post_save, sender=AcademicRecord)
+@receiver(post_delete, sender=AcademicRecord)
+def academic_record_changed_rollup(sender, instance, **kwargs):
+    buckets = {(instance.course_name, int(instance.semester), instance.verified_by_id)}
+    if getattr(instance, '_previous_grade_bucket', None):
+        buckets.add(instance._previous_grade_bucket)
+    mark_grades_dirty(buckets)
+
+
+@receiver(pre_save, sender=ExamResult)
+def remember_exam_bucket(sender, instance, **kwargs):
+    # The rollup bucket and the rank index entry an edited result leaves.
+    instance._previous_exam_bucket = instance._previous_exam_score = None
+    if instance.pk:
+        row = ExamResult.objects.filter(pk=instance.pk).values_list('exam_name', 'verified_by_id', 'score').first()
+        if row:
+            exam_name, verified_by_id, score = row
+            instance._previous_exam_bucket = (exam_name, verified_by_id)
+            instance._previous_exam_score = (exam_name, score)
+
+
+@receiver(post_save, sender=ExamResult)
+@receiver(post_delete, sender=ExamResult)
+def exam_result_changed_rollup(sender, instance, **kwargs):
+    buckets = {(instance.exam_name, instance.verified_by_id)}
+    if getattr(instance, '_previous_exam_bucket', None):
+        buckets.add(instance._previous_exam_bucket)
+    mark_exams_dirty(buckets)
+
+
+@receiver(records_bulk_changed, sender=AcademicRecord)
+def academic_records_bulk_changed_rollup(sender, values, **kwargs):
+    mark_grades_dirty((row['course_name'], int(row['semester']), row.get('verified_by_id')) for row in values)
+
+
+@receiver(records_bulk_changed, sender=ExamResult)
+def exam_results_bulk_changed_rollup(sender, values, **kwargs):
+    mark_exams_dirty((row['exam_name'], row.get('verified_by_id')) for row in values)
+
+
+# --- Exam rank index (core.ranking) ---
+
+@receiver(post_save, sender=ExamResult)
+def exam_result_saved_rank(sender, instance, **kwargs):
+    deltas = Counter({(instance.exam_name, float(instance.score)): 1})
+    if getattr(instance, '_previous_exam_score', None):
+        deltas[instance._previous_exam_score] -= 1
+    adjust_counts(deltas)
+
+
+@receiver(post_delete, sender=ExamResult)
+def exam_result_deleted_rank(sender, instance, **kwargs):
+    adjust_counts({(instance.exam_name, float(instance.score)): -1})
+
+
+@receiver(records_bulk_changed, sender=ExamResult)
+def exam_results_bulk_changed_rank(sender, values, previous=None, **kwargs):
+    deltas = Counter((row['exam_name'], float(row['score'])) for row in values)
+    deltas.subtract((row['exam_name'], float(row['score'])) for row in previous or () if row is not None)
+    adjust_counts(deltas)
+
+
+# --- Institution dashboard counts ---
+
+def _invalidate_stats_for_students(student_ids):
+    institution_ids = set(
+        Student.objects.filter(pk__in=student_ids).values_list('current_institution_id', flat=True)
+    )
+    invalidate_institution_stats(*institution_ids)
+
+
+@receiver(pre_save, sender=Student)
+def remember_student_institution(sender, instance, **kwargs):
+    instance._previous_institution_id = (
+        Student.objects.filter(pk=instance.pk).values_list('current_institution_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def student_changed(sender, instance, **kwargs):
+    invalidate_institution_stats(instance.current_institution_id, getattr(instance, '_previous_institution_id', None))
+
+
+@receiver(post_save, sender=AcademicRecord)
+@receiver(post_delete, sender=AcademicRecord)
+@receiver(post_save, sender=ExamResult)
+@receiver(post_delete, sender=ExamResult)
+def record_changed_stats(sender, instance, **kwargs):
+    _invalidate_stats_for_students([instance.student_id])
+
+
+@receiver(records_bulk_changed, sender=AcademicRecord)
+@receiver(records_bulk_changed, sender=ExamResult)
+def records_bulk_changed_stats(sender, values, **kwargs):
+    _invalidate_stats_for_students({row['student_id'] for row in values})
+
+
+# --- Per-student record versions (cached fragments) ---
+
+@receiver(post_save, sender=AcademicRecord)
+@receiver(post_delete, sender=AcademicRecord)
+@receiver(post_save, sender=CoCurricularRecord)
+@receiver(post_delete, sender=CoCurricularRecord)
+@receiver(post_save, sender=ExamResult)
+@receiver(post_delete, sender=ExamResult)
+def record_changed_version(sender, instance, **kwargs):
+    # An academic record moved to another student also changes the one it left.
+    previous = getattr(instance, '_previous_summary_key', None)
+    bump_records_versions(instance.student_id, previous[0] if previous else None)
+
+
+@receiver(records_bulk_changed)
+def records_bulk_changed_version(sender, values, **kwargs):
+    bump_records_versions(*{row['student_id'] for row in values})
+
+
+@receiver(post_save, sender=Student)
+def student_profile_changed_version(sender, instance, **kwargs):
+    # Verification snapshots show the student's institution.
+    bump_records_versions(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_renamed_version(sender, instance, created, update_fields=None, **kwargs):
+    # ...and their name. Logins only touch last_login; skip those.
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    bump_records_versions(instance.pk)
+
+
+# --- Record seals ---
+
+@receiver(post_save, sender=AcademicRecord)
+@receiver(post_save, sender=CoCurricularRecord)
+@receiver(post_save, sender=ExamResult)
+def record_saved_unseal(sender, instance, created, **kwargs):
+    # New records have no seal; an edited one needs its new content sealed.
+    if not created:
+        unseal(KIND_OF_MODEL[sender], [instance.pk])
+
+
+@receiver(post_delete, sender=AcademicRecord)
+@receiver(post_delete, sender=CoCurricularRecord)
+@receiver(post_delete, sender=ExamResult)
+def record_deleted_unseal(sender, instance, **kwargs):
+    # Some databases reuse the ids of deleted rows.
+    unseal(KIND_OF_MODEL[sender], [instance.pk])
+
+
+@receiver(records_bulk_changed)
+def records_bulk_changed_unseal(sender, updated_ids=(), **kwargs):
+    if updated_ids:
+        unseal(KIND_OF_MODEL[sender], updated_ids)
+
+
+# --- Change log (core.changelog) ---
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=AcademicRecord)
+@receiver(post_save, sender=CoCurricularRecord)
+@receiver(post_save, sender=ExamResult)
+def logged_model_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:  # fixtures
+        log_instance(instance, 'create' if created else 'update')
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=AcademicRecord)
+@receiver(post_delete, sender=CoCurricularRecord)
+@receiver(post_delete, sender=ExamResult)
+def logged_model_deleted(sender, instance, **kwargs):
+    log_instance(instance, 'delete')
+
+
+@receiver(records_bulk_changed)
+def records_bulk_changed_log(sender, created_ids=(), updated_ids=(), **kwargs):
+    log_bulk(sender, created_ids, updated_ids)
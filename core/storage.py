@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import cached_property
+
+# ==============================================================================
+# Private file storage for generated reports (core.reports).
+#
+# Mark sheets and result books hold every student's marks, so they live under
+# REPORT_ROOT, outside MEDIA_ROOT (which is served to anyone who knows a file's
+# URL). They have no public URL: the authenticated
+# /api/reports/<id>/artifact/ action streams them.
+# ==============================================================================
+
+
+class ReportStorage(FileSystemStorage):
+    """FileSystemStorage rooted at REPORT_ROOT instead of MEDIA_ROOT, with no URL."""
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.REPORT_ROOT)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'REPORT_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+    def url(self, name):
+        raise ValueError('Report artifacts are only served through /api/reports/<id>/artifact/.')
+
+
+report_storage = ReportStorage()
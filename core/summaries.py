@@ -0,0 +1,94 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .grading import get_grade_scale
+from .models import AcademicRecord, SemesterSummary
+from .upserts import upsert
+
+# ==============================================================================
+# Maintenance of the SemesterSummary table.
+#
+# Writes only ever touch the (student, semester) buckets they affect: the
+# handful of records in each bucket are re-read in one query and the bucket's
+# summary row is upserted. Nothing here scans a student's whole history or the
+# whole table, except rebuild_all_summaries().
+# ==============================================================================
+
+SUMMARY_FIELDS = ['record_count', 'graded_count', 'passed_count', 'points_total', 'gpa', 'latest_recorded_at',
+                  'updated_at']
+
+
+def _summarise(records, scale):
+    """Build an unsaved SemesterSummary from an iterable of (grade, recorded_at)."""
+    summary = SemesterSummary()
+    for grade, recorded_at in records:
+        summary.record_count += 1
+        points = scale.points_for(grade)
+        if points is not None:
+            summary.graded_count += 1
+            summary.points_total += points
+            if points >= scale.pass_points:
+                summary.passed_count += 1
+        if recorded_at and (summary.latest_recorded_at is None or recorded_at > summary.latest_recorded_at):
+            summary.latest_recorded_at = recorded_at
+    if summary.graded_count:
+        summary.gpa = round(summary.points_total / summary.graded_count, 2)
+    return summary
+
+
+def refresh_semester_summaries(keys):
+    """
+    Recompute the summaries for an iterable of (student_id, semester) pairs.
+    Buckets left without records lose their summary row.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    scale = get_grade_scale()
+
+    grouped = defaultdict(list)
+    rows = AcademicRecord.objects.filter(
+        student_id__in={student_id for student_id, _ in keys},
+        semester__in={semester for _, semester in keys},
+    ).values_list('student_id', 'semester', 'grade', 'recorded_at')
+    for student_id, semester, grade, recorded_at in rows:
+        if (student_id, semester) in keys:
+            grouped[(student_id, semester)].append((grade, recorded_at))
+
+    summaries = []
+    for (student_id, semester), records in grouped.items():
+        summary = _summarise(records, scale)
+        summary.student_id = student_id
+        summary.semester = semester
+        summaries.append(summary)
+
+    # Summary rows are pure derived data: upsert the buckets that still have
+    # records (see core.upserts) and drop the rows of those that don't.
+    with transaction.atomic():
+        upsert(SemesterSummary, summaries, ['student', 'semester'], SUMMARY_FIELDS)
+        emptied = keys - set(grouped)
+        if emptied:
+            stale = SemesterSummary.objects.filter(student_id__in={student_id for student_id, _ in emptied})
+            stale_ids = [pk for pk, student_id, semester in stale.values_list('pk', 'student_id', 'semester')
+                         if (student_id, semester) in emptied]
+            SemesterSummary.objects.filter(pk__in=stale_ids).delete()
+
+
+def rebuild_all_summaries(batch_size=500, stdout=None):
+    """Recompute every summary from scratch, a batch of students at a time."""
+    SemesterSummary.objects.all().delete()
+    student_ids = AcademicRecord.objects.values_list('student_id', flat=True).distinct().order_by('student_id')
+    last_id = None
+    rebuilt = 0
+    while True:
+        batch = student_ids if last_id is None else student_ids.filter(student_id__gt=last_id)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return rebuilt
+        keys = AcademicRecord.objects.filter(student_id__in=batch).values_list('student_id', 'semester').distinct()
+        refresh_semester_summaries(keys)
+        rebuilt += len(batch)
+        last_id = batch[-1]
+        if stdout:
+            stdout.write(f'{rebuilt} students summarised')
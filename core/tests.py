@@ -1,3 +1,1774 @@
-from django.test import TestCase
+import base64
+import gzip
+import io
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    University, Institution, Student, AcademicRecord, CoCurricularRecord, ExamResult, SemesterSummary, ReportJob,
+    ExamScoreRollup, GradeRollup, DirtyRollupBucket, ExamScoreCount, SealBatch, ChangeLogEntry,
+)
+from .export import iter_institution_records
+from .roles import STUDENTS, STUDYING_INSTITUTIONS, get_user_roles
+from .onboarding import RosterOnboarder
+from .summaries import rebuild_all_summaries
+from .ingest import ACADEMIC_RECORDS, EXAM_RESULTS, RecordIngestor, iter_rows
+from .pagination import CoCurricularRecordPagination, RecordPagination
+from .serializers import RoleTokenObtainPairSerializer, StudentSerializer, ExamResultSerializer
+from .fastpath import compile_reader
+from . import fastpath
+from .benchmark import compare_reports, percentile, summarise
+from .reference import VERSION_KEY
+from . import metrics
+from .photos import generate_variants, photo_urls
+from .verification import content_hash
+from . import merkle, sealing
+from .signals import records_bulk_changed
+from .instrumentation import fingerprint
+from .checks import check_throttle_cache
+from .throttling import TokenBucket
+from . import analytics, changelog, onboarding, ranking, reports
+from .routers import PIN_COOKIE, ReadReplicaRouter, _RequestRouting, _routing
+
+
+# --- Shared helpers ---
+
+class QueryBudgetMixin:
+    """
+    Reusable query-budget assertion. Unlike assertNumQueries it fails only when
+    the budget is exceeded, and it prints the offending SQL so an N+1 that
+    sneaks back in through a serializer change is easy to spot.
+    """
+    def assertQueryBudget(self, budget, using='default'):
+        return _QueryBudgetContext(self, budget, connections[using])
+
+
+class _QueryBudgetContext(CaptureQueriesContext):
+    def __init__(self, test_case, budget, connection):
+        self.test_case = test_case
+        self.budget = budget
+        super().__init__(connection)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+        executed = len(self)
+        if executed > self.budget:
+            queries = '\n'.join(
+                f'{i}. {query["sql"]}' for i, query in enumerate(self.captured_queries, start=1)
+            )
+            self.test_case.fail(
+                f'{executed} queries executed, budget is {self.budget}\nCaptured queries were:\n{queries}'
+            )
+
+
+def make_institution(name='Test College', university_name='Test University'):
+    university, _ = University.objects.get_or_create(name=university_name, defaults={'address': 'Campus Road'})
+    return Institution.objects.create(university=university, name=name, address='Main Street')
+
+
+def make_user(username, group=None, **extra):
+    user = User.objects.create_user(username=username, password='pass12345', **extra)
+    if group:
+        user.groups.add(Group.objects.get_or_create(name=group)[0])
+    return user
+
+
+def make_student(username, institution, records=1):
+    student = Student.objects.create(user=make_user(username, 'Students'), current_institution=institution)
+    for i in range(records):
+        AcademicRecord.objects.create(
+            student=student, course_name=f'Course {i}', semester=i % 8 + 1, grade='A',
+            record_type='COLLEGE', verified_by=institution,
+        )
+        CoCurricularRecord.objects.create(
+            student=student, activity_name=f'Activity {i}', description='-', date='2025-01-01',
+            record_type='COLLEGE', verified_by=institution,
+        )
+        ExamResult.objects.create(
+            student=student, exam_name=f'Exam {i}', score=50 + i,
+            record_type='COLLEGE', verified_by=institution,
+        )
+    return student
+
+
+# --- Query count regression tests ---
+
+class ConstantQueryCountTests(QueryBudgetMixin, TestCase):
+    """The core list/retrieve endpoints must not scale their query count with row count."""
+
+    # two role checks + students (joined) + three record prefetches
+    STUDENT_LIST_BUDGET = 6
+    RECORD_LIST_BUDGET = 3
+
+    def setUp(self):
+        self.institution = make_institution()
+        self.staff = make_user('registrar', 'Studying_Institutions')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def _populate(self, count, prefix):
+        other = make_institution(name=f'{prefix} College', university_name=f'{prefix} University')
+        for i in range(count):
+            make_student(f'{prefix}-{i}', self.institution if i % 2 else other, records=3)
+
+    def test_student_list_is_constant(self):
+        self._populate(2, 'small')
+        with self.assertQueryBudget(self.STUDENT_LIST_BUDGET):
+            response = self.client.get('/api/students/')
+        self.assertEqual(response.status_code, 200)
+
+        self._populate(10, 'large')
+        with self.assertQueryBudget(self.STUDENT_LIST_BUDGET):
+            response = self.client.get('/api/students/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_student_retrieve_is_constant(self):
+        student = make_student('solo', self.institution, records=10)
+        with self.assertQueryBudget(self.STUDENT_LIST_BUDGET):
+            response = self.client.get(f'/api/students/{student.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['academic_records'][0]['verified_by'], str(self.institution))
+
+    def test_record_lists_are_constant(self):
+        self._populate(10, 'bulk')
+        for url in ('/api/academic-records/', '/api/cocurricular-records/', '/api/exam-results/'):
+            with self.subTest(url=url), self.assertQueryBudget(self.RECORD_LIST_BUDGET):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+
+# --- Pagination ---
+
+class KeysetPaginationTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.institution = make_institution()
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('registrar', 'Studying_Institutions'))
+        for i in range(7):
+            make_student(f'student-{i}', self.institution, records=1)
+
+    def _walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_pages_cover_every_row_once(self):
+        records = self._walk('/api/academic-records/?page_size=3')
+        ids = [record['id'] for record in records]
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(len(set(ids)), 7)
+        # newest first
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+        students = self._walk('/api/students/?page_size=2')
+        self.assertEqual(len(students), 7)
+
+    def test_ties_are_paged_by_id_even_when_rows_vanish(self):
+        AcademicRecord.objects.update(recorded_at=AcademicRecord.objects.first().recorded_at)
+        expected = list(AcademicRecord.objects.order_by('-id').values_list('id', flat=True))
+        first = self.client.get('/api/academic-records/?page_size=3').data
+        # a row already served disappears before the next page is read
+        AcademicRecord.objects.filter(pk=first['results'][0]['id']).delete()
+        rest = self._walk(first['next'])
+        self.assertEqual([r['id'] for r in first['results'] + rest], expected)
+
+        # and back again through the previous links
+        response = self.client.get(first['next']).data
+        last = self.client.get(response['next']).data
+        back = self.client.get(last['previous']).data
+        self.assertEqual([r['id'] for r in back['results']], [r['id'] for r in response['results']])
+        self.assertEqual([r['id'] for r in self.client.get(back['previous']).data['results']], expected[1:3])
+
+        cursor = base64.b64encode(b'p=' + b'["2025-01-01T00:00:00", "x"]').decode()
+        self.assertEqual(self.client.get(f'/api/academic-records/?cursor={cursor}').status_code, 404)
+
+    def test_no_count_query(self):
+        with self.assertQueryBudget(3) as ctx:
+            response = self.client.get('/api/exam-results/?page_size=2')
+        self.assertNotIn('count', response.data)
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in ctx.captured_queries))
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(CoCurricularRecordPagination, 'max_page_size', 4):
+            response = self.client.get('/api/cocurricular-records/?page_size=100000')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 4)
+
+
+# --- Bulk ingestion ---
+
+class BulkIngestTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.institution = make_institution()
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('registrar', 'Studying_Institutions'))
+        self.students = [make_student(f'bulk-{i}', self.institution, records=0) for i in range(20)]
+
+    def _upload(self, url, name, content):
+        return self.client.post(url, {'file': SimpleUploadedFile(name, content.encode())}, format='multipart')
+
+    def test_csv_upload_is_idempotent(self):
+        lines = ['student,course_name,semester,grade,record_type']
+        lines += [f'{student.pk},Maths,1,A,COLLEGE' for student in self.students]
+        content = '\n'.join(lines)
+
+        response = self._upload('/api/academic-records/bulk/', 'results.csv', content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['failed']), (20, 0, 0))
+
+        response = self._upload('/api/academic-records/bulk/', 'results.csv', content.replace(',A,', ',B,'))
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 20))
+        self.assertEqual(AcademicRecord.objects.count(), 20)
+        self.assertFalse(AcademicRecord.objects.exclude(grade='B').exists())
+
+    def test_jsonl_reports_row_errors_without_aborting(self):
+        content = '\n'.join([
+            json.dumps({'username': 'bulk-0', 'exam_name': 'Finals', 'score': 91.5, 'record_type': 'COLLEGE'}),
+            'not json',
+            json.dumps({'username': 'nobody', 'exam_name': 'Finals', 'score': 10, 'record_type': 'COLLEGE'}),
+            json.dumps({'student': self.students[1].pk, 'exam_name': 'Finals', 'score': 'high', 'record_type': 'X'}),
+            json.dumps({'student': self.students[2].pk, 'exam_name': 'Finals', 'score': 55, 'record_type': 'UNIVERSITY'}),
+        ])
+        response = self._upload('/api/exam-results/bulk/', 'results.jsonl', content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4])
+        self.assertIn('username', response.data['errors'][1]['errors'])
+        self.assertEqual(set(response.data['errors'][2]['errors']), {'score', 'record_type'})
+
+    def test_undecodable_files_end_with_an_error_row(self):
+        header = 'username,course_name,semester,grade,record_type\n'
+        latin1 = (header + 'bulk-0,Maths,1,A,COLLEGE\nbulk-1,Fran\xe7ais,1,A,COLLEGE\n').encode('latin-1')
+        response = self.client.post('/api/academic-records/bulk/',
+                                    {'file': SimpleUploadedFile('results.csv', latin1)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 1))
+        self.assertIn('not UTF-8', response.data['errors'][0]['errors']['non_field_errors'][0])
+
+        oversized = header + f'bulk-2,"{"x" * 200_000}",1,A,COLLEGE\n'
+        response = self._upload('/api/academic-records/bulk/', 'results.csv', oversized)
+        self.assertEqual((response.status_code, response.data['failed']), (200, 1))
+        self.assertEqual(response.data['errors'][0]['row'], 1)
+        self.assertIn('Malformed CSV', response.data['errors'][0]['errors']['non_field_errors'][0])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        lines = ['username,course_name,semester,grade,record_type']
+        lines += [f'bulk-{i % 20},Course {i},{i % 8 + 1},A,COLLEGE' for i in range(200)]
+        ingestor = RecordIngestor(ACADEMIC_RECORDS, default_institution=self.institution, chunk_size=500)
+        upload = SimpleUploadedFile('results.csv', '\n'.join(lines).encode())
+        # lookups, batched INSERTs, the semester summary refresh, the change log
+        # and analytics dirty marks, plus savepoints; none of it depends on the
+        # number of rows in the chunk
+        with self.assertQueryBudget(16):
+            report = ingestor.ingest(iter_rows(upload, 'csv'))
+        self.assertEqual(report['created'], 200)
+
+
+# --- Streaming export ---
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.institution = make_institution()
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('registrar', 'Studying_Institutions'))
+        for i in range(3):
+            make_student(f'export-{i}', self.institution, records=2)
+        make_student('elsewhere', make_institution(name='Other College'), records=2)
+
+    def test_csv_export_streams_all_records(self):
+        response = self.client.get(f'/api/institutions/{self.institution.pk}/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('record_kind,record_id,student_id'))
+        # 3 students x 2 records x 3 kinds
+        self.assertEqual(len(lines) - 1, 18)
+        self.assertFalse(any('elsewhere' in line for line in lines))
+
+    def test_gzip_jsonl_export(self):
+        response = self.client.get(f'/api/institutions/{self.institution.pk}/export/?file_format=jsonl&compress=gzip')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+        self.assertEqual(len(rows), 18)
+        self.assertEqual({row['record_kind'] for row in rows}, {'academic', 'cocurricular', 'exam'})
+        self.assertEqual(rows[0]['verified_by'], str(self.institution))
+
+    def test_export_batches_use_keyset(self):
+        batches = list(iter_institution_records(self.institution, chunk_size=4))
+        self.assertEqual([len(batch) for batch in batches], [4, 2, 4, 2, 4, 2])
+
+
+# --- Role resolution ---
+
+class RoleResolutionTests(TestCase):
+    def setUp(self):
+        make_institution()
+        self.user = make_user('registrar', STUDYING_INSTITUTIONS)
+
+    def test_jwt_carries_roles_and_permissions_skip_group_queries(self):
+        client = APIClient()
+        response = client.post('/api/token/', {'username': 'registrar', 'password': 'pass12345'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        # make sure the permission can't be answered from the role cache either
+        cache.clear()
+
+        with CaptureQueriesContext(connections['default']) as ctx:
+            response = client.get('/api/academic-records/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('auth_group' in query['sql'] for query in ctx.captured_queries))
+
+    def test_refreshed_access_tokens_carry_current_roles(self):
+        client = APIClient()
+        refresh = client.post('/api/token/', {'username': 'registrar', 'password': 'pass12345'},
+                              format='json').data['refresh']
+        self.user.groups.clear()
+        response = client.post('/api/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(client.get('/api/academic-records/').status_code, 403)
+
+        self.user.groups.add(Group.objects.get(name=STUDYING_INSTITUTIONS))
+        response = client.post('/api/token/refresh/', {'refresh': refresh}, format='json')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(client.get('/api/academic-records/').status_code, 200)
+
+    def test_roles_are_cached_across_requests_and_invalidated(self):
+        self.assertEqual(get_user_roles(User.objects.get(pk=self.user.pk)), {STUDYING_INSTITUTIONS})
+        # a fresh user object (i.e. the next request) is served from the cache
+        next_request_user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_roles(next_request_user), {STUDYING_INSTITUTIONS})
+
+        self.user.groups.add(Group.objects.get_or_create(name=STUDENTS)[0])
+        self.assertEqual(get_user_roles(User.objects.get(pk=self.user.pk)), {STUDENTS, STUDYING_INSTITUTIONS})
+
+        Group.objects.get(name=STUDENTS).user_set.clear()
+        self.assertEqual(get_user_roles(User.objects.get(pk=self.user.pk)), {STUDYING_INSTITUTIONS})
+
+
+# --- Semester summaries ---
+
+class SemesterSummaryTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.institution = make_institution()
+        self.student = make_student('summary', self.institution, records=0)
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('registrar', STUDYING_INSTITUTIONS))
+
+    def _record(self, grade, semester=1, course='Maths'):
+        return AcademicRecord.objects.create(
+            student=self.student, course_name=course, semester=semester, grade=grade,
+            record_type='COLLEGE', verified_by=self.institution,
+        )
+
+    def _summary(self, semester=1):
+        return SemesterSummary.objects.get(student=self.student, semester=semester)
+
+    def test_refresh_survives_a_concurrent_refresh_of_the_same_bucket(self):
+        self._record('O')
+        create = SemesterSummary.objects.bulk_create
+
+        def racing_create(objs, **kwargs):
+            # another transaction commits its row for the bucket first
+            SemesterSummary.objects.filter(student=self.student, semester=1).delete()
+            create([SemesterSummary(student=self.student, semester=1, record_count=99)])
+            return create(objs, **kwargs)
+
+        with mock.patch.object(SemesterSummary.objects, 'bulk_create', racing_create):
+            self._record('B', course='Physics')
+        self.assertEqual((self._summary().record_count, self._summary().gpa), (2, 8.0))
+
+    def test_summary_follows_inserts_updates_and_deletes(self):
+        maths = self._record('O')
+        physics = self._record('B', course='Physics')
+        self.assertEqual((self._summary().gpa, self._summary().record_count), (8.0, 2))
+
+        physics.grade = 'A+'
+        physics.save()
+        self.assertEqual(self._summary().gpa, 9.5)
+
+        physics.semester = 2
+        physics.save()
+        self.assertEqual((self._summary(1).gpa, self._summary(2).gpa), (10.0, 9.0))
+
+        maths.delete()
+        self.assertFalse(SemesterSummary.objects.filter(student=self.student, semester=1).exists())
+
+    def test_unknown_grades_count_but_are_not_graded(self):
+        self._record('F')
+        self._record('??', course='Art')
+        summary = self._summary()
+        self.assertEqual((summary.record_count, summary.graded_count, summary.passed_count, summary.gpa),
+                         (2, 1, 0, 0.0))
+
+    def test_bulk_ingest_and_rebuild(self):
+        upload = SimpleUploadedFile('r.csv', b'username,course_name,semester,grade,record_type\n'
+                                             b'summary,Maths,3,A,COLLEGE\nsummary,Physics,3,O,COLLEGE\n')
+        RecordIngestor(ACADEMIC_RECORDS, default_institution=self.institution).ingest(iter_rows(upload, 'csv'))
+        self.assertEqual(self._summary(3).gpa, 9.0)
+
+        SemesterSummary.objects.all().delete()
+        self.assertEqual(rebuild_all_summaries(), 1)
+        self.assertEqual(self._summary(3).gpa, 9.0)
+
+    def test_summary_endpoint(self):
+        self._record('A', semester=1)
+        self._record('O', semester=2)
+        with self.assertQueryBudget(4):
+            response = self.client.get(f'/api/students/{self.student.pk}/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cgpa'], 9.0)
+        self.assertEqual([row['semester'] for row in response.data['semesters']], [1, 2])
+
+
+# --- Query plan regressions ---
+
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN for the hot record queries and fails when one stops using
+    its index (or starts sorting in a temp table / filesort).
+    """
+    SORT_MARKERS = ('USE TEMP B-TREE', 'USING FILESORT')
+
+    @classmethod
+    def setUpTestData(cls):
+        institution = make_institution()
+        for i in range(10):
+            make_student(f'plan-{i}', institution, records=5)
+        cls.student_id = Student.objects.values_list('pk', flat=True).first()
+        cls.institution_id = institution.pk
+
+    def assertUsesIndex(self, queryset, index_name, sorted_by_index=False):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f'Expected {index_name} in plan:\n{plan}')
+        if sorted_by_index:
+            for marker in self.SORT_MARKERS:
+                self.assertNotIn(marker, plan.upper(), f'Unexpected sort in plan:\n{plan}')
+
+    def test_transcript_by_semester(self):
+        self.assertUsesIndex(
+            AcademicRecord.objects.filter(student_id=self.student_id, semester=2), 'acad_student_semester_idx')
+
+    def test_records_by_student_and_type(self):
+        for model, index in ((AcademicRecord, 'acad_student_type_idx'),
+                             (CoCurricularRecord, 'cocur_student_type_idx'),
+                             (ExamResult, 'exam_student_type_idx')):
+            with self.subTest(model=model.__name__):
+                self.assertUsesIndex(model.objects.filter(student_id=self.student_id, record_type='COLLEGE'), index)
+
+    def test_verifier_timeline(self):
+        for model, index in ((AcademicRecord, 'acad_verifier_recorded_idx'),
+                             (ExamResult, 'exam_verifier_recorded_idx')):
+            with self.subTest(model=model.__name__):
+                queryset = model.objects.filter(verified_by_id=self.institution_id).order_by('-recorded_at')
+                self.assertUsesIndex(queryset, index, sorted_by_index=True)
+
+    def test_exam_ranking(self):
+        self.assertUsesIndex(ExamResult.objects.filter(exam_name='Exam 1', score__gt=50), 'exam_name_score_idx')
+        self.assertUsesIndex(ExamResult.objects.filter(exam_name='Exam 1').order_by('-score'),
+                             'exam_name_score_idx', sorted_by_index=True)
+
+    def test_record_list_pages(self):
+        ordering = RecordPagination.ordering
+        for model, index in ((AcademicRecord, 'acad_recorded_id_idx'), (ExamResult, 'exam_recorded_id_idx')):
+            with self.subTest(model=model.__name__):
+                first_page = model.objects.with_verifier().order_by(*ordering)[:51]
+                self.assertUsesIndex(first_page, index, sorted_by_index=True)
+                deep_page = model.objects.with_verifier().filter(
+                    recorded_at__lt=model.objects.latest('recorded_at').recorded_at).order_by(*ordering)[:51]
+                self.assertUsesIndex(deep_page, index, sorted_by_index=True)
+
+
+# --- Bulk onboarding ---
+
+class BulkOnboardingTests(TestCase):
+    ROSTER = (
+        'username,email,password,first_name\n'
+        'asha,asha@example.com,s3cret-pass,Asha\n'
+        'taken,taken@example.com,s3cret-pass,\n'
+        'ravi,not-an-email,s3cret-pass,\n'
+        'asha,again@example.com,s3cret-pass,\n'
+        'meera,meera@example.com,s3cret-pass,Meera\n'
+    )
+
+    def setUp(self):
+        self.institution = make_institution()
+        make_user('taken')
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('registrar', STUDYING_INSTITUTIONS))
+
+    def test_endpoint_creates_students_and_reports_duplicates(self):
+        upload = SimpleUploadedFile('roster.csv', self.ROSTER.encode())
+        with self.settings(ONBOARDING_WORKERS=1):
+            response = self.client.post('/api/students/bulk-onboard/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([d['row'] for d in response.data['duplicates']], [2, 4])
+        self.assertEqual(set(response.data['errors'][0]['errors']), {'email'})
+
+        asha = User.objects.get(username='asha')
+        self.assertTrue(asha.check_password('s3cret-pass'))
+        self.assertEqual(get_user_roles(asha), {STUDENTS})
+        self.assertEqual(asha.student.current_institution, self.institution)
+
+    def test_process_pool_hashing(self):
+        rows = [(i, {'username': f'pooled-{i}', 'password': f'pw-{i}'}, None) for i in range(1, 9)]
+        with self.settings(ONBOARDING_WORKERS=2):
+            report = RosterOnboarder(self.institution, batch_size=4).onboard(rows)
+        self.assertEqual(report['created'], 8)
+        self.assertTrue(User.objects.get(username='pooled-7').check_password('pw-7'))
+
+    @mock.patch('core.onboarding._pool', None)
+    @mock.patch('core.onboarding.ProcessPoolExecutor')
+    def test_hashing_pool_is_sized_by_the_setting(self, executor):
+        with self.settings(ONBOARDING_WORKERS=3):
+            pool = onboarding.get_hashing_pool()
+        with self.settings(ONBOARDING_WORKERS=5):
+            self.assertIs(onboarding.get_hashing_pool(), pool)
+        executor.assert_called_once_with(max_workers=3, initializer=onboarding._init_worker)
+
+
+# --- Async read endpoints ---
+
+class AsyncReadEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.institution = make_institution()
+        self.staff = make_user('registrar', STUDYING_INSTITUTIONS)
+        self.student = make_student('alice', self.institution, records=4)
+        make_student('bob', self.institution, records=3)
+        self.api = APIClient()
+        self.api.force_authenticate(self.staff)
+
+    def _token(self, user):
+        return str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+
+    def test_profile_matches_the_sync_endpoint(self):
+        expected = self.api.get(f'/api/students/{self.student.pk}/').json()
+        response = self.client.get(f'/api/async/students/{self.student.pk}/',
+                                   HTTP_AUTHORIZATION=f'Bearer {self._token(self.staff)}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected)
+        response = self.client.get(f'/api/async/students/{self.student.pk}/?fields=user&expand=exam_results',
+                                   HTTP_AUTHORIZATION=f'Bearer {self._token(self.staff)}')
+        self.assertEqual(set(response.json()), {'user', 'exam_results'})
+        # exam ranks are preloaded outside the event loop
+        expected = self.api.get(f'/api/students/{self.student.pk}/?fields=user,exam_ranks').json()
+        response = self.client.get(f'/api/async/students/{self.student.pk}/?fields=user,exam_ranks',
+                                   HTTP_AUTHORIZATION=f'Bearer {self._token(self.staff)}')
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(len(expected['exam_ranks']), 4)
+
+    def test_students_only_see_themselves(self):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self._token(self.student.user)}'}
+        bob = Student.objects.get(user__username='bob')
+        self.assertEqual(self.client.get(f'/api/async/students/{self.student.pk}/', **headers).status_code, 200)
+        self.assertEqual(self.client.get(f'/api/async/students/{bob.pk}/', **headers).status_code, 404)
+        self.assertEqual(self.client.get('/api/async/academic-records/', **headers).status_code, 403)
+
+    def test_authentication_is_required(self):
+        self.assertEqual(self.client.get('/api/async/exam-results/').status_code, 401)
+        response = self.client.get('/api/async/exam-results/', HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(response.status_code, 401)
+        # session auth works too
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/api/async/exam-results/').status_code, 200)
+
+    def test_composite_cursor_walks_every_row_once(self):
+        # identical timestamps: only the id tiebreaker keeps the pages apart
+        AcademicRecord.objects.update(recorded_at=AcademicRecord.objects.first().recorded_at)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self._token(self.staff)}'}
+        expected = [record['id'] for record in self.api.get('/api/academic-records/?page_size=100').json()['results']]
+        for url in ('/api/async/academic-records/?page_size=3', '/api/async/cocurricular-records/?page_size=3'):
+            seen = []
+            while url:
+                response = self.client.get(url, **headers)
+                self.assertEqual(response.status_code, 200)
+                seen.extend(record['id'] for record in response.json()['results'])
+                url = response.json()['next']
+            self.assertEqual(len(seen), 7)
+            self.assertEqual(len(set(seen)), 7)
+        self.assertEqual(self.client.get('/api/async/academic-records/?cursor=garbage', **headers).status_code, 404)
+
+        seen = []
+        url = '/api/async/academic-records/?page_size=2'
+        while url:
+            body = self.client.get(url, **headers).json()
+            seen.extend(record['id'] for record in body['results'])
+            url = body['next']
+        self.assertEqual(seen, expected)
+
+    def test_tampered_cursors_are_rejected(self):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self._token(self.staff)}'}
+        for values in (['not-a-date', 1], [None, None], ['2025-01-01T00:00:00', 'x'], {'id': 1}, [1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get(f'/api/async/academic-records/?cursor={cursor}', **headers)
+            self.assertEqual((response.status_code, response.json()), (404, {'detail': 'Invalid cursor'}), values)
+
+    async def test_async_client_and_token_roles(self):
+        token = await sync_to_async(self._token)(self.staff)
+        # the roles claim answers the permission check without a group lookup
+        await cache.aclear()
+        response = await self.async_client.get('/api/async/exam-results/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 7)
+
+    def test_student_dashboard_is_async(self):
+        self.client.force_login(self.student.user)
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Course 3')
+        self.assertContains(response, 'Welcome, alice!')
+
+        self.client.force_login(self.staff)
+        self.assertRedirects(self.client.get('/dashboard/'), '/login/', fetch_redirect_response=False)
+
+
+class BenchmarkHelperTests(TestCase):
+    def test_percentiles(self):
+        latencies = [i / 1000 for i in range(1, 101)]
+        summary = summarise(latencies, elapsed=2.0, errors=1)
+        self.assertEqual((summary['p50_ms'], summary['p95_ms'], summary['p99_ms']), (50.0, 95.0, 99.0))
+        self.assertEqual(summary['rps'], 50.0)
+        self.assertIsNone(percentile([], 50))
+
+
+# --- Reference data cache ---
+
+class ReferenceCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.institution = make_institution()
+        make_student('alice', self.institution, records=3)
+        self.staff = make_user('registrar', STUDYING_INSTITUTIONS)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_record_labels_come_from_the_cache(self):
+        self.client.get('/api/academic-records/')
+        with CaptureQueriesContext(connections['default']) as ctx:
+            response = self.client.get('/api/academic-records/')
+        self.assertEqual(response.data['results'][0]['verified_by'], 'Test College (Test University)')
+        self.assertFalse(any('core_institution' in query['sql'] for query in ctx.captured_queries))
+        self.assertEqual(metrics.snapshot(), {'reference_cache.hits': 1, 'reference_cache.misses': 1})
+
+    def test_writes_bump_the_version(self):
+        first = self.client.get(f'/api/institutions/{self.institution.pk}/').data
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(f'/api/institutions/{self.institution.pk}/').data, first)
+
+        university = self.institution.university
+        university.name = 'Renamed University'
+        university.save()
+        response = self.client.get('/api/academic-records/')
+        self.assertEqual(response.data['results'][0]['verified_by'], 'Test College (Renamed University)')
+
+        self.client.patch(f'/api/institutions/{self.institution.pk}/', {'name': 'New Name'}, format='json')
+        self.assertEqual(self.client.get(f'/api/institutions/{self.institution.pk}/').data['name'], 'New Name')
+        self.assertEqual([row['name'] for row in self.client.get('/api/institutions/').data['results']], ['New Name'])
+
+    def test_admin_user_is_neither_shown_nor_writable(self):
+        owner = make_user('owner', STUDYING_INSTITUTIONS)
+        Institution.objects.filter(pk=self.institution.pk).update(admin_user=owner)
+        self.assertNotIn('admin_user', self.client.get(f'/api/institutions/{self.institution.pk}/').data)
+        self.client.patch(f'/api/institutions/{self.institution.pk}/', {'admin_user': self.staff.pk}, format='json')
+        self.institution.refresh_from_db()
+        self.assertEqual(self.institution.admin_user, owner)
+
+    def test_lost_version_key_never_resurrects_old_entries(self):
+        self.client.get('/api/universities/')
+        cache.delete(VERSION_KEY)
+        University.objects.create(name='Second University', address='-')
+        self.assertEqual(len(self.client.get('/api/universities/').data['results']), 2)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        self.client.get('/api/universities/')
+        self.client.force_authenticate(make_user('root', is_staff=True))
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['reference_cache.misses'], 1)
+
+
+# --- Photo pipeline ---
+
+def make_photo(size=(1600, 1200), color='teal', fmt='JPEG', name='photo.jpg'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@mock.patch('core.photos.PHOTO_WORKERS', 0)
+class PhotoPipelineTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media = media.name
+
+        self.institution = make_institution()
+        self.student = make_student('alice', self.institution, records=0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student.user)
+
+    def _upload(self, student, photo):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/students/{student.pk}/', {'photo': photo}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        student.refresh_from_db()
+
+    def test_null_or_empty_photo_clears_it(self):
+        for empty, format in ((None, 'json'), ('', 'multipart')):
+            with self.subTest(photo=empty):
+                self._upload(self.student, make_photo())
+                response = self.client.patch(f'/api/students/{self.student.pk}/', {'phone_no': '+91 9000000000'},
+                                             format='json')
+                self.assertEqual(response.status_code, 200)
+                self.student.refresh_from_db()
+                self.assertTrue(self.student.photo)
+                response = self.client.patch(f'/api/students/{self.student.pk}/', {'photo': empty}, format=format)
+                self.assertEqual(response.status_code, 200, response.content)
+                self.student.refresh_from_db()
+                self.assertFalse(self.student.photo)
+                self.assertEqual(self.student.photo_variants, {})
+
+    def test_upload_is_content_addressed_and_variants_are_generated(self):
+        self._upload(self.student, make_photo())
+        self.assertRegex(self.student.photo.name, r'^student_photos/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(set(self.student.photo_variants), {'thumb', 'profile'})
+        with Image.open(os.path.join(self.media, self.student.photo_variants['thumb'])) as thumb:
+            self.assertEqual(thumb.size, (128, 96))
+        with Image.open(os.path.join(self.media, self.student.photo_variants['profile'])) as profile:
+            self.assertEqual(profile.size, (512, 384))
+
+        urls = self.client.get(f'/api/students/{self.student.pk}/').data['photo_variants']
+        self.assertEqual(set(urls), {'original', 'thumb', 'profile'})
+        self.assertTrue(urls['thumb'].startswith('http://testserver/media/student_photos/variants/'))
+
+    def test_identical_uploads_are_stored_once(self):
+        bob = make_student('bob', self.institution, records=0)
+        self._upload(self.student, make_photo(name='a.jpg'))
+        self.client.force_authenticate(bob.user)
+        self._upload(bob, make_photo(name='b.jpg'))
+        self.assertEqual(self.student.photo.name, bob.photo.name)
+        self.assertEqual(bob.photo_variants, self.student.photo_variants)
+        originals = [name for _, _, files in os.walk(os.path.join(self.media, 'student_photos'))
+                     for name in files if '_' not in name]
+        self.assertEqual(len(originals), 1)
+
+    def test_variants_wait_for_the_worker(self):
+        with mock.patch('core.photos.PHOTO_WORKERS', 1), mock.patch('core.photos.get_photo_pool') as pool:
+            self._upload(self.student, make_photo(fmt='PNG', name='p.png'))
+        pool.return_value.submit.assert_called_once()
+        self.assertTrue(self.student.photo.name.endswith('.png'))
+        self.assertEqual(self.student.photo_variants, {})
+        self.assertEqual(set(photo_urls(self.student)), {'original'})
+
+        generate_variants(self.student.photo.name)
+        self.student.refresh_from_db()
+        self.assertEqual(set(photo_urls(self.student)), {'original', 'thumb', 'profile'})
+
+
+# --- Fast read path ---
+
+class FastReadPathTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.institution = make_institution(name='Collège   Saint-Émile')
+        self.student = make_student('alice', self.institution, records=3)
+        for score in (1e16, 1e-5, 0.1, 75.25, 0.0):
+            ExamResult.objects.create(student=self.student, exam_name=f'Odd "score" \x01\u2028 {score}', score=score,
+                                      record_type='UNIVERSITY', verified_by=self.institution)
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('registrar', STUDYING_INSTITUTIONS))
+
+    def _both(self, url):
+        fast = self.client.get(url)
+        with mock.patch('core.views.compile_reader', return_value=None):
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        return fast.content, slow.content
+
+    def test_output_is_byte_identical_to_the_serializers(self):
+        record = AcademicRecord.objects.first()
+        urls = ['/api/academic-records/', '/api/cocurricular-records/', '/api/exam-results/',
+                '/api/exam-results/?page_size=2', f'/api/academic-records/{record.pk}/']
+        for encoder in ('orjson', 'json'):
+            with mock.patch('core.fastpath.orjson', fastpath.orjson if encoder == 'orjson' else None):
+                for url in urls:
+                    with self.subTest(url=url, encoder=encoder):
+                        fast, slow = self._both(url)
+                        self.assertEqual(fast, slow)
+
+    def test_cursor_pages_and_missing_rows(self):
+        seen = []
+        url = '/api/exam-results/?page_size=3'
+        while url:
+            body = self.client.get(url).json()
+            seen.extend(row['id'] for row in body['results'])
+            url = body['next']
+        self.assertEqual(sorted(seen), sorted(ExamResult.objects.values_list('id', flat=True)))
+        self.assertEqual(self.client.get('/api/exam-results/999999/').status_code, 404)
+
+    def test_unsupported_serializers_fall_back(self):
+        self.assertIsNone(compile_reader(StudentSerializer))
+        self.assertIsNotNone(compile_reader(ExamResultSerializer))
+
+
+# --- Sparse fieldsets ---
+
+class StudentShapeTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.institution = make_institution()
+        self.student = make_student('alice', self.institution, records=2)
+        make_student('bob', self.institution, records=2)
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('registrar', STUDYING_INSTITUTIONS))
+
+    def _tables(self, ctx):
+        return ' '.join(query['sql'] for query in ctx.captured_queries)
+
+    def test_list_defaults_to_the_lightweight_shape(self):
+        with CaptureQueriesContext(connections['default']) as ctx:
+            response = self.client.get('/api/students/')
+        self.assertEqual(set(response.data['results'][0]), {
+            'user', 'public_id', 'current_institution', 'photo', 'photo_variants', 'phone_no', 'contact_email',
+        })
+        self.assertNotIn('core_academicrecord', self._tables(ctx))
+
+    def test_expand_prefetches_only_what_is_asked_for(self):
+        with CaptureQueriesContext(connections['default']) as ctx:
+            response = self.client.get('/api/students/?expand=exam_results')
+        row = response.data['results'][0]
+        self.assertEqual(len(row['exam_results']), 2)
+        self.assertNotIn('academic_records', row)
+        sql = self._tables(ctx)
+        self.assertIn('core_examresult', sql)
+        self.assertNotIn('core_academicrecord', sql)
+        self.assertNotIn('core_cocurricularrecord', sql)
+
+    def test_fields_selects_top_level_fields(self):
+        response = self.client.get('/api/students/?fields=user,current_institution')
+        self.assertEqual(response.data['results'][0], {'user': 'alice', 'current_institution': str(self.institution)})
+        # naming a collection in ?fields= expands it
+        response = self.client.get(f'/api/students/{self.student.pk}/?fields=user,academic_records')
+        self.assertEqual(set(response.data), {'user', 'academic_records'})
+
+    def test_retrieve_keeps_the_full_shape(self):
+        response = self.client.get(f'/api/students/{self.student.pk}/')
+        self.assertIn('cocurricular_records', response.data)
+        response = self.client.get(f'/api/students/{self.student.pk}/?expand=')
+        self.assertNotIn('cocurricular_records', response.data)
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get('/api/students/?fields=user,password&expand=grades')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'fields', 'expand'})
+
+
+# --- Synthetic data and endpoint benchmarks ---
+
+class SeedDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _seed(self, prefix):
+        call_command('seed_data', universities=1, institutions=2, students=3, academic=4, cocurricular=1, exams=2,
+                     seed=7, prefix=prefix, batch_size=2, stdout=io.StringIO())
+
+    def test_hierarchy_is_generated_deterministically(self):
+        self._seed('a')
+        self._seed('b')
+        self.assertEqual(Institution.objects.count(), 4)
+        self.assertEqual(Student.objects.count(), 12)
+        self.assertEqual(AcademicRecord.objects.count(), 48)
+        self.assertEqual(ExamResult.objects.count(), 24)
+
+        def grades(prefix):
+            return list(AcademicRecord.objects.filter(student__user__username__startswith=f'{prefix}-')
+                        .order_by('pk').values_list('grade', 'semester', 'course_name'))
+        self.assertEqual(grades('a'), grades('b'))
+
+        # bulk inserts still feed derived data and roles
+        self.assertTrue(SemesterSummary.objects.exists())
+        staff = User.objects.get(username='a-staff-1-1')
+        self.assertEqual(Institution.for_user(staff).name, 'A College 1-1')
+        self.assertEqual(get_user_roles(staff), {STUDYING_INSTITUTIONS})
+
+        with self.assertRaises(CommandError):
+            self._seed('a')
+
+    def test_benchmark_report(self):
+        self._seed('bench')
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            call_command('benchmark_endpoints', iterations=2, warmup=0, endpoint=['api.*', 'frontend.dashboard'],
+                         output=output, stderr=io.StringIO())
+            with open(output) as report_file:
+                report = json.load(report_file)
+            self.assertEqual(report['meta']['scale']['students'], 6)
+            endpoints = report['endpoints']
+            self.assertIn('frontend.dashboard', endpoints)
+            self.assertNotIn('frontend.institution_dashboard', endpoints)
+            for name, result in endpoints.items():
+                self.assertEqual(result['status'], 200, name)
+                self.assertGreater(result['queries'], 0, name)
+                self.assertIsNotNone(result['p95_ms'], name)
+
+            # a baseline that did fewer queries is reported as a regression
+            baseline = {'endpoints': {'api.students.list': {'p95_ms': 10_000, 'queries': 0}}}
+            self.assertEqual(compare_reports(baseline, report),
+                             [f"api.students.list: queries 0 -> {endpoints['api.students.list']['queries']}"])
+
+
+# --- Request instrumentation ---
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1, INSTRUMENTATION_SLOW_MS=60_000)
+class RequestInstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.institution = make_institution()
+        self.student = make_student('alice', self.institution, records=3)
+        self.client.force_login(make_user('registrar', STUDYING_INSTITUTIONS))
+
+    def _timings(self, response):
+        return {metric.split(';')[0] for metric in response['Server-Timing'].split(', ')}
+
+    def test_server_timing_header(self):
+        response = self.client.get(f'/institution/student/{self.student.user_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue({'db', 'view', 'template', 'total'} <= self._timings(response))
+
+        api = APIClient()
+        api.force_authenticate(make_user('api', STUDYING_INSTITUTIONS))
+        response = api.get(f'/api/students/{self.student.pk}/')
+        self.assertIn('serializer', self._timings(response))
+
+    def test_repeated_queries_are_reported(self):
+        # without its prefetch the template loads record.verified_by once per row
+        with mock.patch('frontend.views.prefetch_related_objects'), \
+                self.assertLogs('markr.requests', 'INFO') as logs:
+            response = self.client.get(f'/institution/student/{self.student.user_id}/')
+        self.assertIn('dup;', response['Server-Timing'])
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertNotIn('query_list', entry)
+        self.assertTrue(any(duplicate['count'] >= 3 for duplicate in entry['duplicates']))
+
+    def test_slow_requests_log_their_queries(self):
+        with override_settings(INSTRUMENTATION_SLOW_MS=0):
+            self.client = self.client_class()
+            self.client.force_login(User.objects.get(username='registrar'))
+            with self.assertLogs('markr.requests', 'WARNING') as logs:
+                self.client.get(f'/institution/student/{self.student.user_id}/')
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(len(entry['query_list']), entry['queries'])
+
+    def test_disabled_by_default(self):
+        with override_settings(INSTRUMENTATION_SAMPLE_RATE=0):
+            self.client = self.client_class()
+            self.client.force_login(User.objects.get(username='registrar'))
+            response = self.client.get(f'/institution/student/{self.student.user_id}/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(fingerprint('SELECT 1 WHERE id IN (%s, %s, %s)'), fingerprint('SELECT 1 WHERE id IN (%s)'))
+
+
+# --- Read replicas (markR.test_settings defines the `replica` alias) ---
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.institution = make_institution()
+        self.student = make_student('alice', self.institution, records=2)
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('registrar', STUDYING_INSTITUTIONS))
+
+    def _routing(self):
+        return {name: count for name, count in metrics.snapshot().items() if name.startswith('db_router.')}
+
+    @contextmanager
+    def _stale_replica(self, table):
+        """Until exit the replica serves `table` as it is now, like a replica lagging behind."""
+        replica = connections['replica']
+        with replica.cursor() as cursor:
+            cursor.execute(f'CREATE TEMP TABLE stale_{table} AS SELECT * FROM {table}')
+
+        def lagging(execute, sql, params, many, context):
+            return execute(sql.replace(f'"{table}"', f'"stale_{table}"'), params, many, context)
+
+        try:
+            with replica.execute_wrapper(lagging):
+                yield
+        finally:
+            with replica.cursor() as cursor:
+                cursor.execute(f'DROP TABLE temp.stale_{table}')
+
+    def test_verification_snapshots_ignore_a_lagging_replica(self):
+        # The snapshot is cached under the student's new stamp; built from a
+        # lagging replica it would publish the old grade for a day.
+        with self._stale_replica('core_academicrecord'):
+            for record in AcademicRecord.objects.filter(student=self.student):
+                record.grade = 'F'
+                record.save()
+            response = APIClient().get(f'/api/verify/{self.student.public_id}/')
+        self.assertEqual({record['grade'] for record in response.json()['academic_records']}, {'F'})
+
+    def test_safe_reads_use_the_replica(self):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get('/api/academic-records/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertTrue(any('core_academicrecord' in query['sql'] for query in replica.captured_queries))
+        self.assertEqual(self._routing(), {'db_router.replica': 1})
+
+    def test_cached_dashboard_fragments_ignore_a_lagging_replica(self):
+        self.client.force_login(self.student.user)
+        with self._stale_replica('core_academicrecord'):
+            # a staff write: the student is not pinned to the primary
+            AcademicRecord.objects.create(student=self.student, course_name='Late Course', semester=3, grade='B',
+                                          record_type='COLLEGE', verified_by=self.institution)
+            response = self.client.get('/dashboard/')
+        self.assertContains(response, 'Late Course')
+        self.assertEqual(self._routing(), {})
+
+    def test_writers_are_pinned_to_the_primary(self):
+        response = self.client.post('/api/exam-results/', {
+            'student': self.student.pk, 'exam_name': 'Finals', 'score': 91, 'record_type': 'COLLEGE',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.client.get('/api/exam-results/')
+        # API clients that drop cookies are still pinned by user
+        self.client.cookies.clear()
+        self.client.get('/api/exam-results/')
+        self.assertEqual(self._routing(), {'db_router.pins': 1, 'db_router.pinned': 2})
+
+    def test_only_marked_views_and_core_models_are_routed(self):
+        self.client.force_login(User.objects.get(username='registrar'))
+        self.client.get(f'/institution/student/{self.student.user_id}/')
+        self.assertEqual(self._routing(), {})
+
+        router = ReadReplicaRouter()
+        state = _RequestRouting(RequestFactory().get('/'))
+        state.eligible = True
+        token = _routing.set(state)
+        try:
+            self.assertIsNone(router.db_for_read(User))
+            self.assertEqual(router.db_for_read(Student), 'replica')
+            self.assertEqual(router.db_for_write(Student), 'default')
+            # the rest of a request that wrote reads its own writes
+            self.assertIsNone(router.db_for_read(Student))
+        finally:
+            _routing.reset(token)
+
+    def test_no_replicas_configured(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.client = APIClient()
+            self.client.force_authenticate(User.objects.get(username='registrar'))
+            self.client.get('/api/academic-records/')
+        self.assertEqual(self._routing(), {})
+
+
+# --- Public verification ---
+
+class VerificationEndpointTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.institution = make_institution()
+        self.alice = make_student('alice', self.institution, records=2)
+        self.bob = make_student('bob', self.institution, records=1)
+        self.client = APIClient()  # anonymous
+
+    def _url(self, student):
+        return f'/api/verify/{student.public_id}/'
+
+    def test_public_ids_are_unique_per_student(self):
+        self.assertNotEqual(self.alice.public_id, self.bob.public_id)
+        self.assertEqual(Student.objects.filter(public_id=self.alice.public_id).get(), self.alice)
+
+    def test_snapshot_and_strong_etag(self):
+        response = self.client.get(self._url(self.alice))
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['public_id'], str(self.alice.public_id))
+        self.assertEqual(body['institution'], 'Test College (Test University)')
+        self.assertEqual([r['course_name'] for r in body['academic_records']], ['Course 0', 'Course 1'])
+        self.assertEqual(body['exam_results'][0]['verified_by'], 'Test College (Test University)')
+        self.assertEqual(body['content_hash'], content_hash({k: v for k, v in body.items() if k != 'content_hash'}))
+        self.assertEqual(response['ETag'], f'"{body["content_hash"]}"')
+        self.assertIn('public', response['Cache-Control'])
+
+        # warm: no queries, and a matching If-None-Match gets an empty 304
+        with self.assertQueryBudget(0):
+            cached = self.client.get(self._url(self.alice), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_snapshot_is_rebuilt_when_records_change(self):
+        etag = self.client.get(self._url(self.alice))['ETag']
+        self.assertEqual(self.client.get(self._url(self.bob)).status_code, 200)
+        ExamResult.objects.create(student=self.alice, exam_name='Finals', score=88.5, record_type='UNIVERSITY',
+                                  verified_by=self.institution)
+        response = self.client.get(self._url(self.alice), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Finals', [r['exam_name'] for r in response.json()['exam_results']])
+        # bob's snapshot was untouched
+        with self.assertQueryBudget(0):
+            self.client.get(self._url(self.bob))
+
+    def test_unknown_ids(self):
+        self.assertEqual(self.client.get('/api/verify/00000000-0000-4000-8000-000000000000/').status_code, 404)
+        self.assertEqual(self.client.get('/api/verify/not-a-uuid/').status_code, 404)
+
+    def test_batch_lookup(self):
+        ids = [str(self.bob.public_id), 'garbage', str(self.alice.public_id), str(self.bob.public_id),
+               '00000000-0000-4000-8000-000000000000']
+        response = self.client.post('/api/verify/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([r['public_id'] for r in body['results']], [ids[0], ids[2]])
+        self.assertEqual(body['not_found'], [ids[4], 'garbage'])
+        # each result is byte-for-byte the single lookup
+        single = self.client.get(self._url(self.alice)).content
+        self.assertIn(single, response.content)
+
+        with self.assertQueryBudget(0):
+            self.client.post('/api/verify/', {'ids': ids}, format='json')
+        self.assertEqual(self.client.post('/api/verify/', {'ids': 'x'}, format='json').status_code, 400)
+        with mock.patch('core.views.VERIFICATION_BATCH_LIMIT', 2):
+            self.assertEqual(self.client.post('/api/verify/', {'ids': ids}, format='json').status_code, 400)
+
+
+# --- Record sealing ---
+
+@skipUnless(sealing.Ed25519PrivateKey, 'cryptography is not installed')
+class RecordSealingTests(TestCase):
+    def setUp(self):
+        self.institution = make_institution()
+        self.alice = make_student('alice', self.institution, records=3)
+        make_student('bob', self.institution, records=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice.user)
+
+    def _mth(self, leaves):
+        # RFC 6962 section 2.1, written recursively
+        if len(leaves) == 1:
+            return leaves[0]
+        split = 1
+        while split * 2 < len(leaves):
+            split *= 2
+        return merkle.node_hash(self._mth(leaves[:split]), self._mth(leaves[split:]))
+
+    def test_tree_matches_rfc6962(self):
+        for size in range(1, 20):
+            leaves = [merkle.leaf_hash({'n': n}) for n in range(size)]
+            root, proofs = merkle.build_tree(leaves)
+            self.assertEqual(root, self._mth(leaves))
+            for index, leaf in enumerate(leaves):
+                self.assertEqual(merkle.root_from_proof(leaf, index, size, proofs[index]), root)
+        with self.assertRaises(ValueError):
+            merkle.root_from_proof(leaves[0], 0, size, proofs[0][:-1])
+
+    def _published(self):
+        return APIClient().get('/api/seals/roots/').json()
+
+    def test_bundles_verify_offline(self):
+        batches = sealing.seal_pending(batch_size=10)
+        self.assertEqual([(batch.sequence, batch.size) for batch in batches], [(1, 10), (2, 5)])
+        self.assertEqual(batches[1].previous_root, batches[0].root)
+        self.assertEqual(sealing.seal_pending(), [])
+
+        bundle = json.loads(self.client.get(f'/api/students/{self.alice.pk}/proof-bundle/').content)
+        self.assertEqual((len(bundle['records']), bundle['unsealed']), (9, 0))
+        published = self._published()
+        key = published['public_key']['public_key']
+        self.assertEqual(bundle['public_key']['public_key'], key)
+        problems = [problem for _, problem in merkle.verify_bundle(bundle, key, published['roots'])]
+        self.assertEqual(problems, [None] * 9)
+
+        bundle['records'][0]['record']['grade'] = 'O'
+        bundle['records'][1]['batch']['signature'] = '00' * 64
+        problems = [problem for _, problem in merkle.verify_bundle(bundle, key, published['roots'])]
+        self.assertEqual(problems[:3], ['Record does not match the sealed root.', 'Bad signature on the root.', None])
+        self.assertTrue(all(problem for _, problem in merkle.verify_bundle(bundle, '11' * 32)[:2]))
+
+    def test_sealing_needs_a_configured_key(self):
+        for seed in (None, '', 'not hex', '00' * 16):
+            with self.subTest(seed=seed), self.settings(SEAL_SIGNING_KEY=seed):
+                with self.assertRaises(ImproperlyConfigured):
+                    sealing.signing_key()
+                with self.assertRaises(ImproperlyConfigured):
+                    sealing.seal_pending()
+        self.assertFalse(SealBatch.objects.exists())
+
+    def test_edited_records_are_sealed_again(self):
+        sealing.seal_pending()
+        record = AcademicRecord.objects.filter(student=self.alice).first()
+        record.grade = 'B'
+        record.save()
+        exam = ExamResult.objects.filter(student=self.alice).first()
+        row = {'student_id': self.alice.pk, 'exam_name': exam.exam_name, 'score': exam.score}
+        records_bulk_changed.send(sender=ExamResult, values=[row], previous=[row], updated_ids=[exam.pk])
+        self.assertEqual(sealing.proof_bundle(self.alice)['unsealed'], 2)
+
+        batch, = sealing.seal_pending()
+        self.assertEqual((batch.sequence, batch.size), (2, 2))
+        bundle = sealing.proof_bundle(self.alice)
+        self.assertEqual(bundle['unsealed'], 0)
+        roots = self._published()['roots']
+        self.assertEqual(len(roots), 2)
+        key = bundle['public_key']['public_key']
+        self.assertTrue(all(problem is None for _, problem in merkle.verify_bundle(bundle, key, roots)))
+
+
+@override_settings(THROTTLE_BUCKETS={'auth-ip': (4, 60), 'auth-username': (2, 60)})
+class TokenBucketThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        make_user('alice')
+        self.client = APIClient()
+
+    def _obtain(self, username='alice', password='wrong', ip='10.0.0.1'):
+        return self.client.post('/api/token/', {'username': username, 'password': password}, REMOTE_ADDR=ip)
+
+    def test_bucket_drains_and_refills(self):
+        bucket = TokenBucket('test', 2, 10)  # one token every 5 s
+        with mock.patch('core.throttling.time.time', return_value=1000.0) as clock:
+            self.assertEqual(bucket.consume('x'), (True, 0))
+            self.assertEqual(bucket.consume('x'), (True, 0))
+            self.assertEqual(bucket.consume('x'), (False, 5))
+            self.assertEqual(bucket.consume('y'), (True, 0))
+            # rejections don't push the refill back
+            clock.return_value = 1005.0
+            self.assertEqual(bucket.consume('x'), (True, 0))
+            self.assertFalse(bucket.consume('x')[0])
+            # an idle bucket is full again, not over-full
+            clock.return_value = 2000.0
+            self.assertEqual([bucket.consume('x')[0] for _ in range(3)], [True, True, False])
+
+    def test_token_endpoint_throttles_per_username_before_hashing(self):
+        self.assertEqual(self._obtain(ip='10.0.0.1').status_code, 401)
+        self.assertEqual(self._obtain(ip='10.0.0.2').status_code, 401)
+        with mock.patch('django.contrib.auth.backends.ModelBackend.authenticate') as authenticate:
+            response = self._obtain(username=' ALICE ', password='pass12345', ip='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        authenticate.assert_not_called()
+        # other usernames are unaffected
+        self.assertEqual(self._obtain(username='bob', ip='10.0.0.3').status_code, 401)
+        counters = metrics.snapshot()
+        self.assertEqual(counters['throttle.auth-username.rejected'], 1)
+        self.assertEqual(counters['throttle.auth-username.admitted'], 3)
+
+    def test_token_endpoint_throttles_per_ip(self):
+        for name in ('a', 'b', 'c', 'd'):
+            self.assertEqual(self._obtain(username=name).status_code, 401)
+        self.assertEqual(self._obtain(username='alice', password='pass12345').status_code, 429)
+        response = self._obtain(username='alice', password='pass12345', ip='10.0.0.9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(metrics.snapshot()['throttle.auth-ip.rejected'], 1)
+
+    def test_malformed_token_requests_still_get_a_400(self):
+        for body in ([], 'x', {'username': ['alice'], 'password': 'wrong'}):
+            response = self.client.post('/api/token/', body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+        # they still count against the IP
+        self.assertEqual(metrics.snapshot()['throttle.auth-ip.admitted'], 3)
+        self.assertNotIn('throttle.auth-username.admitted', metrics.snapshot())
+
+    def test_startup_warns_about_per_process_buckets(self):
+        self.assertEqual([warning.id for warning in check_throttle_cache(None)], ['core.W001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                                   'LOCATION': 'redis://127.0.0.1:6379'}}):
+            self.assertEqual(check_throttle_cache(None), [])
+        with override_settings(THROTTLE_BUCKETS={}):
+            self.assertEqual(check_throttle_cache(None), [])
+
+    def test_api_bucket_is_opt_in_and_per_user(self):
+        self.client.force_authenticate(make_user('staff', STUDYING_INSTITUTIONS))
+        self.assertEqual(self.client.get('/api/students/').status_code, 200)
+        with override_settings(THROTTLE_BUCKETS={'api': (1, 60)}):
+            self.assertEqual(self.client.get('/api/students/').status_code, 200)
+            self.assertEqual(self.client.get('/api/students/').status_code, 429)
+            self.client.force_authenticate(make_user('other', STUDYING_INSTITUTIONS))
+            self.assertEqual(self.client.get('/api/students/').status_code, 200)
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.institution = make_institution()
+        self.student = make_student('alice', self.institution, records=0)
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('registrar', STUDYING_INSTITUTIONS))
+
+    def _feed(self, since=0, **params):
+        return self.client.get('/api/changes/', {'since': since, **params})
+
+    def _changes(self, since=0):
+        return [(c['kind'], c['id'], c['action']) for c in self._feed(since).json()['changes']]
+
+    def test_writes_are_logged_in_order(self):
+        cursor = self._feed('latest').json()['next']
+        record = AcademicRecord.objects.create(student=self.student, course_name='Maths', semester=1, grade='A',
+                                               record_type='COLLEGE', verified_by=self.institution)
+        record.grade = 'B'
+        record.save()
+        self.student.phone_no = '12345'
+        self.student.save()
+        pk = record.pk
+        record.delete()
+        self.assertEqual(self._changes(cursor), [
+            ('academic', pk, 'create'), ('academic', pk, 'update'),
+            ('student', self.student.pk, 'update'), ('academic', pk, 'delete'),
+        ])
+        self.assertEqual(self._feed(cursor).json()['changes'][0]['student'], self.student.pk)
+
+    def test_rolled_back_writes_leave_no_entry(self):
+        cursor = changelog.latest_cursor()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            ExamResult.objects.create(student=self.student, exam_name='Finals', score=90, record_type='COLLEGE',
+                                      verified_by=self.institution)
+            raise RuntimeError
+        self.assertEqual(self._changes(cursor), [])
+
+    def test_paging(self):
+        cursor = changelog.latest_cursor()
+        for i in range(5):
+            ExamResult.objects.create(student=self.student, exam_name=f'Exam {i}', score=i, record_type='COLLEGE',
+                                      verified_by=self.institution)
+        page = self._feed(cursor, limit=3).json()
+        self.assertEqual((len(page['changes']), page['has_more']), (3, True))
+        page = self._feed(page['next'], limit=3).json()
+        self.assertEqual((len(page['changes']), page['has_more']), (2, False))
+        self.assertEqual(self._feed(page['next']).json(), {'changes': [], 'next': page['next'], 'has_more': False})
+
+    def test_late_commits_of_lower_ids_are_not_skipped(self):
+        # SQLite can't interleave two writers, so play the interleaving out by
+        # hand: transaction A takes an id, B takes the next one and commits,
+        # a consumer reads B, and only then does A commit with its lower id.
+        cursor = changelog.latest_cursor()
+        a_id = ChangeLogEntry.objects.order_by('-id').values_list('id', flat=True).first() + 1
+        ChangeLogEntry.objects.create(id=a_id + 1, kind='student', object_id=2, student_id=2, action='update')
+        page = self._feed(cursor).json()
+        self.assertEqual([change['id'] for change in page['changes']], [2])
+        ChangeLogEntry.objects.create(id=a_id, kind='student', object_id=1, student_id=1, action='update')
+        later = self._feed(page['next']).json()
+        self.assertEqual([change['id'] for change in later['changes']], [1])
+        self.assertGreater(later['next'], page['next'])
+        self.assertEqual([change['id'] for change in self._feed(cursor).json()['changes']], [2, 1])
+
+    def test_bulk_ingest_is_logged(self):
+        cursor = changelog.latest_cursor()
+        lines = ['username,course_name,semester,grade,record_type']
+        lines += [f'alice,Course {i},1,A,COLLEGE' for i in range(3)]
+        for content in ('\n'.join(lines), '\n'.join(lines).replace('Course 0,1,A', 'Course 0,1,B')):
+            ingestor = RecordIngestor(ACADEMIC_RECORDS, default_institution=self.institution)
+            ingestor.ingest(iter_rows(SimpleUploadedFile('results.csv', content.encode()), 'csv'))
+        ids = sorted(AcademicRecord.objects.values_list('pk', flat=True))
+        self.assertEqual(self._changes(cursor), [('academic', pk, 'create') for pk in ids] + [('academic', ids[0], 'update')])
+
+    def test_compaction_and_retention(self):
+        record = ExamResult.objects.create(student=self.student, exam_name='Finals', score=50, record_type='COLLEGE',
+                                           verified_by=self.institution)
+        for score in (60, 70):
+            record.score = score
+            record.save()
+        self.assertEqual(changelog.compact(older_than_hours=0), 2)
+        self.assertEqual(self._changes(), [('student', self.student.pk, 'create'), ('exam', record.pk, 'update')])
+
+        latest = changelog.latest_cursor()
+        self.assertEqual(changelog.prune(older_than_days=0), 2)
+        response = self._feed(0)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json()['horizon'], latest)
+        self.assertEqual(self._feed(latest).status_code, 200)
+
+    def test_retention_only_drops_a_prefix_of_the_feed(self):
+        cursor = changelog.latest_cursor()
+        ExamResult.objects.create(student=self.student, exam_name='Finals', score=50, record_type='COLLEGE',
+                                  verified_by=self.institution)
+        # a week-old change that only committed now, after the fresh one
+        ChangeLogEntry.objects.create(kind='student', object_id=self.student.pk, student_id=self.student.pk,
+                                      action='update', changed_at=timezone.now() - timedelta(days=7))
+        ChangeLogEntry.objects.filter(position__lte=cursor).update(changed_at=timezone.now() - timedelta(days=7))
+        self.assertEqual(changelog.prune(older_than_days=1), 1)
+        self.assertEqual(changelog.horizon(), cursor)
+        self.assertEqual([change['kind'] for change in self._feed(cursor).json()['changes']], ['exam', 'student'])
+
+    def test_students_cannot_read_the_feed(self):
+        self.client.force_authenticate(self.student.user)
+        self.assertEqual(self._feed().status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self._feed().status_code, 401)
+
+
+class ReportJobTests(TestCase):
+    def setUp(self):
+        media, private = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.addCleanup(private.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=media.name, REPORT_ROOT=private.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        staff = make_user('registrar', STUDYING_INSTITUTIONS)
+        self.institution = make_institution()
+        self.institution.admin_user = staff
+        self.institution.save()
+        self.students = [make_student(f'student-{i}', self.institution, records=3) for i in range(5)]
+        ExamResult.objects.create(student=self.students[0], exam_name='Finals', score=91.5, record_type='COLLEGE',
+                                  verified_by=self.institution)
+        self.client = APIClient()
+        self.client.force_authenticate(staff)
+
+    def _submit(self, **data):
+        response = self.client.post('/api/reports/', data, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    @mock.patch('core.reports.REPORT_CHUNK_SIZE', 2)
+    def test_mark_sheets_are_built_in_the_background(self):
+        job_id = self._submit(kind='mark_sheets')
+        self.assertEqual(self.client.get(f'/api/reports/{job_id}/').json()['status'], 'queued')
+        self.assertEqual(self.client.get(f'/api/reports/{job_id}/artifact/').status_code, 409)
+
+        self.assertEqual(reports.work(once=True), 1)
+        job = self.client.get(f'/api/reports/{job_id}/').json()
+        self.assertEqual((job['status'], job['progress']), ('done', {'done': 5, 'total': 5, 'percent': 100}))
+        response = self.client.get(f'/api/reports/{job_id}/artifact/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("default-src 'none'", response['Content-Security-Policy'])
+        document = b''.join(response.streaming_content).decode()
+        self.assertEqual(document.count('<section>'), 5)
+        self.assertIn('Course 2', document)
+        self.assertIn('Finals', document)
+        self.assertTrue(document.rstrip().endswith('</html>'))
+
+    def test_artifacts_are_kept_out_of_media_root(self):
+        job_id = self._submit(kind='mark_sheets')
+        reports.work(once=True)
+        job = ReportJob.objects.get(pk=job_id)
+        path = os.path.realpath(job.artifact.path)
+        self.assertTrue(path.startswith(os.path.realpath(settings.REPORT_ROOT) + os.sep))
+        self.assertFalse(path.startswith(os.path.realpath(settings.MEDIA_ROOT) + os.sep))
+        with self.assertRaises(ValueError):
+            job.artifact.url
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(f'/api/reports/{job_id}/artifact/').status_code, 401)
+
+    def test_result_book_covers_one_semester_of_the_chosen_students(self):
+        response = self.client.post('/api/reports/', {'kind': 'result_book'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        job_id = self._submit(kind='result_book', semester=2, student_ids=[self.students[1].pk, 999])
+        reports.work(once=True)
+        document = b''.join(self.client.get(f'/api/reports/{job_id}/artifact/').streaming_content).decode()
+        self.assertIn('student-1', document)
+        self.assertNotIn('student-2', document)
+        self.assertIn('Course 1', document)
+        self.assertNotIn('Course 0', document)
+
+    def test_jobs_of_lost_workers_are_requeued(self):
+        job_id = self._submit(kind='mark_sheets')
+        job = reports.claim_next('dead-worker')
+        ReportJob.objects.filter(pk=job_id).update(heartbeat_at=job.heartbeat_at - timedelta(hours=1))
+
+        reports.process_next_job('live-worker')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.worker), ('done', 2, 'live-worker'))
+        # the old worker can no longer touch it
+        with self.assertRaises(reports.JobLost):
+            reports.run_job(job, 'dead-worker')
+
+        with mock.patch('core.reports.REPORT_MAX_ATTEMPTS', 1):
+            job_id = self._submit(kind='mark_sheets')
+            reports.claim_next('dead-worker')
+            ReportJob.objects.filter(pk=job_id).update(heartbeat_at=job.heartbeat_at - timedelta(hours=1))
+            self.assertIsNone(reports.process_next_job('live-worker'))
+            self.assertEqual(ReportJob.objects.get(pk=job_id).status, 'failed')
+
+    def test_failures_are_reported(self):
+        job_id = self._submit(kind='mark_sheets')
+        with mock.patch.dict(reports.REPORTS, {'mark_sheets': ('Mark sheets', 'missing.html', reports.mark_sheet_data)}):
+            reports.process_next_job('worker')
+        job = self.client.get(f'/api/reports/{job_id}/').json()
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('missing.html', job['error'])
+
+    def test_jobs_are_private_to_the_institution(self):
+        job_id = self._submit(kind='mark_sheets')
+        other = make_user('other', STUDYING_INSTITUTIONS)
+        Institution.objects.filter(pk=make_institution('Other College').pk).update(admin_user=other)
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/reports/{job_id}/').status_code, 404)
+        self.client.force_authenticate(self.students[0].user)
+        self.assertEqual(self.client.get('/api/reports/').status_code, 403)
+
+    def test_staff_without_an_institution_are_refused(self):
+        job_id = self._submit(kind='mark_sheets')
+        self.client.force_authenticate(make_user('unlinked', STUDYING_INSTITUTIONS))
+        self.assertEqual(self.client.get('/api/reports/').status_code, 403)
+        self.assertEqual(self.client.get(f'/api/reports/{job_id}/').status_code, 403)
+        self.assertEqual(self.client.post('/api/reports/', {'kind': 'mark_sheets'}, format='json').status_code, 403)
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+
+class AnalyticsRollupTests(TestCase):
+    def setUp(self):
+        staff = make_user('registrar', STUDYING_INSTITUTIONS)
+        self.north = make_institution('North College', 'State University')
+        self.south = make_institution('South College', 'State University')
+        self.east = make_institution('East College', 'Other University')
+        self.scores = {self.north: [35, 50, 62, 71, 88], self.south: [20, 45, 99], self.east: [100, 64]}
+        for institution, scores in self.scores.items():
+            for n, score in enumerate(scores):
+                student = make_student(f'{institution.name}-{n}', institution, records=0)
+                ExamResult.objects.create(student=student, exam_name='Finals', score=score, record_type='COLLEGE',
+                                          verified_by=institution)
+                AcademicRecord.objects.create(student=student, course_name='Physics', semester=1, grade='ABF'[n % 3],
+                                              record_type='COLLEGE', verified_by=institution)
+        self.client = APIClient()
+        self.client.force_authenticate(staff)
+
+    def _exams(self, **params):
+        response = self.client.get('/api/analytics/exams/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['results']
+
+    def test_writes_only_mark_buckets_dirty(self):
+        self.assertFalse(ExamScoreRollup.objects.exists())
+        self.assertEqual(DirtyRollupBucket.objects.count(), 20)
+        self.assertEqual(analytics.refresh_dirty(batch_size=7), 20)
+        self.assertFalse(DirtyRollupBucket.objects.exists())
+        # institution, university and all-scope rows
+        self.assertEqual(ExamScoreRollup.objects.count(), 3 + 2 + 1)
+        self.assertEqual(GradeRollup.objects.count(), 3)
+
+    def test_exam_statistics_match_numpy_and_pure_python(self):
+        import numpy as np
+        scores = [score for values in self.scores.values() for score in values]
+        expected = {'count': 10, 'pass_count': 8, 'minimum': 20, 'maximum': 100, 'mean': np.mean(scores),
+                    **{name: np.quantile(scores, q) for name, q in analytics.QUANTILES.items()}}
+        for module in (np, False):
+            with self.subTest(numpy=bool(module)), mock.patch('core.analytics._numpy', module):
+                analytics.rebuild_all()
+                [row] = self._exams()
+                self.assertEqual(row['histogram'][9]['count'], 2)
+                self.assertEqual(sum(band['count'] for band in row['histogram']), 10)
+                for name, value in expected.items():
+                    self.assertAlmostEqual(row[{'minimum': 'min', 'maximum': 'max'}.get(name, name)], value,
+                                           msg=name)
+
+    def test_exam_scopes_and_filters(self):
+        analytics.refresh_dirty()
+        rows = self._exams(university=self.north.university_id)
+        self.assertEqual([(row['university'], row['count']) for row in rows], [(self.north.university_id, 8)])
+        rows = self._exams(university=self.north.university_id, scope='institution')
+        self.assertEqual({row['institution']: row['count'] for row in rows}, {self.north.pk: 5, self.south.pk: 3})
+        [row] = self._exams(institution=self.east.pk, exam='Finals')
+        self.assertEqual((row['count'], row['median'], row['pass_rate']), (2, 82, 1.0))
+        self.assertEqual(self._exams(exam='Midterms'), [])
+        self.assertEqual(self.client.get('/api/analytics/exams/', {'institution': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/analytics/exams/', {'scope': 'planet'}).status_code, 400)
+        for university in ('', str(self.north.university_id)):
+            response = self.client.get('/api/analytics/exams/', {'scope': 'all', 'university': university})
+            self.assertEqual(response.status_code, 400, university)
+
+    def test_edits_and_deletes_refresh_the_buckets_they_leave(self):
+        analytics.refresh_dirty()
+        result = ExamResult.objects.get(verified_by=self.east, score=64)
+        result.verified_by = self.north
+        result.save()
+        analytics.refresh_dirty()
+        counts = {row['institution']: row['count'] for row in self._exams(scope='institution')}
+        self.assertEqual((counts[self.north.pk], counts[self.east.pk]), (6, 1))
+        ExamResult.objects.filter(verified_by=self.east).delete()
+        analytics.refresh_dirty()
+        counts = {row['institution']: row['count'] for row in self._exams(scope='institution')}
+        self.assertNotIn(self.east.pk, counts)
+
+        record = AcademicRecord.objects.filter(verified_by=self.south).first()
+        record.semester = 2
+        record.save()
+        analytics.refresh_dirty()
+        response = self.client.get('/api/analytics/grades/', {'institution': self.south.pk})
+        self.assertEqual([(row['semester'], row['record_count']) for row in response.json()['results']],
+                         [(1, 2), (2, 1)])
+
+    def test_grade_distributions_roll_up(self):
+        analytics.refresh_dirty()
+        response = self.client.get('/api/analytics/grades/', {'university': self.north.university_id,
+                                                              'group': 'university'})
+        [row] = response.json()['results']
+        # North: A, B, F, A, B; South: A, B, F
+        self.assertEqual(row['distribution'], {'A': 3, 'B': 3, 'F': 2})
+        self.assertEqual((row['graded_count'], row['pass_count'], row['mean_points']), (8, 6, 5.25))
+        response = self.client.get('/api/analytics/grades/', {'group': 'institution', 'course': 'Physics'})
+        self.assertEqual([row['record_count'] for row in response.json()['results']], [5, 3, 2])
+        self.assertEqual(self.client.get('/api/analytics/grades/', {'group': 'planet'}).status_code, 400)
+
+    def test_bulk_ingest_marks_buckets(self):
+        analytics.refresh_dirty()
+        student = Student.objects.filter(current_institution=self.east).first()
+        upload = SimpleUploadedFile('records.csv', (
+            'username,course_name,semester,grade,record_type\n'
+            f'{student.user.username},Chemistry,3,O,COLLEGE\n'
+        ).encode())
+        RecordIngestor(ACADEMIC_RECORDS, default_institution=self.east).ingest(iter_rows(upload, 'csv'))
+        analytics.refresh_dirty()
+        response = self.client.get('/api/analytics/grades/', {'course': 'Chemistry'})
+        [row] = response.json()['results']
+        self.assertEqual((row['semester'], row['distribution'], row['mean_points']), (3, {'O': 1}, 10.0))
+
+    def test_reads_serve_the_rollups_as_they_stand(self):
+        analytics.refresh_dirty()
+        [before] = self._exams()
+        ExamResult.objects.filter(score=20).delete()
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/analytics/exams/').json()
+        self.assertTrue(response['refresh_pending'])
+        self.assertEqual(response['results'][0]['count'], 10)
+        call_command('rebuild_analytics', '--dirty', stdout=io.StringIO())
+        response = self.client.get('/api/analytics/exams/').json()
+        self.assertFalse(response['refresh_pending'])
+        [after] = response['results']
+        self.assertEqual(after['count'], 9)
+        self.assertGreaterEqual(after['refreshed_at'], before['refreshed_at'])
+
+    def test_refresh_survives_a_concurrent_refresh_of_the_same_exam(self):
+        bulk_create = ExamScoreRollup.objects.bulk_create
+
+        def racing_bulk_create(objs, *args, **kwargs):
+            # another refresher commits the same rows just before this one writes
+            if kwargs.get('update_conflicts') and not ExamScoreRollup.objects.exists():
+                bulk_create([ExamScoreRollup(**{field.attname: getattr(obj, field.attname)
+                                                for field in obj._meta.concrete_fields if not field.primary_key})
+                             for obj in objs])
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(ExamScoreRollup.objects, 'bulk_create', racing_bulk_create):
+            analytics.refresh_exams(['Finals'])
+        self.assertEqual(ExamScoreRollup.objects.count(), 3 + 2 + 1)
+
+    def test_rebuild_command_and_permissions(self):
+        GradeRollup.objects.all().delete()
+        call_command('rebuild_analytics', stdout=io.StringIO())
+        self.assertEqual(GradeRollup.objects.count(), 3)
+        self.assertFalse(DirtyRollupBucket.objects.exists())
+        self.client.force_authenticate(Student.objects.first().user)
+        self.assertEqual(self.client.get('/api/analytics/exams/').status_code, 403)
+
+
+class ExamRankTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.institution = make_institution()
+        self.students = [make_student(f'candidate-{n}', self.institution, records=0) for n in range(5)]
+        self.results = [
+            ExamResult.objects.create(student=student, exam_name='Finals', score=score, record_type='COLLEGE',
+                                      verified_by=self.institution)
+            for student, score in zip(self.students, [90, 75, 75, 60, 40])
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('registrar', STUDYING_INSTITUTIONS))
+
+    def _ranks(self):
+        return [(entry['rank'], entry['percentile'])
+                for entry in ranking.rank_results((r.pk, r.exam_name, r.score) for r in self.results)]
+
+    def test_ties_share_rank_and_percentile(self):
+        self.assertEqual(self._ranks(), [(1, 100.0), (2, 80.0), (2, 80.0), (4, 40.0), (5, 20.0)])
+        # cached after the first lookup: no queries, one cache round trip
+        with self.assertNumQueries(0):
+            self._ranks()
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        self._ranks()
+        self.results[4].score = 95
+        self.results[4].save()
+        ExamResult.objects.create(student=self.students[0], exam_name='Finals', score=75, record_type='COLLEGE',
+                                  verified_by=self.institution)
+        self.assertEqual(self._ranks(), [(2, 83.33), (3, 66.67), (3, 66.67), (6, 16.67), (1, 100.0)])
+        self.results[0].delete()
+        self.results.pop(0)
+        self.assertEqual(self._ranks()[0], (2, 80.0))
+        self.results[0].exam_name = 'Retest'
+        self.results[0].save()
+        self.assertEqual(ranking.rank_results([(0, 'Retest', 75)])[0]['out_of'], 1)
+        self.assertEqual(dict(ExamScoreCount.objects.filter(exam_name='Finals').values_list('score', 'count')),
+                         {75: 2, 60: 1, 95: 1})
+
+    def test_bulk_writes_apply_deltas_and_rebuild(self):
+        def counts():
+            return {(row.exam_name, row.score): row.count for row in ExamScoreCount.objects.all()}
+
+        upload = SimpleUploadedFile('scores.csv', b'username,exam_name,score,record_type\n'
+                                                  b'candidate-4,Finals,99,COLLEGE\ncandidate-4,Mocks,10,COLLEGE\n')
+        for _ in range(2):
+            # the second, unchanged upload writes nothing
+            upload.seek(0)
+            RecordIngestor(EXAM_RESULTS, default_institution=self.institution).ingest(iter_rows(upload, 'csv'))
+            self.assertEqual(counts(), {('Finals', 90): 1, ('Finals', 75): 2, ('Finals', 60): 1, ('Finals', 99): 1,
+                                        ('Mocks', 10): 1})
+        self.results[4].refresh_from_db()
+        self.assertEqual(self._ranks()[4], (1, 100.0))
+        ExamScoreCount.objects.all().delete()
+        call_command('rebuild_rank_index', stdout=io.StringIO())
+        cache.clear()
+        self.assertEqual(self._ranks()[4], (1, 100.0))
+        self.assertEqual(ExamScoreCount.objects.filter(exam_name='Mocks').count(), 1)
+
+    def test_rank_endpoints(self):
+        response = self.client.get(f'/api/exam-results/{self.results[2].pk}/rank/')
+        self.assertEqual((response.json()['rank'], response.json()['out_of']), (2, 5))
+        ids = ','.join(str(student.pk) for student in self.students[3:])
+        with self.assertQueryBudget(4):
+            response = self.client.get('/api/exam-results/ranks/', {'students': ids, 'exam': 'Finals'})
+        self.assertEqual([(row['student'], row['rank']) for row in response.json()['results']],
+                         [(self.students[3].pk, 4), (self.students[4].pk, 5)])
+        self.assertEqual(self.client.get('/api/exam-results/ranks/', {'students': 'x'}).status_code, 400)
+
+    def test_student_serializer_ranks_are_opt_in(self):
+        student = self.students[1]
+        self.assertNotIn('exam_ranks', StudentSerializer(student).data)
+        self.assertNotIn('exam_ranks', self.client.get(f'/api/students/{student.pk}/').json())
+        data = self.client.get(f'/api/students/{student.pk}/', {'expand': 'exam_ranks'}).json()
+        self.assertEqual([(entry['exam_name'], entry['rank'], entry['percentile']) for entry in data['exam_ranks']],
+                         [('Finals', 2, 80.0)])
+        self.assertNotIn('exam_results', data)
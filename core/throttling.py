@@ -0,0 +1,126 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+
+# ==============================================================================
+# Token-bucket throttling in the shared cache.
+#
+# Each bucket is one cache key holding its "theoretical arrival time" (TAT,
+# GCRA-style) in milliseconds. Every attempt atomically adds one token's
+# interval with incr(). The attempt is admitted while the TAT stays within
+# one full bucket of now, and rejected (the increment undone) once it runs
+# ahead. An idle bucket's TAT falls into the past, which simply means it is
+# full again.
+#
+# A busy bucket only ever sees incr/decr, so with a shared backend (Redis,
+# memcached) the limit holds across every worker process. A rejection costs one or two cache
+# round trips and happens before any password is hashed.
+#
+# Buckets are configured in THROTTLE_BUCKETS as name -> (capacity, seconds to
+# refill from empty); a bucket missing from it admits everything.
+# ==============================================================================
+
+# Stale bucket keys read as full, so the timeout only bounds memory use.
+BUCKET_KEY_TIMEOUT = 3600
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class TokenBucket:
+    def __init__(self, name, capacity, refill_seconds):
+        self.name = name
+        self.capacity = capacity
+        self.interval = max(1, int(refill_seconds * 1000 / capacity))  # ms per token
+        self.window = self.interval * capacity
+
+    def _key(self, identity):
+        digest = hashlib.md5(str(identity).encode()).hexdigest()
+        return f'markr:throttle:{self.name}:{digest}'
+
+    def consume(self, identity):
+        """(admitted, seconds until the next token) for one attempt by `identity`."""
+        key, now = self._key(identity), _now_ms()
+        try:
+            tat = cache.incr(key, self.interval)
+        except ValueError:
+            tat = None
+        if tat is None or tat - self.interval < now:
+            # New or idle bucket: restart from now. Racing requests may both do
+            # this and each take a token from a full bucket, which is harmless.
+            tat = now + self.interval
+            cache.set(key, tat, BUCKET_KEY_TIMEOUT)
+        if tat - now > self.window:
+            cache.decr(key, self.interval)
+            metrics.increment(f'throttle.{self.name}.rejected')
+            return False, math.ceil((tat - now - self.window) / 1000)
+        metrics.increment(f'throttle.{self.name}.admitted')
+        return True, 0
+
+
+def get_bucket(name):
+    """The configured bucket called `name`, or None if it isn't throttled."""
+    config = getattr(settings, 'THROTTLE_BUCKETS', {}).get(name)
+    return TokenBucket(name, *config) if config else None
+
+
+def client_ip(request):
+    # DRF's logic, including its NUM_PROXIES setting for X-Forwarded-For.
+    return BaseThrottle().get_ident(request)
+
+
+def check_login_attempt(request, username):
+    """
+    Takes a token from the client IP's and the username's login buckets.
+    Returns (admitted, retry_after_seconds); call before authenticate().
+    A username that isn't a string (unvalidated input) only takes the IP's.
+    """
+    buckets = [('auth-ip', client_ip(request))]
+    if isinstance(username, str):
+        buckets.append(('auth-username', username.strip().lower()))
+    for name, identity in buckets:
+        bucket = get_bucket(name)
+        if bucket is not None:
+            admitted, retry_after = bucket.consume(identity)
+            if not admitted:
+                return False, retry_after
+    return True, 0
+
+
+class LoginThrottle(BaseThrottle):
+    """For token endpoints: the login buckets, keyed on the client IP and the posted username."""
+
+    def allow_request(self, request, view):
+        # Runs before the serializer; malformed bodies are left for its 400.
+        username = request.data.get('username') if isinstance(request.data, dict) else None
+        admitted, self.retry_after = check_login_attempt(request, username)
+        return admitted
+
+    def wait(self):
+        return self.retry_after
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    API throttle for the bucket named by the view's `throttle_scope` (default
+    'api'), one bucket per authenticated user or, for anonymous requests, per IP.
+    """
+
+    def allow_request(self, request, view):
+        bucket = get_bucket(getattr(view, 'throttle_scope', 'api'))
+        if bucket is None:
+            return True
+        user = request.user
+        identity = f'user:{user.pk}' if user and user.is_authenticated else f'ip:{self.get_ident(request)}'
+        admitted, self.retry_after = bucket.consume(identity)
+        return admitted
+
+    def wait(self):
+        return self.retry_after
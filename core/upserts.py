@@ -0,0 +1,23 @@
+from django.db import connections, router
+
+# ==============================================================================
+# INSERT ... ON CONFLICT UPDATE for the derived tables (semester summaries,
+# analytics rollups, the exam rank index).
+#
+# Replacing a derived row by delete-then-insert races: two transactions that
+# refresh the same bucket both see the old row, the second's delete matches
+# nothing once the first commits, and its insert fails the unique constraint.
+# An upsert lets the database settle it; the last writer's numbers win.
+# ==============================================================================
+
+
+def upsert(model, objs, unique_fields, update_fields, batch_size=1000):
+    """bulk_create() that updates `update_fields` of rows already present under `unique_fields`."""
+    if not objs:
+        return
+    features = connections[router.db_for_write(model)].features
+    # MySQL resolves conflicts on any unique key and rejects an explicit target.
+    model.objects.bulk_create(
+        objs, batch_size=batch_size, update_conflicts=True, update_fields=update_fields,
+        unique_fields=unique_fields if features.supports_update_conflicts_with_target else None,
+    )
@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
+
 # --- Import ALL the NEW and correctly named ViewSets from views.py ---
 # Note that 'RegisterView' has been removed and 'UniversityViewSet' has been added.
 from .views import (
@@ -9,7 +11,15 @@ from .views import (
     StudentViewSet,
     AcademicRecordViewSet,
     CoCurricularRecordViewSet,
-    ExamResultViewSet
+    ExamResultViewSet,
+    ReportJobViewSet,
+    metrics_view,
+    verify_view,
+    verify_batch_view,
+    seal_roots_view,
+    changes_view,
+    exam_analytics_view,
+    grade_analytics_view,
 )
 
 # Create a new router instance
@@ -23,9 +33,29 @@ router.register(r'students', StudentViewSet, basename='student')
 router.register(r'academic-records', AcademicRecordViewSet, basename='academicrecord')
 router.register(r'cocurricular-records', CoCurricularRecordViewSet, basename='cocurricularrecord')
 router.register(r'exam-results', ExamResultViewSet, basename='examresult')
+router.register(r'reports', ReportJobViewSet, basename='reportjob')
 
 # The urlpatterns list now only needs to include the router's URLs.
 # The public registration URL path has been removed, as it no longer exists.
+# Native async read endpoints (see core/async_views.py). Serve markR.asgi to benefit.
+async_urlpatterns = [
+    path('students/<int:pk>/', async_views.student_detail, name='async-student-detail'),
+    path('academic-records/', async_views.academic_record_list, name='async-academicrecord-list'),
+    path('cocurricular-records/', async_views.cocurricular_record_list, name='async-cocurricularrecord-list'),
+    path('exam-results/', async_views.exam_result_list, name='async-examresult-list'),
+]
+
 urlpatterns = [
     path('', include(router.urls)),
+    path('metrics/', metrics_view, name='metrics'),
+    # Incremental sync: ?since=<cursor> (core/changelog.py).
+    path('changes/', changes_view, name='changes'),
+    # Exam and grade rollups (core/analytics.py).
+    path('analytics/exams/', exam_analytics_view, name='analytics-exams'),
+    path('analytics/grades/', grade_analytics_view, name='analytics-grades'),
+    # Public, unauthenticated record verification by Student.public_id.
+    path('verify/', verify_batch_view, name='verify-batch'),
+    path('verify/<uuid:public_id>/', verify_view, name='verify'),
+    path('seals/roots/', seal_roots_view, name='seal-roots'),
+    path('async/', include(async_urlpatterns)),
 ]
\ No newline at end of file
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+from .fragments import records_versions
+from .models import Student, AcademicRecord, CoCurricularRecord, ExamResult
+from .reference import institution_labels, reference_version
+
+# ==============================================================================
+# Public verification snapshots (GET/POST /api/verify/).
+#
+# A snapshot is what a third party sees for a student's public_id: the student's
+# name and institution, every verified record with its verifier's name, and a
+# SHA-256 content hash. It is rendered once to its final JSON bytes. The bytes
+# are cached as (stamp, bytes, hash), where the stamp is the student's records
+# version (core.fragments) plus the reference data version. A lookup serves the
+# cached bytes until a write changes either one.
+#
+# The response body is the cached bytes as is, so identical content always gives
+# identical bytes. The content hash therefore works as a strong ETag. Batch
+# lookups join the cached bodies without re-serializing; a warm batch of any
+# size costs a few get_many calls and no queries.
+# ==============================================================================
+
+VERIFICATION_CACHE_TIMEOUT = getattr(settings, 'VERIFICATION_CACHE_TIMEOUT', 24 * 3600)
+# Seconds an id that matched no student is remembered as unknown.
+UNKNOWN_ID_TIMEOUT = getattr(settings, 'VERIFICATION_UNKNOWN_ID_TIMEOUT', 60)
+UNKNOWN = 0  # never a primary key
+# IN-clause size when building snapshots for many students at once.
+BUILD_CHUNK_SIZE = 500
+
+
+def _id_key(public_id):
+    return f'markr:public-id:{public_id}'
+
+
+def _snapshot_key(student_id):
+    return f'markr:verification:{student_id}'
+
+
+def parse_public_ids(values):
+    """(UUIDs in request order without duplicates, the values that aren't UUIDs)."""
+    parsed, invalid = {}, []
+    for value in values:
+        try:
+            parsed.setdefault(uuid.UUID(str(value)), None)
+        except ValueError:
+            invalid.append(value)
+    return list(parsed), invalid
+
+
+def resolve_public_ids(public_ids):
+    """
+    {public_id: student id} for the ids that exist. The mapping never changes,
+    so it is cached; unknown ids are remembered briefly too, so bursts of bad
+    ids don't reach the database.
+    """
+    keys = {_id_key(public_id): public_id for public_id in public_ids}
+    cached = {keys[key]: pk for key, pk in cache.get_many(keys).items()}
+    missing = [public_id for public_id in public_ids if public_id not in cached]
+    if missing:
+        found = dict(Student.objects.filter(public_id__in=missing).values_list('public_id', 'pk'))
+        cache.set_many({_id_key(public_id): pk for public_id, pk in found.items()}, VERIFICATION_CACHE_TIMEOUT)
+        cache.set_many({_id_key(public_id): UNKNOWN for public_id in missing if public_id not in found},
+                       UNKNOWN_ID_TIMEOUT)
+        cached.update(found)
+    return {public_id: pk for public_id, pk in cached.items() if pk != UNKNOWN}
+
+
+def content_hash(snapshot):
+    canonical = json.dumps(snapshot, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return 'sha256:' + hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _render(snapshot):
+    snapshot['content_hash'] = content_hash(snapshot)
+    body = json.dumps(snapshot, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()
+    return body, snapshot['content_hash']
+
+
+def _chunks(values, size=BUILD_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def build_snapshots(student_ids):
+    """{student id: snapshot dict without its hash}, four queries per chunk of students."""
+    labels = institution_labels()
+    snapshots = {}
+    for chunk in _chunks(student_ids):
+        students = Student.objects.filter(pk__in=chunk).values_list(
+            'pk', 'public_id', 'user__username', 'user__first_name', 'user__last_name', 'current_institution_id')
+        for pk, public_id, username, first, last, institution_id in students:
+            snapshots[pk] = {
+                'public_id': str(public_id),
+                'name': f'{first} {last}'.strip() or username,
+                'institution': labels.get(institution_id),
+                'academic_records': [],
+                'cocurricular_records': [],
+                'exam_results': [],
+            }
+        academic = (AcademicRecord.objects.filter(student_id__in=chunk)
+                    .order_by('student_id', 'semester', 'course_name', 'pk')
+                    .values_list('student_id', 'course_name', 'semester', 'grade', 'record_type', 'verified_by_id'))
+        for student_id, course, semester, grade, record_type, verifier in academic:
+            snapshots[student_id]['academic_records'].append({
+                'course_name': course, 'semester': semester, 'grade': grade,
+                'record_type': record_type, 'verified_by': labels.get(verifier),
+            })
+        cocurricular = (CoCurricularRecord.objects.filter(student_id__in=chunk)
+                        .order_by('student_id', 'date', 'activity_name', 'pk')
+                        .values_list('student_id', 'activity_name', 'description', 'date', 'record_type',
+                                     'verified_by_id'))
+        for student_id, activity, description, day, record_type, verifier in cocurricular:
+            snapshots[student_id]['cocurricular_records'].append({
+                'activity_name': activity, 'description': description, 'date': day.isoformat(),
+                'record_type': record_type, 'verified_by': labels.get(verifier),
+            })
+        exams = (ExamResult.objects.filter(student_id__in=chunk)
+                 .order_by('student_id', 'exam_name', 'pk')
+                 .values_list('student_id', 'exam_name', 'score', 'record_type', 'verified_by_id'))
+        for student_id, exam, score, record_type, verifier in exams:
+            snapshots[student_id]['exam_results'].append({
+                'exam_name': exam, 'score': score, 'record_type': record_type, 'verified_by': labels.get(verifier),
+            })
+    return snapshots
+
+
+def verification_snapshots(student_ids):
+    """{student id: (json bytes, content hash)}, rebuilding only stale or missing snapshots."""
+    student_ids = list(student_ids)
+    if not student_ids:
+        return {}
+    # Stamps are read before building, so a write during the build leaves the
+    # entry stale by stamp rather than by content.
+    versions = records_versions(student_ids)
+    reference = reference_version()
+    entries = cache.get_many([_snapshot_key(pk) for pk in student_ids])
+
+    results, stale = {}, []
+    for pk in student_ids:
+        entry = entries.get(_snapshot_key(pk))
+        if entry is not None and entry[0] == (versions[pk], reference):
+            results[pk] = entry[1:]
+        else:
+            stale.append(pk)
+    metrics.increment('verification_cache.hits', len(results))
+    if stale:
+        metrics.increment('verification_cache.misses', len(stale))
+        fresh = {}
+        for pk, snapshot in build_snapshots(stale).items():
+            results[pk] = _render(snapshot)
+            fresh[_snapshot_key(pk)] = ((versions[pk], reference), *results[pk])
+        cache.set_many(fresh, VERIFICATION_CACHE_TIMEOUT)
+    return results
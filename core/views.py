@@ -1,29 +1,92 @@
-from rest_framework import viewsets, permissions, status # <-- Added 'status'
+import json
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework import mixins, viewsets, permissions, status # <-- Added 'status'
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
 # --- Import ALL the NEW Models and Serializers ---
-from .models import University, Institution, Student, AcademicRecord, CoCurricularRecord, ExamResult
+from .models import (
+    University, Institution, Student, AcademicRecord, CoCurricularRecord, ExamResult, SemesterSummary, SealBatch, ReportJob,
+    ExamScoreRollup, GradeRollup,
+)
 from .serializers import (
     UniversitySerializer, InstitutionSerializer, StudentSerializer,
     StudentProfileSerializer, AcademicRecordSerializer, CoCurricularRecordSerializer,
-    ExamResultSerializer, CreateStudentSerializer
+    ExamResultSerializer, CreateStudentSerializer, SemesterSummarySerializer, ReportJobSerializer
 )
 from .permissions import IsStudyingInstitution
+from .roles import STUDENTS, has_role
+from .pagination import StudentPagination, RecordPagination, CoCurricularRecordPagination, ReportJobPagination
+from .ingest import ACADEMIC_RECORDS, EXAM_RESULTS, RecordIngestor, detect_format, iter_rows
+from .export import ENCODERS, stream_export
+from .grading import get_grade_scale
+from .onboarding import RosterOnboarder
+from .fastpath import FastJSONRenderer, compile_reader
+from .reference import cached, request_key
+from .routers import replica_reads
+from .analytics import GRADE_GROUPS, grade_summary, refresh_pending, score_bands
+from .ranking import rank_results
+from .changelog import FEED_LIMIT, FEED_MAX_LIMIT, CursorExpired, changes_since, latest_cursor
+from .sealing import batch_data, proof_bundle, public_key
+from .verification import parse_public_ids, resolve_public_ids, verification_snapshots
+from . import metrics
+
+# --- Reference data caching ---
+class ReferenceCacheMixin:
+    """
+    Serves list and retrieve from the versioned reference cache (core.reference).
+    Writes go through the ORM, whose signals bump the version.
+    """
+    def list(self, request, *args, **kwargs):
+        data = cached(f'{self.basename}:list:{request_key(request)}',
+                      lambda: super(ReferenceCacheMixin, self).list(request, *args, **kwargs).data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        data = cached(f'{self.basename}:{kwargs[self.lookup_field]}',
+                      lambda: super(ReferenceCacheMixin, self).retrieve(request, *args, **kwargs).data)
+        return Response(data)
 
 # --- New and Updated ViewSets ---
 
-class UniversityViewSet(viewsets.ModelViewSet):
+class UniversityViewSet(ReferenceCacheMixin, viewsets.ModelViewSet):
     """API endpoint for Universities (managed by admin)."""
     queryset = University.objects.all()
     serializer_class = UniversitySerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class InstitutionViewSet(viewsets.ModelViewSet):
+class InstitutionViewSet(ReferenceCacheMixin, viewsets.ModelViewSet):
     """API endpoint for Institutions (Colleges)."""
     queryset = Institution.objects.all()
     serializer_class = InstitutionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=True, methods=['get'], permission_classes=[IsStudyingInstitution])
+    def export(self, request, pk=None):
+        """
+        Streams every record of the institution's students as CSV or JSONL.
+        ?file_format=csv|jsonl (default csv), ?compress=gzip for on-the-fly gzip.
+        """
+        institution = self.get_object()
+        fmt = request.query_params.get('file_format', 'csv').lower()
+        if fmt not in ENCODERS:
+            return Response({'file_format': [f"Unsupported file format '{fmt}'. Use 'csv' or 'jsonl'."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        compress = request.query_params.get('compress') == 'gzip'
+
+        filename = f'institution-{institution.pk}-records.{fmt}' + ('.gz' if compress else '')
+        content_type = 'application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+        response = StreamingHttpResponse(stream_export(institution, fmt, compress), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
 # --- THIS IS THE FIXED CLASS ---
 class StudentViewSet(viewsets.ModelViewSet):
     """
@@ -34,6 +97,8 @@ class StudentViewSet(viewsets.ModelViewSet):
     queryset = Student.objects.all()
     # Set the default serializer for reading data
     serializer_class = StudentSerializer
+    pagination_class = StudentPagination
+    replica_reads = True  # GETs may be served from a replica (core.routers)
 
     def get_serializer_class(self):
         # When creating a new student, use the special CreateStudentSerializer
@@ -41,7 +106,7 @@ class StudentViewSet(viewsets.ModelViewSet):
             return CreateStudentSerializer
         # When a student is updating their own profile, use the limited StudentProfileSerializer
         # We check if the user is authenticated first to avoid errors.
-        if self.request.user.is_authenticated and self.request.user.groups.filter(name='Students').exists() and self.action in ['update', 'partial_update']:
+        if self.request.user.is_authenticated and has_role(self.request, STUDENTS) and self.action in ['update', 'partial_update']:
             return StudentProfileSerializer
         # For all other actions (listing, retrieving), use the default StudentSerializer
         return self.serializer_class
@@ -65,6 +130,21 @@ class StudentViewSet(viewsets.ModelViewSet):
         return Response(read_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
     # -------------------------------------------------
 
+    def get_student_shape(self):
+        """
+        (fields, expand) for list/retrieve from ?fields= and ?expand=. Lists
+        default to the lightweight shape, a single student to the full one.
+        """
+        if not hasattr(self, '_student_shape'):
+            default = () if self.action == 'list' else tuple(StudentSerializer.EXPANDABLE)
+            self._student_shape = StudentSerializer.resolve_shape(self.request.query_params, default)
+        return self._student_shape
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            kwargs['fields'], kwargs['expand'] = self.get_student_shape()
+        return super().get_serializer(*args, **kwargs)
+
     def get_permissions(self):
         if self.action == 'create':
             # Only institutions can create new students.
@@ -78,35 +158,415 @@ class StudentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         # Students can only see and edit their own profile.
         user = self.request.user
-        if user.is_authenticated and user.groups.filter(name='Students').exists():
-            return Student.objects.filter(user=user)
-        # Institutions and Admins can see all students.
-        return Student.objects.all()
+        if user.is_authenticated and has_role(self.request, STUDENTS):
+            queryset = Student.objects.filter(user=user)
+        else:
+            # Institutions and Admins can see all students.
+            queryset = Student.objects.all()
+        if self.action in ('summary', 'proof_bundle'):
+            # These read their own tables; don't load the records.
+            return queryset
+        if self.action in ('list', 'retrieve'):
+            # Prefetch only the collections the response will contain.
+            _, expand = self.get_student_shape()
+            return queryset.with_profile().prefetch_related(*(StudentSerializer.EXPANDABLE[name] for name in expand))
+        # Join/prefetch everything StudentSerializer renders so the query count
+        # stays fixed no matter how many students or records are returned.
+        return queryset.with_records()
+
+    @action(detail=False, methods=['post'], url_path='bulk-onboard', parser_classes=[MultiPartParser],
+            permission_classes=[IsStudyingInstitution])
+    def bulk_onboard(self, request):
+        """
+        Creates students from a roster file (multipart field 'file', CSV or JSONL
+        with username, email, password[, first_name, last_name]).
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ['No file was submitted.']}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            fmt = detect_format(upload, request.data.get('file_format'))
+        except ValueError as exc:
+            return Response({'file_format': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        institution = Institution.for_user(request.user) or Institution.objects.first()
+        onboarder = RosterOnboarder(institution)
+        report = onboarder.onboard(iter_rows(upload, fmt))
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        """Per-semester GPA and record counts, read from the precomputed SemesterSummary table."""
+        student = self.get_object()
+        semesters = list(SemesterSummary.objects.filter(student=student).order_by('semester'))
+        graded = sum(row.graded_count for row in semesters)
+        points = sum(row.points_total for row in semesters)
+        return Response({
+            'student': student.pk,
+            'grade_scale': get_grade_scale().name,
+            'cgpa': round(points / graded, 2) if graded else None,
+            'record_count': sum(row.record_count for row in semesters),
+            'semesters': SemesterSummarySerializer(semesters, many=True).data,
+        })
+
+    @action(detail=True, methods=['get'], url_path='proof-bundle')
+    def proof_bundle(self, request, pk=None):
+        """The student's sealed records with inclusion proofs, verifiable offline (core.merkle.verify_bundle)."""
+        return Response(proof_bundle(self.get_object()))
+
+# --- Bulk upload support for the record ViewSets ---
+class BulkIngestMixin:
+    """
+    Adds POST <records>/bulk/ which accepts a CSV or JSONL file (multipart field
+    'file') and upserts every row. The response is a per-row error report.
+    """
+    ingest_spec = None
+
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[MultiPartParser])
+    def bulk(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ['No file was submitted.']}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            fmt = detect_format(upload, request.data.get('file_format'))
+        except ValueError as exc:
+            return Response({'file_format': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Same verifier placeholder as perform_create, but looked up once per upload.
+        ingestor = RecordIngestor(self.ingest_spec, default_institution=Institution.objects.first())
+        report = ingestor.ingest(iter_rows(upload, fmt))
+        return Response(report, status=status.HTTP_200_OK)
+
+# --- Fast read path for the record ViewSets ---
+class FastReadMixin:
+    """
+    Serves list and retrieve straight from values_list() rows through
+    core.fastpath, skipping serializer instances per row. The JSON is
+    byte-identical to the serializer's; serializers the fast path can't
+    reproduce (and views with object-level permissions, which need model
+    instances) must not use this mixin.
+    """
+    def _fast_reader(self, request):
+        reader = compile_reader(self.get_serializer_class())
+        if reader is not None and type(request.accepted_renderer) is JSONRenderer:
+            # Response.render() uses request.accepted_renderer
+            request.accepted_renderer = FastJSONRenderer()
+        return reader
+
+    def list(self, request, *args, **kwargs):
+        reader = self._fast_reader(request)
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+        rows = reader.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(reader.convert(page))
+        return Response(reader.convert(rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        reader = self._fast_reader(request)
+        if reader is None:
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        rows = reader.values(self.filter_queryset(self.get_queryset()))
+        row = get_object_or_404(rows, **{self.lookup_field: kwargs[lookup_url_kwarg]})
+        return Response(reader.convert([row])[0])
 
 # --- The rest of the ViewSets remain the same ---
-class AcademicRecordViewSet(viewsets.ModelViewSet):
+class AcademicRecordViewSet(FastReadMixin, BulkIngestMixin, viewsets.ModelViewSet):
     queryset = AcademicRecord.objects.all()
     serializer_class = AcademicRecordSerializer
+    replica_reads = True
     permission_classes = [IsStudyingInstitution]
+    pagination_class = RecordPagination
+    ingest_spec = ACADEMIC_RECORDS
 
     def perform_create(self, serializer):
         institution = Institution.objects.first()
         serializer.save(verified_by=institution)
 
-class CoCurricularRecordViewSet(viewsets.ModelViewSet):
+class CoCurricularRecordViewSet(FastReadMixin, viewsets.ModelViewSet):
     queryset = CoCurricularRecord.objects.all()
     serializer_class = CoCurricularRecordSerializer
+    replica_reads = True
     permission_classes = [IsStudyingInstitution]
+    pagination_class = CoCurricularRecordPagination
 
     def perform_create(self, serializer):
         institution = Institution.objects.first()
         serializer.save(verified_by=institution)
 
-class ExamResultViewSet(viewsets.ModelViewSet):
+# Students per /api/exam-results/ranks/ request.
+RANK_BATCH_LIMIT = getattr(settings, 'RANK_BATCH_LIMIT', 1000)
+
+
+class ExamResultViewSet(FastReadMixin, BulkIngestMixin, viewsets.ModelViewSet):
     queryset = ExamResult.objects.all()
     serializer_class = ExamResultSerializer
+    replica_reads = True
     permission_classes = [IsStudyingInstitution]
+    pagination_class = RecordPagination
+    ingest_spec = EXAM_RESULTS
 
     def perform_create(self, serializer):
         institution = Institution.objects.first()
-        serializer.save(verified_by=institution)
\ No newline at end of file
+        serializer.save(verified_by=institution)
+
+    @action(detail=True, methods=['get'])
+    def rank(self, request, pk=None):
+        """Rank, field size and percentile of this result within its exam (core.ranking)."""
+        result = self.get_object()
+        return Response(rank_results([(result.pk, result.exam_name, result.score)])[0])
+
+    @action(detail=False, methods=['get'])
+    def ranks(self, request):
+        """
+        Ranks of many students' results in one call: ?students=<id>,<id>,...
+        (up to RANK_BATCH_LIMIT), optionally only in ?exam=.
+        """
+        ids = [value.strip() for value in request.query_params.get('students', '').split(',') if value.strip()]
+        if not ids or not all(value.isdigit() for value in ids) or len(ids) > RANK_BATCH_LIMIT:
+            return Response({'detail': f'students must be 1 to {RANK_BATCH_LIMIT} comma-separated student ids.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        results = ExamResult.objects.filter(student_id__in={int(value) for value in ids})
+        if 'exam' in request.query_params:
+            results = results.filter(exam_name=request.query_params['exam'])
+        rows = list(results.order_by('student_id', 'exam_name', 'pk')
+                    .values_list('pk', 'student_id', 'exam_name', 'score'))
+        entries = rank_results((pk, exam_name, score) for pk, _, exam_name, score in rows)
+        return Response({'results': [{'student': row[1], **entry} for row, entry in zip(rows, entries)]})
+
+# --- Background report jobs (see core/reports.py) ---
+class ReportJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    Mark sheets and result books for the staff member's institution. POST
+    queues a job and returns its id; GET reports status and progress, and
+    <id>/artifact/ serves the finished document.
+    """
+    serializer_class = ReportJobSerializer
+    pagination_class = ReportJobPagination
+    permission_classes = [IsStudyingInstitution]
+
+    def get_institution(self):
+        # Reports hold every student's marks: no fallback institution for
+        # staff who don't manage one.
+        institution = Institution.for_user(self.request.user)
+        if institution is None:
+            raise PermissionDenied('Your account does not manage an institution.')
+        return institution
+
+    def get_queryset(self):
+        return ReportJob.objects.filter(institution=self.get_institution())
+
+    def perform_create(self, serializer):
+        serializer.save(institution=self.get_institution(), requested_by=self.request.user)
+        metrics.increment('reports.submitted')
+
+    @action(detail=True, methods=['get'])
+    def artifact(self, request, pk=None):
+        job = self.get_object()
+        if job.status != 'done':
+            return Response({'detail': f'The report is {job.status}.'}, status=status.HTTP_409_CONFLICT)
+        response = FileResponse(job.artifact.open('rb'), content_type='text/html; charset=utf-8')
+        # Printable HTML from our origin: no scripts, no external loads.
+        response['Content-Security-Policy'] = "default-src 'none'; style-src 'unsafe-inline'"
+        return response
+
+# --- Operational metrics ---
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def metrics_view(request):
+    """Process-local counters (cache hits/misses etc.) for tuning. Admin only."""
+    return Response(metrics.snapshot())
+
+# --- Change feed (see core/changelog.py) ---
+@api_view(['GET'])
+@permission_classes([IsStudyingInstitution])
+def changes_view(request):
+    """
+    Student and record changes after ?since=<cursor>, oldest first, at most
+    ?limit= per page. Pass `next` back as `since` until `has_more` is false.
+    ?since=latest returns just the current cursor, for consumers starting from
+    a full sync. 410 means the cursor is older than the retained log.
+    """
+    since = request.query_params.get('since', '0')
+    if since == 'latest':
+        return Response({'changes': [], 'next': latest_cursor(), 'has_more': False})
+    limit = request.query_params.get('limit', '')
+    if not since.isdigit() or (limit and not limit.isdigit()):
+        return Response({'detail': 'since and limit must be non-negative integers.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    limit = min(int(limit), FEED_MAX_LIMIT) if limit and int(limit) else FEED_LIMIT
+    try:
+        entries, cursor, more = changes_since(int(since), limit)
+    except CursorExpired as exc:
+        return Response({'detail': 'The log after this cursor has been pruned; resync and restart from '
+                                   '?since=latest.', 'horizon': exc.horizon}, status=status.HTTP_410_GONE)
+    return Response({
+        'changes': [{'cursor': entry.position, 'kind': entry.kind, 'id': entry.object_id, 'student': entry.student_id,
+                     'action': entry.action, 'changed_at': entry.changed_at} for entry in entries],
+        'next': cursor,
+        'has_more': more,
+    })
+
+# --- Analytics (see core/analytics.py) ---
+
+def _id_filters(request, names):
+    """{name: int} for the given query params that are present; ValueError if one isn't an integer."""
+    filters = {}
+    for name in names:
+        value = request.query_params.get(name)
+        if value is not None:
+            if not value.isdigit():
+                raise ValueError(name)
+            filters[name] = int(value)
+    return filters
+
+
+@api_view(['GET'])
+@permission_classes([IsStudyingInstitution])
+def exam_analytics_view(request):
+    """
+    Score statistics per exam: count, pass rate, mean, min/max, percentiles and
+    a histogram. Filters: ?exam=, ?institution=, ?university=. ?scope=
+    (institution, university or all) picks the level; it defaults to the
+    narrowest one filtered on, else 'all'. Served from the rollups as last
+    refreshed; `refresh_pending` says whether newer writes are still queued.
+    """
+    try:
+        filters = _id_filters(request, ('institution', 'university'))
+    except ValueError as exc:
+        return Response({'detail': f'{exc} must be an integer id.'}, status=status.HTTP_400_BAD_REQUEST)
+    scope = request.query_params.get('scope') or ('institution' if 'institution' in filters else
+                                                  'university' if 'university' in filters else 'all')
+    # 'all' rows belong to no university, so a university filter there would match nothing.
+    if (scope not in ('institution', 'university', 'all') or (scope != 'institution' and 'institution' in filters)
+            or (scope == 'all' and 'university' in request.query_params)):
+        return Response({'detail': 'scope must be institution, university or all; institution filters need '
+                                   'scope=institution, and university filters scope=institution or university.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    rollups = ExamScoreRollup.objects.filter(scope=scope)
+    if 'exam' in request.query_params:
+        rollups = rollups.filter(exam_name=request.query_params['exam'])
+    if 'institution' in filters:
+        rollups = rollups.filter(scope_id=filters['institution'])
+    if 'university' in filters:
+        rollups = rollups.filter(university_id=filters['university'])
+    bands = score_bands()
+    return Response({'scope': scope, 'refresh_pending': refresh_pending(), 'results': [{
+        'exam_name': row.exam_name,
+        scope: row.scope_id if scope != 'all' else None,
+        'count': row.count,
+        'pass_count': row.pass_count,
+        'pass_rate': round(row.pass_count / row.count, 4),
+        'mean': round(row.mean, 2),
+        'min': row.minimum, 'p10': row.p10, 'p25': row.p25, 'median': row.median, 'p75': row.p75,
+        'p90': row.p90, 'max': row.maximum,
+        'histogram': [{'from': low, 'to': high, 'count': count} for (low, high), count in zip(bands, row.histogram)],
+        'refreshed_at': row.refreshed_at,
+    } for row in rollups.order_by('exam_name', 'scope_id')]})
+
+
+@api_view(['GET'])
+@permission_classes([IsStudyingInstitution])
+def grade_analytics_view(request):
+    """
+    Grade distributions, pass rates and mean grade points, summed per ?group=
+    (course (default, per semester), semester, institution or university).
+    Filters: ?course=, ?semester=, ?institution=, ?university=. Served like
+    exam_analytics_view, from the rollups as last refreshed.
+    """
+    try:
+        filters = _id_filters(request, ('semester', 'institution', 'university'))
+    except ValueError as exc:
+        return Response({'detail': f'{exc} must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    group = request.query_params.get('group', 'course')
+    if group not in GRADE_GROUPS:
+        return Response({'detail': f"group must be one of {', '.join(GRADE_GROUPS)}."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    rollups = GradeRollup.objects.filter(**{
+        {'institution': 'institution_id', 'university': 'university_id'}.get(name, name): value
+        for name, value in filters.items()
+    })
+    if 'course' in request.query_params:
+        rollups = rollups.filter(course_name=request.query_params['course'])
+    return Response({'group': group, 'refresh_pending': refresh_pending(), 'results': grade_summary(rollups, group)})
+
+# --- Public verification (see core/verification.py) ---
+
+VERIFICATION_MAX_AGE = getattr(settings, 'VERIFICATION_MAX_AGE', 60)
+VERIFICATION_BATCH_LIMIT = getattr(settings, 'VERIFICATION_BATCH_LIMIT', 1000)
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def verify_view(request, public_id):
+    """
+    The verification snapshot of the student with this public_id. Public. The
+    ETag is the snapshot's content hash, so If-None-Match revalidates with a 304.
+    Reads the primary: a snapshot built from a lagging replica would be cached
+    under the student's new stamp, and anonymous callers are never pinned.
+    """
+    student_id = resolve_public_ids([public_id]).get(public_id)
+    snapshot = verification_snapshots([student_id]).get(student_id) if student_id else None
+    if snapshot is None:
+        return Response({'detail': 'No student has this ID.'}, status=status.HTTP_404_NOT_FOUND)
+    body, digest = snapshot
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = f'"{digest}"'
+    patch_cache_control(response, public=True, max_age=VERIFICATION_MAX_AGE)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def verify_batch_view(request):
+    """
+    Snapshots for many public IDs at once: POST {"ids": [...]} (at most
+    VERIFICATION_BATCH_LIMIT). Results keep the request order; unknown or
+    malformed IDs are listed under not_found.
+    """
+    ids = request.data.get('ids') if isinstance(request.data, dict) else None
+    if not isinstance(ids, list):
+        return Response({'ids': ['Expected a list of public IDs.']}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > VERIFICATION_BATCH_LIMIT:
+        return Response({'ids': [f'At most {VERIFICATION_BATCH_LIMIT} IDs per request.']},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    public_ids, invalid = parse_public_ids(ids)
+    resolved = resolve_public_ids(public_ids)
+    snapshots = verification_snapshots(resolved.values())
+    found = {public_id: snapshots[pk] for public_id, pk in resolved.items() if pk in snapshots}
+    # The snapshots are already JSON; splice them in rather than re-encoding.
+    results = b','.join(found[public_id][0] for public_id in public_ids if public_id in found)
+    not_found = [str(public_id) for public_id in public_ids if public_id not in found] + invalid
+    body = b'{"not_found":' + json.dumps(not_found).encode() + b',"results":[' + results + b']}'
+    return HttpResponse(body, content_type='application/json')
+
+
+# --- Published seal roots (see core/sealing.py) ---
+
+@replica_reads
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def seal_roots_view(request):
+    """
+    Every signed batch root, oldest first, and the key they are signed with.
+    Public. ?institution= narrows to one institution, ?after=<sequence> to its
+    newer batches.
+    """
+    batches = SealBatch.objects.order_by('institution_id', 'sequence')
+    institution = request.query_params.get('institution')
+    if institution:
+        if not institution.isdigit():
+            return Response({'institution': ['Expected an institution id.']}, status=status.HTTP_400_BAD_REQUEST)
+        batches = batches.filter(institution_id=institution)
+        after = request.query_params.get('after', '')
+        if after.isdigit():
+            batches = batches.filter(sequence__gt=after)
+    return Response({'public_key': public_key(), 'roots': [batch_data(batch) for batch in batches]})
+
@@ -33,7 +33,8 @@ class Subject(models.Model):
 
 # --- Student Profile ---
 class Student(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    # related_name avoids clashing with core.Student's 'User.student' accessor
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='frontend_student')
     department = models.ForeignKey(Department, on_delete=models.PROTECT, null=True, blank=True)
     
     # --- NEW: The system-wide unique ID for sharing ---
@@ -1,3 +1,136 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core import dashboard, metrics
+from core.fragments import records_version
+from core.models import AcademicRecord, ExamResult
+from core.signals import records_bulk_changed
+from core.tests import QueryBudgetMixin, make_institution, make_student, make_user
+
+
+class InstitutionDashboardTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = make_user('registrar', 'Studying_Institutions')
+        self.institution = make_institution()
+        self.institution.admin_user = self.staff
+        self.institution.save()
+        self.other = make_institution(name='Other College')
+        for i in range(7):
+            make_student(f'mine-{i}', self.institution, records=1)
+        make_student('theirs', self.other, records=1)
+        self.client.force_login(self.staff)
+
+    def test_dashboard_is_scoped_and_paginated(self):
+        with mock.patch('frontend.views.DASHBOARD_PAGE_SIZE', 5):
+            first = self.client.get('/institution/dashboard/')
+            second = self.client.get('/institution/dashboard/?page=2')
+        usernames = [s.user.username for s in first.context['students']]
+        self.assertEqual(usernames, [f'mine-{i}' for i in range(5)])
+        self.assertEqual([s.user.username for s in second.context['students']], ['mine-5', 'mine-6'])
+        self.assertEqual(first.context['stats']['students'], 7)
+        self.assertNotContains(first, 'theirs')
+
+    def test_sorting(self):
+        response = self.client.get('/institution/dashboard/?sort=-username')
+        self.assertEqual(response.context['students'][0].user.username, 'mine-6')
+        # unknown sort keys fall back to username
+        response = self.client.get('/institution/dashboard/?sort=password')
+        self.assertEqual(response.context['sort'], 'username')
+
+    def test_counts_are_cached_and_invalidated_on_writes(self):
+        self.client.get('/institution/dashboard/')
+        # session + user + institution + one joined page query; no counts
+        with self.assertQueryBudget(4):
+            response = self.client.get('/institution/dashboard/')
+        self.assertEqual(response.context['stats']['records_this_term'], 14)
+
+        make_student('newcomer', self.institution, records=0)
+        response = self.client.get('/institution/dashboard/')
+        self.assertEqual(response.context['stats']['students'], 8)
+        self.assertEqual(response.context['stats']['students_without_records'], 1)
+
+    def test_counts_cached_before_the_commit_are_dropped_after_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_student('newcomer', self.institution, records=0)
+            # a concurrent reader caches counts that miss the uncommitted row
+            cache.set(dashboard._cache_key(self.institution.pk), {'students': 7}, 3600)
+        self.assertEqual(self.client.get('/institution/dashboard/').context['stats']['students'], 8)
+
+    def test_users_without_an_institution_see_no_students(self):
+        self.client.force_login(make_user('someone'))
+        response = self.client.get('/institution/dashboard/')
+        self.assertIsNone(response.context['institution'])
+        self.assertNotContains(response, 'mine-0')
+
+
+class RecordFragmentCacheTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.institution = make_institution()
+        self.student = make_student('alice', self.institution, records=5)
+        self.staff = make_user('registrar', 'Studying_Institutions')
+
+    def _fragment_counts(self):
+        counters = metrics.snapshot()
+        return counters.get('fragment_cache.hits', 0), counters.get('fragment_cache.misses', 0)
+
+    def test_repeat_dashboard_views_skip_the_records(self):
+        self.client.force_login(self.student.user)
+        self.assertContains(self.client.get('/dashboard/'), 'Course 4')
+        # session + user; the student and both record lists come from the cache
+        with self.assertQueryBudget(2):
+            response = self.client.get('/dashboard/')
+        self.assertContains(response, 'Course 4')
+        self.assertContains(response, 'Activity 4')
+        self.assertEqual(self._fragment_counts(), (1, 1))
+
+    def test_record_writes_refresh_the_fragment(self):
+        self.client.force_login(self.student.user)
+        self.client.get('/dashboard/')
+        AcademicRecord.objects.create(student=self.student, course_name='Compilers', semester=6, grade='O',
+                                      record_type='COLLEGE', verified_by=self.institution)
+        self.assertContains(self.client.get('/dashboard/'), 'Compilers')
+
+        AcademicRecord.objects.filter(course_name='Compilers').delete()
+        self.assertNotContains(self.client.get('/dashboard/'), 'Compilers')
+
+    def test_bulk_writes_bump_the_version(self):
+        before = records_version(self.student.pk)
+        row = {'student_id': self.student.pk, 'exam_name': 'Exam 0', 'score': 50}
+        records_bulk_changed.send(sender=ExamResult, values=[row], previous=[row])
+        self.assertNotEqual(records_version(self.student.pk), before)
+
+    def test_student_detail_prefetches_on_a_miss(self):
+        self.client.force_login(self.staff)
+        url = f'/institution/student/{self.student.user_id}/'
+        # session, user, student with its user, records joined with their verifier
+        with self.assertQueryBudget(4):
+            response = self.client.get(url)
+        self.assertContains(response, 'Test College', count=5)
+        with self.assertQueryBudget(3):
+            self.client.get(url)
+
+        # institution names are part of the fragment
+        self.institution.name = 'Renamed College'
+        self.institution.save()
+        self.assertContains(self.client.get(url), 'Renamed College', count=5)
+
+
+@override_settings(THROTTLE_BUCKETS={'auth-ip': (10, 60), 'auth-username': (1, 60)})
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_user('alice')
+
+    def test_over_budget_logins_are_rejected_before_authenticating(self):
+        response = self.client.post('/login/', {'username': 'alice', 'password': 'wrong'})
+        self.assertContains(response, 'Invalid username or password.')
+        with mock.patch('frontend.views.authenticate') as authenticate:
+            response = self.client.post('/login/', {'username': 'alice', 'password': 'pass12345'})
+        self.assertContains(response, 'Too many login attempts', status_code=429)
+        self.assertIn('Retry-After', response)
+        authenticate.assert_not_called()
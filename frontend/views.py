@@ -1,10 +1,20 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Prefetch, prefetch_related_objects
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+from django.utils.functional import cached_property
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User, Group
 
 # Import all the models we'll need for these pages
 from core.models import Student, Institution, AcademicRecord
+from core.roles import STUDENTS, STUDYING_INSTITUTIONS, get_user_roles
+from core.dashboard import institution_stats
+from core.fragments import arender_cached, render_cached
+from core.routers import replica_reads
+from core.throttling import check_login_attempt
 
 # --- Main Navigation Views ---
 
@@ -22,14 +32,22 @@ def login_view(request):
     if request.method == 'POST':
         username = request.POST.get('username')
         password = request.POST.get('password')
+        # Over-budget attempts are turned away before any password hashing.
+        admitted, retry_after = check_login_attempt(request, username)
+        if not admitted:
+            response = render(request, 'frontend/login.html',
+                              {'error': 'Too many login attempts. Please try again shortly.'}, status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
         user = authenticate(request, username=username, password=password)
         
         if user is not None:
             login(request, user)
             # THIS IS THE "SMART" REDIRECT LOGIC
-            if user.groups.filter(name='Studying_Institutions').exists():
+            roles = get_user_roles(user)
+            if STUDYING_INSTITUTIONS in roles:
                 return redirect('institution_dashboard')
-            elif user.groups.filter(name='Students').exists():
+            elif STUDENTS in roles:
                 return redirect('dashboard')
             else:
                 # Default for other users (like superusers)
@@ -49,39 +67,97 @@ def logout_view(request):
 # --- Student-Specific Views ---
 
 @login_required
-def dashboard_view(request):
+async def dashboard_view(request):
     """
     Displays the dashboard for a logged-in student.
+    Async: the user, the student and both record lists are loaded through the
+    async ORM, so under ASGI the page never holds a worker thread. The record
+    tables are a cached fragment (core.fragments) and only touch the database
+    when the student's records changed. That read stays on the primary: a
+    fragment rendered from a lagging replica would be cached under the new stamp.
     """
-    try:
-        student = Student.objects.get(user=request.user)
-        context = {
-            'student': student
-        }
-        return render(request, 'frontend/dashboard.html', context)
-    except Student.DoesNotExist:
+    user = await request.auser()
+    # Rendering reads request.user; hand it the already-loaded user so the
+    # template never triggers a synchronous lookup inside the event loop.
+    request.user = user
+
+    async def render_records():
+        # Only on a cache miss: the student with both record lists prefetched.
+        student = await (
+            Student.objects.filter(user=user)
+            .prefetch_related('academicrecord_set', 'cocurricularrecord_set')
+            .afirst()
+        )
+        if student is None:
+            return None
+        return render_to_string('frontend/_dashboard_records.html', {'student': student})
+
+    # Students are keyed by their user's id, so a hit needs no query at all.
+    records_html = await arender_cached('dashboard-records', user.pk, render_records)
+    if records_html is None:
         # If a non-student user tries to access this, send them away.
         return redirect('login')
+    context = {
+        'records_html': records_html
+    }
+    return render(request, 'frontend/dashboard.html', context)
 
 # --- NEW: Institution-Specific Views ---
 
+DASHBOARD_PAGE_SIZE = getattr(settings, 'INSTITUTION_DASHBOARD_PAGE_SIZE', 50)
+# ?sort= value -> ORDER BY field
+DASHBOARD_SORTS = {
+    'username': 'user__username',
+    '-username': '-user__username',
+    'email': 'user__email',
+    '-email': '-user__email',
+    'newest': '-user__date_joined',
+}
+
+class KnownCountPaginator(Paginator):
+    """Paginator that takes the total from the caller instead of running COUNT(*)."""
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._known_count = count
+
+    @cached_property
+    def count(self):
+        return self._known_count
+
 @login_required
+@replica_reads
 def institution_dashboard_view(request):
     """
-    Displays the main dashboard for an institution, listing their students.
+    Displays the main dashboard for an institution: headline counts and a
+    paginated, sortable list of its students.
     """
-    # In a real app, you would link a user to their specific institution.
-    # For now, this placeholder gets the first institution in the database.
-    try:
-        institution = Institution.objects.first()
-        students = Student.objects.filter(current_institution=institution)
-    except Institution.DoesNotExist:
-        institution = None
-        students = []
+    institution = Institution.for_user(request.user)
+    if institution is None:
+        # Only institution staff accounts have a dashboard.
+        return render(request, 'frontend/institution_dashboard.html', {'institution': None})
+
+    sort = request.GET.get('sort', 'username')
+    if sort not in DASHBOARD_SORTS:
+        sort = 'username'
+
+    # Headline counts come from the cache; the student count doubles as the
+    # paginator's total so no COUNT(*) runs on a page view.
+    stats = institution_stats(institution)
+    students = (
+        Student.objects.filter(current_institution=institution)
+        .select_related('user')
+        .only('user_id', 'user__username', 'user__email')
+        .order_by(DASHBOARD_SORTS[sort], 'user_id')
+    )
+    paginator = KnownCountPaginator(students, DASHBOARD_PAGE_SIZE, count=stats['students'])
+    page = paginator.get_page(request.GET.get('page'))
 
     context = {
         'institution': institution,
-        'students': students
+        'stats': stats,
+        'page': page,
+        'students': page.object_list,
+        'sort': sort,
     }
     return render(request, 'frontend/institution_dashboard.html', context)
 
@@ -102,7 +178,8 @@ def create_student_view(request):
         student_group, _ = Group.objects.get_or_create(name='Students')
         user.groups.add(student_group)
 
-        institution = Institution.objects.first() # Placeholder
+        # The staff member's own institution; the first one is the legacy placeholder.
+        institution = Institution.for_user(request.user) or Institution.objects.first()
         Student.objects.create(user=user, current_institution=institution)
         
         return redirect('institution_dashboard')
@@ -115,7 +192,7 @@ def student_detail_view(request, user_id):
     Shows details for a specific student and allows an institution
     to add new academic records for them.
     """
-    student = Student.objects.get(user_id=user_id)
+    student = Student.objects.with_profile().get(user_id=user_id)
     
     if request.method == 'POST':
         course_name = request.POST.get('course_name')
@@ -123,7 +200,7 @@ def student_detail_view(request, user_id):
         grade = request.POST.get('grade')
         record_type = request.POST.get('record_type')
         
-        institution = Institution.objects.first() # Placeholder for the verifier
+        institution = Institution.for_user(request.user) or Institution.objects.first() # Placeholder for the verifier
 
         AcademicRecord.objects.create(
             student=student,
@@ -135,7 +212,14 @@ def student_detail_view(request, user_id):
         )
         return redirect('student_detail', user_id=student.user_id)
 
+    def render_records():
+        prefetch_related_objects([student], Prefetch('academicrecord_set',
+                                                     queryset=AcademicRecord.objects.select_related('verified_by')))
+        return render_to_string('frontend/_student_detail_records.html', {'student': student})
+
     context = {
-        'student': student
+        'student': student,
+        # Shows institution names, so it also depends on the reference data version.
+        'records_html': render_cached('student-detail-records', student.pk, render_records, with_reference=True),
     }
     return render(request, 'frontend/student_detail.html', context)
\ No newline at end of file
@@ -49,8 +49,12 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Unused unless DATABASE_REPLICAS is set (see core.routers).
+    'core.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Inert unless INSTRUMENTATION_SAMPLE_RATE is set (see core.instrumentation).
+    'core.instrumentation.RequestInstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'markR.urls'
@@ -88,9 +92,32 @@ DATABASES = {
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
         }
-    }
+    },
+    # Read replicas are extra aliases listed in DATABASE_REPLICAS, e.g.
+    # 'replica': {**<default>, 'HOST': 'replica-1.internal'},
 }
 
+# core.routers sends safe reads of REPLICA_APPS models from views marked
+# @replica_reads to a random replica. A user who writes is pinned to the primary
+# for REPLICA_PIN_SECONDS; keep it above the replicas' usual lag.
+DATABASE_ROUTERS = ['core.routers.ReadReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_APPS = ('core',)
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Roles, dashboard counts and reference data are cached here. locmem is per
+# process; in production point this at a shared backend, e.g.
+# django.core.cache.backends.redis.RedisCache with LOCATION 'redis://127.0.0.1:6379'.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'markr',
+    }
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -128,6 +155,12 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files (student photos and their resized variants)
+# https://docs.djangoproject.com/en/4.2/topics/files/
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -137,5 +170,109 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
-}
\ No newline at end of file
+    ),
+    # Keyset pagination: opaque next/previous cursors, no OFFSET and no COUNT(*).
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # Token buckets from THROTTLE_BUCKETS; views without a configured bucket are not throttled.
+    'DEFAULT_THROTTLE_CLASSES': ('core.throttling.TokenBucketThrottle',),
+}
+
+# Upper bound for the ?page_size= query parameter on API list endpoints.
+API_MAX_PAGE_SIZE = 500
+
+SIMPLE_JWT = {
+    # Issue tokens carrying the user's roles as a signed claim (see core.roles).
+    'TOKEN_OBTAIN_SERIALIZER': 'core.serializers.RoleTokenObtainPairSerializer',
+    # ...and re-resolve them whenever the refresh token mints an access token.
+    'TOKEN_REFRESH_SERIALIZER': 'core.serializers.RoleTokenRefreshSerializer',
+}
+
+# Seconds a user's roles stay cached between requests. Group changes
+# invalidate the cache immediately.
+ROLE_CACHE_TIMEOUT = 300
+
+# Seconds cached university/institution data is kept. Writes bump a version
+# key and take effect immediately, so this only bounds memory use.
+REFERENCE_CACHE_TIMEOUT = 24 * 3600
+
+# Seconds the rendered record tables of the student pages are kept
+# (core.fragments). Record writes change the student's version stamp, so this
+# also only bounds memory use.
+FRAGMENT_CACHE_TIMEOUT = 24 * 3600
+
+# Public verification (core.verification): browser/proxy cache lifetime of a
+# snapshot response (clients revalidate with its ETag afterwards) and the most
+# IDs one batch request may look up.
+VERIFICATION_MAX_AGE = 60
+VERIFICATION_BATCH_LIMIT = 1000
+
+# Record sealing (core.sealing, manage.py seal_records): records per signed
+# Merkle batch, and the hex Ed25519 seed the batch roots are signed with.
+# Sealing and the public key endpoint refuse to run until SEAL_SIGNING_KEY is
+# set (e.g. `python -c "import os; print(os.urandom(32).hex())"`); keep it out
+# of version control. Requires `cryptography`.
+SEAL_BATCH_SIZE = 10_000
+SEAL_SIGNING_KEY = None
+
+# Change feed (core.changelog, GET /api/changes/): `manage.py compact_changelog`
+# drops entries superseded by a newer one for the same object once they are
+# CHANGE_LOG_COMPACT_AFTER_HOURS old, and all entries older than
+# CHANGE_LOG_RETENTION_DAYS (consumers further behind must resync).
+CHANGE_LOG_COMPACT_AFTER_HOURS = 24
+CHANGE_LOG_RETENTION_DAYS = 90
+
+# Background report jobs (core.reports, manage.py run_report_workers):
+# students rendered between progress updates, seconds without a heartbeat
+# before a running job is requeued, and how often a job may be attempted.
+REPORT_CHUNK_SIZE = 50
+REPORT_STALE_SECONDS = 300
+REPORT_MAX_ATTEMPTS = 3
+# Where finished reports are stored (core.storage). Keep it outside
+# MEDIA_ROOT and out of the web server's reach: reports hold every student's
+# marks and are only served through /api/reports/<id>/artifact/.
+REPORT_ROOT = BASE_DIR / 'private' / 'reports'
+
+# Analytics rollups (core.analytics, /api/analytics/): the exam score that
+# counts as a pass, and the histogram's range and number of equal bands.
+# Run `manage.py rebuild_analytics` after changing these or GRADE_SCALE.
+EXAM_PASS_SCORE = 40
+ANALYTICS_SCORE_RANGE = (0, 100)
+ANALYTICS_SCORE_BINS = 10
+
+# Exam ranks and percentiles (core.ranking): seconds a per-exam score index
+# stays cached (writes drop it anyway), and students per
+# /api/exam-results/ranks/ request.
+RANK_INDEX_TIMEOUT = 24 * 3600
+RANK_BATCH_LIMIT = 1000
+
+# Student photo variants (core.photos): name -> bounding box in pixels, and
+# the number of background threads that generate them.
+PHOTO_VARIANTS = {'thumb': (128, 128), 'profile': (512, 512)}
+PHOTO_WORKERS = 2
+
+# Bulk student onboarding (core.onboarding, /api/students/bulk-onboard/ and
+# manage.py onboard_students): processes in the password-hashing pool each
+# process shares across runs. None means one per CPU; 1 hashes in-process
+# instead. The pool is sized when first used, so changes need a restart.
+ONBOARDING_WORKERS = None
+
+# Per-request query/timing instrumentation (core.instrumentation): the fraction
+# of requests that get a Server-Timing header and a 'markr.requests' log line.
+# 0 disables the middleware entirely. Sampled requests slower than
+# INSTRUMENTATION_SLOW_MS also log their full query list.
+INSTRUMENTATION_SAMPLE_RATE = 0
+INSTRUMENTATION_SLOW_MS = 500
+
+# Token-bucket throttles (core.throttling), kept in the shared cache: bucket
+# name -> (capacity, seconds to refill from empty). 'auth-ip' and
+# 'auth-username' guard /api/token/ and the login page per client IP and per
+# username. API views use the bucket named by their throttle_scope ('api' by
+# default) per user; add e.g. 'api': (600, 60) to enable it.
+# The limits only hold across worker processes when CACHES['default'] is a
+# shared backend (Redis, memcached). With the locmem cache above each process
+# has its own buckets, and startup warns about it (check core.W001).
+THROTTLE_BUCKETS = {
+    'auth-ip': (20, 60),
+    'auth-username': (5, 300),
+}
@@ -0,0 +1,35 @@
+import os
+
+from .settings import *  # noqa: F401,F403
+
+# Test settings: two local SQLite databases in place of MySQL, `default` as the
+# primary and `replica` routed to by core.routers. The replica mirrors the
+# primary's test database: a second connection to the same in-memory database
+# that reads uncommitted rows. Each TestCase's data lives in a transaction that
+# is never committed, so that is the only way the replica can see it.
+#
+#   python manage.py test --settings=markR.test_settings
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test-primary.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test-replica.sqlite3',
+        'OPTIONS': {'init_command': 'PRAGMA read_uncommitted = 1'},
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+# Routing stays off so query-budget tests keep counting a single connection;
+# core.tests.ReplicaRoutingTests turns it on with override_settings.
+DATABASE_REPLICAS = []
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# A throwaway record-sealing key per test run.
+SEAL_SIGNING_KEY = os.urandom(32).hex()
+
+# Tests run in one process, so per-process throttle buckets are fine.
+SILENCED_SYSTEM_CHECKS = ['core.W001']
@@ -1,6 +1,9 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from core import urls as core_urls
+from core.throttling import LoginThrottle
 from frontend import urls as frontend_urls
 
 from rest_framework_simplejwt.views import (
@@ -11,7 +14,7 @@ from rest_framework_simplejwt.views import (
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(core_urls)),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/', TokenObtainPairView.as_view(throttle_classes=[LoginThrottle]), name='token_obtain_pair'),
     
     # Corrected line below:
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -19,4 +22,7 @@ urlpatterns = [
     #  Frontend Web Pages 
     # This makes pages like /login/ and /dashboard/ work
     path('', include(frontend_urls)),
-]
\ No newline at end of file
+]
+
+# Serve uploaded photos in development; production serves MEDIA_ROOT directly.
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)